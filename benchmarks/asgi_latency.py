@@ -0,0 +1,174 @@
+"""
+Compare token endpoint latency under load between the threaded WSGI server and the ASGI application.
+
+Usage:
+    python -m benchmarks.asgi_latency [--concurrency 64] [--requests 4000] [--cache-ttl 0]
+
+Starts each server in its own process against the same SQLite database: the Flask application on
+Werkzeug's threaded server, then `corezilla.asgi` on uvicorn. It then sends `client_credentials`
+requests from many concurrent connections and prints latency percentiles and throughput for each.
+With the default `--cache-ttl 0` every request authenticates the client against the database, which
+is the I/O the ASGI application moves off worker threads. Requires uvicorn, asgiref, greenlet and
+aiosqlite.
+"""
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from corezilla.config.test import TestConfiguration
+
+
+def configuration(database_path, cache_ttl):
+    class BenchmarkConfiguration(TestConfiguration):
+        DEBUG = False
+        TESTING = False
+        SQLALCHEMY_INSTRUMENTATION_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{database_path}"
+        CLIENT_CREDENTIAL_CACHE_TTL_SECONDS = cache_ttl
+
+    return BenchmarkConfiguration
+
+
+def create_database(database_path):
+    from corezilla.app import create_app, db
+    from corezilla.app.models import Client
+    from corezilla.app.models.User import User
+
+    app = create_app(configuration(database_path, 0))
+    with app.app_context():
+        db.create_all()
+        user = User(username="bench", email="bench@example.invalid", password="password")
+        client = Client(owner=user, name="Benchmark Client")
+        db.session.add_all([user, client])
+        db.session.commit()
+        return client.client_id, client.client_secret
+
+
+def serve(kind, port, database_path, cache_ttl):
+    from corezilla.app import create_app
+
+    app = create_app(configuration(database_path, cache_ttl))
+    if kind == "wsgi":
+        from werkzeug.serving import make_server
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+    else:
+        import uvicorn
+
+        from corezilla.app.asgi import create_asgi_app
+
+        uvicorn.run(create_asgi_app(app), host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def request(port, payload):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status = int(response.split(b" ", 2)[1])
+    if status != 200:
+        raise RuntimeError(f"Unexpected response: {response[:200]!r}")
+
+
+async def load(port, credentials, concurrency, requests):
+    """Send `requests` token requests over `concurrency` concurrent connections, one request per connection."""
+    body = urlencode({"grant_type": "client_credentials"}).encode()
+    basic = base64.b64encode(":".join(credentials).encode()).decode()
+    payload = (
+        f"POST /api/oauth/token HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: close\r\n"
+        f"Authorization: Basic {basic}\r\nContent-Type: application/x-www-form-urlencoded\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode() + body
+
+    samples = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started_at = time.perf_counter()
+            await request(port, payload)
+            samples.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started_at
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def report(label, samples, elapsed):
+    print(
+        f"{label:>5}: p50 {statistics.median(samples) * 1e3:7.2f} ms, p95 {percentile(samples, 0.95) * 1e3:7.2f} ms, "
+        f"p99 {percentile(samples, 0.99) * 1e3:7.2f} ms, {len(samples) / elapsed:8.0f} req/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--cache-ttl", type=int, default=0, help="CLIENT_CREDENTIAL_CACHE_TTL_SECONDS for the servers")
+    parser.add_argument("--serve", choices=["wsgi", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.database, args.cache_ttl)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "benchmark.db")
+        credentials = create_database(database_path)
+
+        for kind in ("wsgi", "asgi"):
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.asgi_latency", "--serve", kind, "--port", str(port),
+                 "--database", database_path, "--cache-ttl", str(args.cache_ttl)],
+                stdout=subprocess.DEVNULL,
+            )
+            try:
+                wait_for_port(port)
+                # Warm up connections, caches and lazily built state before measuring
+                asyncio.run(load(port, credentials, args.concurrency, args.concurrency * 4))
+                samples, elapsed = asyncio.run(load(port, credentials, args.concurrency, args.requests))
+            finally:
+                server.terminate()
+                server.wait()
+            report(kind, samples, elapsed)
+
+
+if __name__ == "__main__":
+    main()
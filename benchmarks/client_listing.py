@@ -0,0 +1,132 @@
+"""
+Measure the throughput of /api/clients/ with the json module and with the orjson JSON provider.
+
+Usage:
+    python -m benchmarks.client_listing [--clients 50] [--requests 200]
+
+Lists `--clients` clients, each with a full configuration, through the Flask test client against an
+in-memory database, once for each `JSON_PROVIDER`, and prints requests per second and latency
+percentiles for both, along with the time taken to serialise the listing on its own.
+"""
+import argparse
+import statistics
+import time
+import timeit
+
+from corezilla.app import create_app, db
+from corezilla.app.models import Client, ClientConfiguration, ClientMetadata
+from corezilla.app.models.User import User
+from corezilla.config.test import TestConfiguration
+
+CONFIGURATION = {
+    "oidc_conformant": True,
+    "sender_constrained": False,
+    "token_endpoint_auth_method": "client_secret_basic",
+    "uris": {
+        "app_login_uri": "https://example.com/login",
+        "redirect_uris": [f"https://app{i}.example.com/callback" for i in range(5)],
+        "logout_uris": ["https://example.com/logout"],
+        "web_origins": [f"https://app{i}.example.com" for i in range(5)],
+        "resources": [f"https://api.example.com/v{i}" for i in range(5)],
+    },
+    "cors": {
+        "is_enabled": True,
+        "allowed_origins": [f"https://app{i}.example.com" for i in range(5)],
+        "fallback_url": "https://example.com/fallback",
+    },
+    "refresh": {
+        "refresh_token_rotation_enabled": True,
+        "rotation_overlap_period": 0,
+        "idle_refresh_token_lifetime_enabled": False,
+        "idle_refresh_token_lifetime": 1296000,
+        "maximum_refresh_token_lifetime_enabled": False,
+        "maximum_refresh_token_lifetime": 2592000,
+    },
+    "jwt": {"algorithm": "RS256"},
+}
+
+METADATA = {
+    "description": "An example application.",
+    "logo": "https://example.com/logo.png",
+    "tos": "https://example.com/tos",
+    "privacy_policy": "https://example.com/privacy",
+    "security_contact": "security@example.com",
+    "privacy_contact": "privacy@example.com",
+}
+
+
+def configuration(provider):
+    class BenchmarkConfiguration(TestConfiguration):
+        DEBUG = False
+        EXPLAIN_TEMPLATE_LOADING = False
+        SQLALCHEMY_INSTRUMENTATION_ENABLED = False
+        JSON_PROVIDER = provider
+
+    return BenchmarkConfiguration
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run(provider, clients, requests):
+    """
+    Returns:
+        tuple: The latency of each request in seconds, and the time to serialise the listing on its own.
+    """
+    app = create_app(configuration(provider))
+    with app.app_context():
+        db.create_all()
+        user = User(username="bench", email="bench@example.invalid", password="password")
+        db.session.add(user)
+        for i in range(clients):
+            client = Client(owner=user, name=f"Benchmark Client {i}")
+            db.session.add(client)
+            db.session.flush()
+            db.session.add(ClientMetadata(client_id=client.id, metadata_blob=METADATA))
+            db.session.add(ClientConfiguration(client_id=client.id, configuration_blob=CONFIGURATION))
+        db.session.commit()
+
+        with app.test_client() as test_client:
+            with test_client.session_transaction() as session:
+                session["_user_id"] = user.fs_uniquifier
+                session["_fresh"] = True
+
+            # Warm up the caches and lazily built state before measuring
+            for _ in range(20):
+                test_client.get(f"/api/clients/?per_page={clients}")
+
+            samples = []
+            for _ in range(requests):
+                started_at = time.perf_counter()
+                response = test_client.get(f"/api/clients/?per_page={clients}")
+                samples.append(time.perf_counter() - started_at)
+                assert response.status_code == 200, response.get_data(as_text=True)
+
+        listing = response.get_json()
+        with app.test_request_context():
+            timer = timeit.Timer(lambda: app.json.response(listing))
+            number, _ = timer.autorange()
+            serialise_seconds = min(timer.repeat(repeat=5, number=number)) / number
+
+    return samples, serialise_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    for provider in ("json", "orjson"):
+        samples, serialise_seconds = run(provider, args.clients, args.requests)
+        print(
+            f"{provider:>8}: {len(samples) / sum(samples):7.1f} req/s, "
+            f"median {statistics.median(samples) * 1e3:6.2f} ms, p95 {percentile(samples, 0.95) * 1e3:6.2f} ms, "
+            f"serialising {serialise_seconds * 1e6:7.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
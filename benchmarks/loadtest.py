@@ -0,0 +1,389 @@
+"""
+Drive the whole OAuth flow against a locally started server and report latency per endpoint.
+
+Usage:
+    python -m benchmarks.loadtest [--server wsgi] [--users 16] [--iterations 25] [--output run.json]
+                                  [--compare baseline.json]
+
+Starts the application in its own process against a fresh SQLite database, using Werkzeug's threaded
+server (`wsgi`), the preloading gunicorn launcher (`gunicorn`) or the ASGI application on uvicorn
+(`asgi`). Each of `--users` concurrent virtual users then registers, logs in and creates a client, and
+runs `--iterations` flows, each of which authorizes, redeems the code at the token endpoint, refreshes,
+introspects the access token and revokes the refresh token.
+
+Throughput and p50/p95/p99 latency are printed per endpoint. `--output` writes them as JSON together
+with the commit they were measured on, and `--compare` prints the change from an earlier JSON run.
+
+The client endpoints cannot update a client's redirect URIs yet, so after the clients are created the
+harness registers one for each of them directly in the database.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from corezilla.config.test import TestConfiguration
+
+REDIRECT_URI = "https://client.example.invalid/callback"
+PASSWORD = "correct-horse-battery"
+
+ENDPOINTS = ("register", "login", "create_client", "authorize", "token", "refresh", "introspect", "revoke")
+
+
+def configuration(database_path):
+    class LoadTestConfiguration(TestConfiguration):
+        DEBUG = False
+        TESTING = False
+        EXPLAIN_TEMPLATE_LOADING = False
+        SQLALCHEMY_INSTRUMENTATION_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{database_path}"
+
+    return LoadTestConfiguration
+
+
+def create_database(database_path):
+    from corezilla.app import create_app, db
+
+    app = create_app(configuration(database_path))
+    with app.app_context():
+        db.create_all()
+
+
+def register_redirect_uris(database_path, client_ids):
+    """Add `REDIRECT_URI` to the configuration of each client."""
+    from corezilla.app import create_app, db
+    from corezilla.app.models import Client
+
+    app = create_app(configuration(database_path))
+    with app.app_context():
+        for client in Client.query.filter(Client.client_id.in_(client_ids)):
+            for client_configuration in client.client_configurations:
+                blob = dict(client_configuration.configuration_blob)
+                blob["uris"] = {**blob.get("uris", {}), "redirect_uris": [REDIRECT_URI]}
+                client_configuration.configuration_blob = blob
+        db.session.commit()
+
+
+def serve(kind, port, database_path, workers):
+    from corezilla.app import create_app
+
+    app = create_app(configuration(database_path))
+    if kind == "wsgi":
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class KeepAliveRequestHandler(WSGIRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        make_server("127.0.0.1", port, app, threaded=True, request_handler=KeepAliveRequestHandler).serve_forever()
+    elif kind == "gunicorn":
+        from corezilla.app.utils.prewarm import prewarm
+        from corezilla.serve import PreloadedApplication, post_fork
+
+        prewarm(app)
+        PreloadedApplication(app, {
+            "bind": f"127.0.0.1:{port}",
+            "workers": workers,
+            "preload_app": True,
+            "post_fork": post_fork,
+            "loglevel": "warning",
+        }).run()
+    else:
+        import uvicorn
+
+        from corezilla.app.asgi import create_asgi_app
+
+        uvicorn.run(create_asgi_app(app), host="127.0.0.1", port=port, workers=None, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+class FlowError(Exception):
+    pass
+
+
+class Recorder:
+    """Latency samples and error counts per endpoint, shared by the virtual users."""
+
+    def __init__(self):
+        self.samples = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok):
+        with self.lock:
+            self.samples[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+class VirtualUser:
+    """A user with their own keep-alive connection and session cookie."""
+
+    def __init__(self, number, port, recorder):
+        self.username = f"loadtest-{number}-{os.getpid()}"
+        self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.cookies = SimpleCookie()
+        self.recorder = recorder
+        self.client_id = None
+        self.client_secret = None
+
+    def request(self, endpoint, method, path, expected_status, *, json_body=None, form=None, query=None):
+        headers = {}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body)
+            headers["Content-Type"] = "application/json"
+        elif form is not None:
+            body = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={morsel.value}" for name, morsel in self.cookies.items())
+        if query:
+            path = f"{path}?{urlencode(query)}"
+
+        started_at = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.connection.close()
+            self.recorder.record(endpoint, time.perf_counter() - started_at, False)
+            raise FlowError(f"{endpoint}: {e}") from e
+        self.recorder.record(endpoint, time.perf_counter() - started_at, response.status == expected_status)
+
+        for cookie in response.headers.get_all("Set-Cookie") or ():
+            self.cookies.load(cookie)
+        if response.status != expected_status:
+            raise FlowError(f"{endpoint}: expected {expected_status}, got {response.status}: {payload[:200]!r}")
+        return response, payload
+
+    def set_up(self):
+        """Register, log in and create a client."""
+        self.request("register", "POST", "/api/auth/register", 201, json_body={
+            "username": self.username,
+            "email": f"{self.username}@example.invalid",
+            "password": PASSWORD,
+            "password_confirm": PASSWORD,
+        })
+        self.request("login", "POST", "/api/auth/login", 200, json_body={
+            "username_or_email": self.username,
+            "password": PASSWORD,
+        })
+        _, payload = self.request("create_client", "POST", "/api/clients/", 201, json_body={})
+        client = json.loads(payload)
+        self.client_id, self.client_secret = client["client_id"], client["client_secret"]
+
+    def flow(self):
+        """Authorize, redeem the code, refresh, introspect and revoke."""
+        response, _ = self.request("authorize", "GET", "/api/oauth/authorize", 302, query={
+            "client_id": self.client_id,
+            "response_type": "code",
+            "redirect_uri": REDIRECT_URI,
+            "state": "loadtest",
+        })
+        code = parse_qs(urlparse(response.headers["Location"]).query)["code"][0]
+
+        credentials = {"client_id": self.client_id, "client_secret": self.client_secret}
+        _, payload = self.request("token", "POST", "/api/oauth/token", 200, form={
+            "grant_type": "authorization_code", "code": code, "redirect_uri": REDIRECT_URI, **credentials
+        })
+        refresh_token = json.loads(payload)["refresh_token"]
+
+        _, payload = self.request("refresh", "POST", "/api/oauth/token", 200, form={
+            "grant_type": "refresh_token", "refresh_token": refresh_token, **credentials
+        })
+        tokens = json.loads(payload)
+
+        self.request("introspect", "POST", "/api/oauth/introspect", 200, form={"token": tokens["access_token"]})
+        self.request("revoke", "POST", "/api/oauth/revoke", 204, form={
+            "token": tokens.get("refresh_token", refresh_token), "token_type_hint": "refresh_token"
+        })
+
+    def close(self):
+        self.connection.close()
+
+
+def run_flows(user, iterations):
+    completed = 0
+    for _ in range(iterations):
+        try:
+            user.flow()
+            completed += 1
+        except FlowError as e:
+            logging.warning("Flow failed for %s: %s", user.username, e)
+    return completed
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarise(recorder, elapsed):
+    """
+    Returns:
+        dict: Request counts, errors, throughput and latency percentiles in milliseconds per endpoint.
+    """
+    endpoints = {}
+    for name in ENDPOINTS:
+        samples = recorder.samples[name]
+        if not samples:
+            continue
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": recorder.errors[name],
+            "throughput": len(samples) / elapsed[name],
+            "mean_ms": statistics.fmean(samples) * 1e3,
+            "p50_ms": percentile(samples, 0.50) * 1e3,
+            "p95_ms": percentile(samples, 0.95) * 1e3,
+            "p99_ms": percentile(samples, 0.99) * 1e3,
+        }
+    return endpoints
+
+
+def report(endpoints):
+    print(f"{'endpoint':>14} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in endpoints.items():
+        print(
+            f"{name:>14} {result['requests']:>9} {result['errors']:>7} {result['throughput']:>9.1f} "
+            f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}"
+        )
+
+
+def compare(endpoints, baseline):
+    print(f"\nChange from {baseline.get('commit') or 'baseline'} ({baseline.get('server')}):")
+    for name, result in endpoints.items():
+        previous = baseline["endpoints"].get(name)
+        if not previous:
+            continue
+        changes = "  ".join(
+            f"{key} {(result[key] - previous[key]) / previous[key] * 100:+6.1f}%"
+            for key in ("throughput", "p50_ms", "p99_ms") if previous[key]
+        )
+        print(f"{name:>14}  {changes}")
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--server", choices=["wsgi", "gunicorn", "asgi"], default="wsgi")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes for --server gunicorn")
+    parser.add_argument("--users", type=int, default=16, help="Concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=25, help="Flows run by each user")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Print the change from the results in this JSON file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.server, args.port, args.database, args.workers)
+        return
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "loadtest.db")
+        create_database(database_path)
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-W", "ignore", "-m", "benchmarks.loadtest", "--serve", "--server", args.server, "--port", str(port),
+             "--database", database_path, "--workers", str(args.workers)],
+            stdout=subprocess.DEVNULL,
+        )
+        recorder = Recorder()
+        elapsed = {}
+        try:
+            wait_for_port(port)
+            users = [VirtualUser(number, port, recorder) for number in range(args.users)]
+
+            with ThreadPoolExecutor(max_workers=args.users) as executor:
+                started_at = time.perf_counter()
+                failures = [future.exception() for future in [executor.submit(user.set_up) for user in users]]
+                elapsed.update(dict.fromkeys(ENDPOINTS[:3], time.perf_counter() - started_at))
+
+                users = [user for user, failure in zip(users, failures) if failure is None]
+                for failure in filter(None, failures):
+                    logging.warning("Set up failed: %s", failure)
+                if not users:
+                    raise SystemExit("No virtual user could be set up")
+                register_redirect_uris(database_path, [user.client_id for user in users])
+
+                started_at = time.perf_counter()
+                completed = sum(executor.map(lambda user: run_flows(user, args.iterations), users))
+                flow_seconds = time.perf_counter() - started_at
+                elapsed.update(dict.fromkeys(ENDPOINTS[3:], flow_seconds))
+
+            for user in users:
+                user.close()
+        finally:
+            server.terminate()
+            server.wait()
+
+    endpoints = summarise(recorder, elapsed)
+    results = {
+        "commit": current_commit(),
+        "measured_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "server": args.server,
+        "workers": args.workers if args.server == "gunicorn" else 1,
+        "users": args.users,
+        "iterations": args.iterations,
+        "flows": {"completed": completed, "per_second": completed / flow_seconds},
+        "endpoints": endpoints,
+    }
+
+    report(endpoints)
+    print(f"\n{completed} flows in {flow_seconds:.2f} s, {completed / flow_seconds:.1f} flows/s")
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(endpoints, json.load(baseline))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Microbenchmarks for the services, models, schemas and error handling on the request path.
+
+Usage:
+    python -m benchmarks.micro [-k token]                  # print the time per call of each benchmark
+    python -m benchmarks.micro --save                      # store the timings as the new baseline
+    python -m benchmarks.micro --compare [--threshold 0.25] # fail if any is more than 25% slower than the baseline
+
+Each benchmark is timed with `timeit`: the number of calls per round is chosen so that a round takes
+at least 0.2 seconds, and the fastest of `--rounds` rounds is reported, which is the least disturbed by
+other work on the machine. Baselines are stored in `benchmarks/baselines/micro.json`.
+
+A fixed pure-Python workload is timed alongside the benchmarks, and `--compare` compares each timing
+relative to it, so that a machine that is uniformly faster or slower than when the baseline was
+recorded, e.g. because of CPU frequency scaling or a busy neighbour, does not show up as a change.
+Differences between machines are not uniform, so record a new baseline before comparing elsewhere.
+"""
+import argparse
+import json
+import pathlib
+import platform
+import sys
+import timeit
+
+from corezilla.app import create_app
+from corezilla.config.test import TestConfiguration
+
+BASELINE_PATH = pathlib.Path(__file__).parent / "baselines" / "micro.json"
+
+CLIENT_ID = "cl-cs8nh6j24tk0d2o1a1a0"
+USER_ID = "us-cs8nh6j24tk0d2o1a1ag"
+
+CLIENT_CONFIGURATION = {
+    "oidc_conformant": True,
+    "sender_constrained": False,
+    "token_endpoint_auth_method": "client_secret_basic",
+    "uris": {
+        "app_login_uri": "https://example.com/login",
+        "redirect_uris": ["https://example.com/callback", "https://login.example.com/callback"],
+        "logout_uris": ["https://example.com/logout"],
+        "web_origins": ["https://example.com"],
+    },
+    "cors": {
+        "is_enabled": True,
+        "allowed_origins": ["https://example.com"],
+        "fallback_url": "https://example.com/fallback",
+    },
+    "refresh": {
+        "refresh_token_rotation_enabled": True,
+        "rotation_overlap_period": 0,
+        "idle_refresh_token_lifetime_enabled": False,
+        "idle_refresh_token_lifetime": 1296000,
+        "maximum_refresh_token_lifetime_enabled": False,
+        "maximum_refresh_token_lifetime": 2592000,
+    },
+    "jwt": {"algorithm": "RS256"},
+}
+
+CLIENT_METADATA = {
+    "description": "An example application.",
+    "logo": "https://example.com/logo.png",
+    "tos": "https://example.com/tos",
+    "privacy_policy": "https://example.com/privacy",
+    "security_contact": "security@example.com",
+    "privacy_contact": "privacy@example.com",
+}
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """
+    Register a benchmark. The decorated function sets up its inputs and returns the callable to time,
+    and is called inside a request context of the benchmark application.
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+@benchmark("app.create_app")
+def app_create_app():
+    # Blueprints are documented and Flask-Migrate is imported on first use, not here
+    return lambda: create_app(TestConfiguration)
+
+
+@benchmark("authorization_code.generate")
+def authorization_code_generate():
+    from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService
+
+    return lambda: AuthorizationCodeService.generate_authorization_code(CLIENT_ID, USER_ID)
+
+
+@benchmark("authorization_code.decrypt")
+def authorization_code_decrypt():
+    from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService
+
+    code = AuthorizationCodeService.generate_authorization_code(CLIENT_ID, USER_ID)
+    return lambda: AuthorizationCodeService.decrypt_authorization_code(code)
+
+
+@benchmark("authorization_code.validate")
+def authorization_code_validate():
+    from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService
+
+    code = AuthorizationCodeService.generate_authorization_code(CLIENT_ID, USER_ID)
+    return lambda: AuthorizationCodeService.validate_authorization_code(code, CLIENT_ID)
+
+
+@benchmark("token.generate_jwt")
+def token_generate_jwt():
+    from corezilla.app.services.TokenService import TokenService
+
+    payload = {"sub": USER_ID, "client_id": CLIENT_ID, "scope": "openid profile", "token_type": "access_token"}
+    return lambda: TokenService.generate_jwt(payload, 3600)
+
+
+@benchmark("client.validate_resource_uris")
+def client_validate_resource_uris():
+    from corezilla.app.services.ClientService import ClientService
+
+    resources = ["https://api.example.com", "https://files.example.com/v2", "https://example.com/resource"]
+    return lambda: ClientService.validate_resource_uris(resources)
+
+
+@benchmark("client.validate_resource_uris_allowlisted")
+def client_validate_resource_uris_allowlisted():
+    from corezilla.app.services.ClientService import ClientService
+
+    resources = ["https://api.example.com", "https://files.example.com/v2", "https://example.com/resource"]
+    allowed = frozenset(resources)
+    return lambda: ClientService.validate_resource_uris(resources, allowed)
+
+
+@benchmark("client.generate_client_secret")
+def client_generate_client_secret():
+    from corezilla.app.models import Client
+
+    return Client._generate_client_secret
+
+
+@benchmark("schema.load_create_client_request")
+def schema_load_create_client_request():
+    from corezilla.app.schemas.create_client_request_schema import CreateClientRequest
+
+    schema = CreateClientRequest()
+    payload = {"metadata_blob": CLIENT_METADATA, "configuration_blob": CLIENT_CONFIGURATION}
+    return lambda: schema.load(payload)
+
+
+@benchmark("schema.load_update_client_request")
+def schema_load_update_client_request():
+    from corezilla.app.schemas.update_client_request_schema import UpdateClientRequest
+
+    schema = UpdateClientRequest()
+    payload = {"name": "Example", "metadata": CLIENT_METADATA, "configuration": CLIENT_CONFIGURATION}
+    return lambda: schema.load(payload)
+
+
+@benchmark("handlers.handle_error_json")
+def handlers_handle_error_json():
+    from corezilla.app.utils.handlers import handle_error
+
+    return lambda: handle_error(None, "invalid_request", "Missing 'client_id' parameter.", state="af0ifjsldkj")
+
+
+@benchmark("handlers.handle_error_redirect")
+def handlers_handle_error_redirect():
+    from corezilla.app.utils.handlers import handle_error
+
+    return lambda: handle_error("https://example.com/callback", "access_denied", "Access Denied.", state="af0ifjsldkj")
+
+
+class BenchmarkConfiguration(TestConfiguration):
+    DEBUG = False
+    ISSUER_NAME = "https://authzilla.example.com"
+    AUDIENCE = "https://api.example.com"
+
+
+def measure(function, rounds):
+    """
+    Returns:
+        float: The fastest time per call, in seconds, of `rounds` rounds.
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    # autorange stops at the first count taking 0.2 seconds or more; use at least that per round
+    return min(timer.repeat(repeat=rounds, number=number)) / number
+
+
+def calibration():
+    """A fixed workload whose time tracks the speed of the machine rather than of the code."""
+    return sum(i * i for i in range(1000))
+
+
+def run(names, rounds):
+    app = create_app(BenchmarkConfiguration)
+    results = {}
+    with app.test_request_context():
+        for name in names:
+            results[name] = measure(BENCHMARKS[name](), rounds)
+            print(f"{name:<40} {results[name] * 1e6:10.2f} us")
+    return results, measure(calibration, rounds)
+
+
+def compare(results, calibration_seconds, baseline, threshold):
+    """
+    Print the change of each benchmark from the baseline, relative to the calibration workload.
+
+    Returns:
+        list: The names of the benchmarks that are slower than the baseline by more than `threshold`.
+    """
+    speed = calibration_seconds / baseline["calibration"]
+    regressions = []
+    print(f"\nMachine speed relative to the baseline: {1 / speed:.2f}x")
+    print(f"Change from the baseline recorded with Python {baseline.get('python')} on {baseline.get('machine')}:")
+    for name, seconds in results.items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            print(f"{name:<40} {'no baseline':>10}")
+            continue
+        change = seconds / (previous * speed) - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<40} {change * 100:+9.1f}%{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", dest="keyword", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--save", action="store_true", help="Store the timings as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare the timings with the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Slowdown that fails --compare, as a fraction")
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.keyword or args.keyword in name]
+    results, calibration_seconds = run(names, args.rounds)
+
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, calibration_seconds, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+    if args.save:
+        benchmarks = {}
+        if args.keyword and args.baseline.exists():
+            baseline = json.loads(args.baseline.read_text())
+            # Keep the other benchmarks comparable by scaling them to this run's calibration
+            scale = calibration_seconds / baseline["calibration"]
+            benchmarks = {name: seconds * scale for name, seconds in baseline["benchmarks"].items()}
+        benchmarks.update(results)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}",
+            "calibration": calibration_seconds,
+            "benchmarks": benchmarks,
+        }, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Measure how much PKCE adds to redeeming an authorization code at /api/oauth/token.
+
+Usage:
+    python -m benchmarks.pkce_overhead [--requests 2000]
+
+Runs the token exchange through the Flask test client against an in-memory database, once with plain
+authorization codes and once with S256 PKCE, and prints latency percentiles for both along with the
+cost of the S256 verification on its own.
+"""
+import argparse
+import base64
+import hashlib
+import secrets
+import statistics
+import time
+import timeit
+
+from corezilla.app import create_app, db
+from corezilla.app.models import Client
+from corezilla.app.models.User import User
+from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService, verify_code_verifier
+from corezilla.config.test import TestConfiguration
+
+
+class BenchmarkConfiguration(TestConfiguration):
+    DEBUG = False
+    SQLALCHEMY_INSTRUMENTATION_ENABLED = False
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run(test_client, client, user, requests, pkce):
+    samples = []
+    for _ in range(requests):
+        form = {"grant_type": "authorization_code", "client_id": client.client_id, "client_secret": client.client_secret}
+        if pkce:
+            verifier = secrets.token_urlsafe(48)
+            challenge = base64.urlsafe_b64encode(hashlib.sha256(verifier.encode()).digest()).rstrip(b"=").decode()
+            form["code"] = AuthorizationCodeService.generate_authorization_code(
+                client.client_id, user.user_id, code_challenge=challenge, code_challenge_method="S256"
+            )
+            form["code_verifier"] = verifier
+        else:
+            form["code"] = AuthorizationCodeService.generate_authorization_code(client.client_id, user.user_id)
+
+        started_at = time.perf_counter()
+        response = test_client.post("/api/oauth/token", data=form)
+        samples.append(time.perf_counter() - started_at)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return samples
+
+
+def report(label, samples):
+    print(
+        f"{label:>10}: median {statistics.median(samples) * 1e6:8.1f} us, "
+        f"p95 {percentile(samples, 0.95) * 1e6:8.1f} us, p99 {percentile(samples, 0.99) * 1e6:8.1f} us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app(BenchmarkConfiguration)
+    with app.app_context():
+        db.create_all()
+        user = User(username="bench", email="bench@example.invalid", password="password")
+        client = Client(owner=user, name="Benchmark Client")
+        db.session.add_all([user, client])
+        db.session.commit()
+
+        with app.test_client() as test_client:
+            with test_client.session_transaction() as session:
+                session["_user_id"] = user.fs_uniquifier
+                session["_fresh"] = True
+
+            # Warm up the caches and lazily built state before measuring
+            run(test_client, client, user, 100, pkce=False)
+            run(test_client, client, user, 100, pkce=True)
+
+            without_pkce = run(test_client, client, user, args.requests, pkce=False)
+            with_pkce = run(test_client, client, user, args.requests, pkce=True)
+
+    verifier = secrets.token_urlsafe(96)
+    challenge = base64.urlsafe_b64encode(hashlib.sha256(verifier.encode()).digest()).rstrip(b"=").decode()
+    loops = 100_000
+    verify_seconds = timeit.timeit(lambda: verify_code_verifier(verifier, challenge, "S256"), number=loops) / loops
+
+    report("no PKCE", without_pkce)
+    report("S256 PKCE", with_pkce)
+    print(f"median overhead: {(statistics.median(with_pkce) - statistics.median(without_pkce)) * 1e6:+.1f} us")
+    print(f"S256 verification alone: {verify_seconds * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,32 @@
 import logging
-from uuid import uuid4
+import time
 
-from flask import Flask, g
+import click
+from flask import Flask, current_app, g, request
 from flask_login import LoginManager
 from flask_marshmallow import Marshmallow
-from flask_migrate import Migrate
 from flask_principal import Principal, Identity, AnonymousIdentity, RoleNeed, Permission, identity_loaded, UserNeed
 from flask_security import Security, SQLAlchemyUserDatastore, current_user
-from flask_smorest import Api
 from flask_sqlalchemy import SQLAlchemy
 
+from corezilla.app.utils.assets import register_assets
+from corezilla.app.utils.instrumentation import QueryStats, register_request_metrics, register_sql_instrumentation
+from corezilla.app.utils.openapi import LazySpecApi
+from corezilla.app.utils.serialization import register_json_provider
+from corezilla.app.utils.templates import register_template_cache
+from corezilla.app.utils.tracing import register_request_tracing, resolve_request_id
+
 # Initialize extensions without app context
-api = Api()
+api = LazySpecApi()
 db = SQLAlchemy()
 marshmallow = Marshmallow()
-migrate = Migrate()
 security = Security()
 principals = Principal()
 login_manager = LoginManager()
 
 # Define permissions
 user_role_permission = Permission(RoleNeed("User"))
+admin_role_permission = Permission(RoleNeed("Admin"))
 
 
 def create_app(config_object) -> Flask:
@@ -36,6 +42,7 @@ def create_app(config_object) -> Flask:
     app = Flask(__name__.split('.')[0], template_folder=config_object.TEMPLATE_FOLDER, static_folder=config_object.STATIC_FOLDER)
     app.config.from_object(config_object)
     app.url_map.strict_slashes = True
+    register_json_provider(app)
 
     @app.context_processor
     def inject_html_metadata():
@@ -52,8 +59,22 @@ def create_app(config_object) -> Flask:
         register_extensions(app)
         register_blueprints(app)
 
+        if app.config.get("SQLALCHEMY_INSTRUMENTATION_ENABLED"):
+            register_sql_instrumentation(app, db.engines.values())
+
+        if app.config.get("METRICS_ENABLED"):
+            register_metrics(app)
+
+        if app.config.get("PROFILER_ENABLED"):
+            register_profiling(app)
+
+    register_session_interface(app)
+    register_assets(app)
+    register_template_cache(app)
+
     # Set request id for each request
     app.before_request(before_request_handler)
+    register_request_tracing(app)
 
     # Set up identity loaded signals for role-based permissions
     identity_loaded.connect_via(app)(on_identity_loaded)
@@ -74,7 +95,7 @@ def on_identity_loaded(sender, identity):
         # Assign roles to the current user, if any
         if hasattr(current_user, 'roles') and current_user.roles:
             for role in current_user.roles:
-                identity.provides.add(RoleNeed(role._name))
+                identity.provides.add(RoleNeed(role.name))
 
         logging.debug(f"Identity loaded for user: {identity.id}")
 
@@ -88,7 +109,8 @@ def register_extensions(app: Flask) -> None:
     """
 
     db.init_app(app)
-    migrate.init_app(app, db, render_as_batch=True)
+    if click.get_current_context(silent=True) is not None:
+        register_migrations(app)
     marshmallow.init_app(app)
     api.init_app(app)
 
@@ -107,6 +129,21 @@ def register_extensions(app: Flask) -> None:
     logging.info("Extensions registered successfully")
 
 
+def register_migrations(app: Flask) -> None:
+    """
+    Initialize Flask-Migrate, which provides the `flask db` commands.
+
+    Importing Flask-Migrate imports Alembic, so it is only set up when the app is loaded by the
+    `flask` command line rather than in every worker and test.
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    from flask_migrate import Migrate
+
+    Migrate(app, db, render_as_batch=True)
+
+
 def register_blueprints(app: Flask):
     """
     Register Flask blueprints (API and web routes).
@@ -139,6 +176,58 @@ def register_blueprints(app: Flask):
     logging.info("Blueprints registered successfully")
 
 
+def register_metrics(app: Flask) -> None:
+    """
+    Expose the metrics registry at `/metrics` and record request latencies.
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    from corezilla.app.controllers.MetricsController import metrics_web
+
+    app.register_blueprint(metrics_web)
+    register_request_metrics(app)
+
+    logging.info("Metrics endpoint registered")
+
+
+def register_profiling(app: Flask) -> None:
+    """
+    Attach the sampling profiler and expose the admin API used to start and stop it.
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    from corezilla.app.controllers.AdminApi import admin_api
+    from corezilla.app.utils.profiling import register_profiler
+
+    register_profiler(app)
+    api.register_blueprint(admin_api)
+
+    logging.info("Profiler registered")
+
+
+def register_session_interface(app: Flask) -> None:
+    """
+    Replace Flask's cookie sessions with server-side sessions when `SESSION_BACKEND` is set.
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    if not app.config.get("SESSION_BACKEND"):
+        return
+
+    from corezilla.app.utils.sessions import ServerSideSessionInterface, create_session_store
+
+    app.session_interface = ServerSideSessionInterface(
+        create_session_store(app.config),
+        sweep_interval=app.config.get("SESSION_SWEEP_INTERVAL_SECONDS", 60),
+        sweep_batch_size=app.config.get("SESSION_SWEEP_BATCH_SIZE", 500),
+    )
+
+    logging.info("Server-side sessions enabled using the %s backend", app.config["SESSION_BACKEND"])
+
+
 @login_manager.user_loader
 def load_user(user_id):
     """
@@ -156,7 +245,10 @@ def load_user(user_id):
 
 def before_request_handler():
     """
-    Assign a unique request ID for every request.
+    Assign a request ID for every request, reusing a well-formed incoming one, and start counting its
+    database queries.
     """
-    g.request_id = uuid4()
-    logging.debug(f"Request ID: {g.request_id}")
+    g.request_started_at = time.perf_counter()
+    g.request_id = resolve_request_id(request.headers.get(current_app.config.get("REQUEST_ID_HEADER", "X-Request-ID")))
+    g.query_stats = QueryStats()
+    logging.debug("Request ID: %s", g.request_id)
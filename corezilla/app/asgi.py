@@ -0,0 +1,259 @@
+import asyncio
+import base64
+import binascii
+import contextvars
+import json
+import time
+from urllib.parse import parse_qsl
+
+from flask import Flask
+
+from corezilla.app.controllers.AuthorizationApi import resolve_exchange_audience, tokens_issued
+from corezilla.app.services.ClientService import ClientService
+from corezilla.app.services.TokenService import (
+    ACCESS_TOKEN_TYPE, TOKEN_EXCHANGE_GRANT_TYPE, TokenExchangeError, TokenService
+)
+from corezilla.app.utils.async_db import AsyncDatabase
+from corezilla.app.utils.instrumentation import http_request_duration_seconds
+from corezilla.app.utils.tracing import resolve_request_id
+
+FORM_CONTENT_TYPE = "application/x-www-form-urlencoded"
+
+
+class OAuthASGIApplication:
+    """
+    An ASGI application serving the token and introspection endpoints natively on the event loop, and
+    every other request through the Flask application.
+
+    The native endpoints handle the grants that need no user session: `client_credentials` and token
+    exchange. A client whose credentials are cached is answered without any I/O. A cache miss, and
+    introspecting a refresh token, read the database through SQLAlchemy's asyncio extension, so
+    a slow database holds up a coroutine rather than a thread. Tokens are issued by the same
+    `TokenService` methods as the Flask endpoints, so the responses are the same.
+
+    Other grant types, like every other request, are passed to the Flask application, which
+    `asgiref.wsgi.WsgiToAsgi` runs in a thread pool.
+    """
+
+    NATIVE_GRANT_TYPES = ("client_credentials", TOKEN_EXCHANGE_GRANT_TYPE)
+
+    def __init__(self, app: Flask, database=None, prefix="/api/oauth"):
+        from asgiref.wsgi import WsgiToAsgi
+
+        self.app = app
+        self.database = database or AsyncDatabase.from_config(app.config)
+        self.wsgi = WsgiToAsgi(app)
+        self.request_id_header = app.config.get("REQUEST_ID_HEADER", "X-Request-ID")
+        self.routes = {f"{prefix}/token": self.token, f"{prefix}/introspect": self.introspect}
+        self.request_duration = (
+            http_request_duration_seconds.labels(blueprint="oauth") if app.config.get("METRICS_ENABLED") else None
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+
+        handler = self.routes.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if handler is None:
+            return await self.forward(scope, receive, send)
+
+        started_at = time.perf_counter()
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        body = await read_body(receive)
+
+        if headers.get("content-type", "").split(";")[0].strip() != FORM_CONTENT_TYPE:
+            return await self.forward(scope, replay_body(body, receive), send)
+        # Reversed so that the first value of a repeated field wins, as it does in `request.form`
+        form = dict(parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True)[::-1])
+
+        with self.app.app_context():
+            result = await handler(form, headers)
+        if result is None:
+            return await self.forward(scope, replay_body(body, receive), send)
+
+        status, payload, extra_headers = result
+        request_id = resolve_request_id(headers.get(self.request_id_header.lower()))
+        await send_json(send, status, payload, [(self.request_id_header, request_id), *extra_headers])
+
+        if self.request_duration is not None:
+            self.request_duration.observe(time.perf_counter() - started_at)
+
+    async def forward(self, scope, receive, send):
+        """
+        Pass a request to the Flask application.
+
+        `WsgiToAsgi` calls `send` from the WSGI thread through `AsyncToSync`, which runs it in a copy of
+        that thread's context, one that still names the thread's executor. An ASGI server that starts
+        the next request on a kept-alive connection from within `send` would start it in that context,
+        and its own call into the Flask application would then fail. `send` is therefore always run in
+        a copy of the context the request arrived in.
+        """
+        context = contextvars.copy_context()
+
+        async def send_in_request_context(message):
+            await asyncio.create_task(send(message), context=context.copy())
+
+        return await self.wsgi(scope, receive, send_in_request_context)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.database.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def authenticate(self, form, headers):
+        """
+        Authenticate a confidential client as `authenticate_client_request` does.
+
+        Returns:
+            tuple: `(client, None)` on success, or `(None, (status, payload, headers))`.
+        """
+        client_id, client_secret = form.get("client_id"), form.get("client_secret")
+        basic = parse_basic_authorization(headers.get("authorization"))
+        if basic is not None:
+            client_id, client_secret = basic
+
+        client = await ClientService.authenticate_client_async(client_id, client_secret, self.database)
+        if not client:
+            extra_headers = [("WWW-Authenticate", 'Basic realm="token"')] if basic is not None else []
+            return None, (401, {"error": "invalid_client", "error_description": "Invalid client credentials."}, extra_headers)
+
+        if client.is_public:
+            return None, (400, {
+                "error": "unauthorized_client",
+                "error_description": "Public clients cannot use this grant."
+            }, [])
+
+        return client, None
+
+    async def token(self, form, headers):
+        """
+        Token Endpoint for the grants that need no user session.
+
+        Returns:
+            tuple: `(status, payload, headers)`, or None to pass the request to the Flask application.
+        """
+        grant_type = form.get("grant_type")
+        if grant_type not in self.NATIVE_GRANT_TYPES:
+            return None
+
+        client, error_response = await self.authenticate(form, headers)
+        if error_response:
+            return error_response
+
+        if grant_type == "client_credentials":
+            token_response = TokenService.handle_client_credentials_grant(client, form.get("scope"))
+            tokens_issued.inc(grant_type="client_credentials")
+            return 200, token_response, []
+
+        if form.get("resource") or form.get("audience"):
+            # Load the client's registered resources without blocking, so the check below finds them cached
+            await ClientService.get_policy_async(client, self.database)
+
+        try:
+            audience = resolve_exchange_audience(client, form.get("audience"), form.get("resource"))
+            token_response = TokenService.handle_token_exchange_grant(
+                client,
+                form.get("subject_token"),
+                form.get("subject_token_type") or ACCESS_TOKEN_TYPE,
+                audience,
+                form.get("scope"),
+            )
+        except TokenExchangeError as e:
+            return 400, {"error": e.error, "error_description": e.description}, []
+
+        tokens_issued.inc(grant_type="token_exchange")
+        return 200, token_response, []
+
+    async def introspect(self, form, headers):
+        """
+        Introspection Endpoint, answering as `TokenService.introspect_token` does.
+        """
+        token = form.get("token")
+        if not token:
+            return 400, {
+                "code": 400,
+                "status": "invalid_request",
+                "message": "Missing token parameter",
+                "errors": {}
+            }, []
+
+        claims = TokenService.introspection_claims(token)
+        if claims is not None and claims.get("token_type") == "refresh_token" and claims.get("fid") is not None:
+            family = await self.database.get_refresh_token_family(claims["fid"])
+            if not TokenService.is_current_refresh_token(claims, family):
+                claims = None
+
+        return 200, TokenService.introspection_response(claims) if claims else {"active": False}, []
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def replay_body(body, receive):
+    """Return a `receive` callable that yields an already read request body before deferring to `receive`."""
+    replayed = False
+
+    async def receive_replayed():
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return receive_replayed
+
+
+def parse_basic_authorization(value):
+    """
+    Returns:
+        tuple: `(username, password)` from an HTTP Basic `Authorization` header, or None.
+    """
+    if not value or not value[:6].lower() == "basic ":
+        return None
+    try:
+        username, _, password = base64.b64decode(value[6:].strip(), validate=True).decode("utf-8").partition(":")
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    return username, password
+
+
+async def send_json(send, status, payload, headers):
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            *((name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_asgi_app(app: Flask, database=None) -> OAuthASGIApplication:
+    """
+    Wrap the Flask application for an ASGI server such as uvicorn.
+
+    Args:
+        app (Flask): The Flask application instance
+        database (AsyncDatabase): The asyncio database. Defaults to one built from the app's configuration.
+
+    Returns:
+        OAuthASGIApplication: The ASGI application
+    """
+    return OAuthASGIApplication(app, database)
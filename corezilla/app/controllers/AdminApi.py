@@ -0,0 +1,53 @@
+import http
+
+from flask import current_app
+from flask.views import MethodView
+from flask_login import login_required
+from flask_smorest import Blueprint
+from flask_smorest.error_handler import ErrorSchema
+
+from corezilla.app import admin_role_permission
+from corezilla.app.schemas.profiler_schema import StartProfilerRequest, ProfilerStatusResponse
+
+admin_api = Blueprint("admin", "admin", url_prefix="/api/admin", description="Administrative endpoints")
+
+
+@admin_api.route("/profiler")
+class ProfilerAPI(MethodView):
+    decorators = [admin_role_permission.require(http_exception=http.HTTPStatus.FORBIDDEN), login_required]
+
+    @admin_api.response(status_code=http.HTTPStatus.OK, schema=ProfilerStatusResponse)
+    @admin_api.alt_response(status_code=http.HTTPStatus.UNAUTHORIZED, schema=ErrorSchema, success=False)
+    @admin_api.alt_response(status_code=http.HTTPStatus.FORBIDDEN, schema=ErrorSchema, success=False)
+    def get(self):
+        """Get Profiler Status"""
+        return current_app.extensions["profiler"].status()
+
+    @admin_api.arguments(StartProfilerRequest, location="json")
+    @admin_api.response(status_code=http.HTTPStatus.ACCEPTED, schema=ProfilerStatusResponse)
+    @admin_api.alt_response(status_code=http.HTTPStatus.CONFLICT, schema=ErrorSchema, success=False)
+    def post(self, args):
+        """
+        Start Profiler
+
+        Samples the stacks of requests for `duration` seconds, or of a `sample_rate` fraction of requests,
+        and writes them in the collapsed-stack format to `PROFILER_OUTPUT_DIR` when the profile ends.
+        """
+        profiler = current_app.extensions["profiler"]
+        try:
+            profiler.start(duration=args.get("duration"), sample_rate=args.get("sample_rate"))
+        except RuntimeError as e:
+            return {
+                "code": http.HTTPStatus.CONFLICT,
+                "status": "error",
+                "message": str(e),
+                "errors": {}
+            }, http.HTTPStatus.CONFLICT
+        return profiler.status(), http.HTTPStatus.ACCEPTED
+
+    @admin_api.response(status_code=http.HTTPStatus.OK, schema=ProfilerStatusResponse)
+    def delete(self):
+        """Stop Profiler"""
+        profiler = current_app.extensions["profiler"]
+        profiler.stop()
+        return profiler.status()
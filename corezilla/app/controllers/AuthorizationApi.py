@@ -1,7 +1,7 @@
 import http.client
 from urllib.parse import urlencode
 
-from flask import redirect
+from flask import current_app, jsonify, redirect, url_for
 from flask import request
 from flask.views import MethodView
 from flask_login import current_user
@@ -10,14 +10,73 @@ from flask_smorest.error_handler import ErrorSchema
 
 from corezilla.app.enums.ResponseTypeEnum import ResponseType
 from corezilla.app.schemas.oauth_schema import AuthorizationCodeRequest, AuthorizationCodeResponse
-from corezilla.app.schemas.oauth_schema import TokenResponseSchema
-from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService
+from corezilla.app.schemas.oauth_schema import TokenResponseSchema, TokenExchangeBatchRequest, TokenExchangeBatchResponse
+from corezilla.app.schemas.oauth_schema import IntrospectionResponse
+from corezilla.app.schemas.oauth_schema import DeviceAuthorizationResponse, DeviceVerificationRequest, DeviceVerificationResponse
+from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService, is_valid_code_challenge
 from corezilla.app.services.ClientService import ClientService
-from corezilla.app.services.TokenService import TokenService
+from corezilla.app.services.DeviceAuthorizationService import DeviceAuthorizationService, DeviceAuthorizationError, DEVICE_CODE_GRANT_TYPE
+from corezilla.app.services.TokenService import TokenService, TokenExchangeError, ACCESS_TOKEN_TYPE, TOKEN_EXCHANGE_GRANT_TYPE
 from corezilla.app.utils.handlers import handle_error
+from corezilla.app.utils.metrics import registry
 
 oauth_api = Blueprint("oauth", "oauth", url_prefix="/api/oauth", description="OAuth2 authorization endpoints")
 
+tokens_issued = registry.counter("oauth_tokens_issued_total", "Tokens issued by the token endpoint, by grant type.")
+
+def authenticate_client_request(client_id=None, client_secret=None):
+    """
+    Authenticate the confidential client making a token request.
+
+    Credentials are taken from HTTP Basic authentication if present, otherwise from the arguments. Errors
+    follow RFC 6749 section 5.2 and are serialized here so they bypass the token response schema.
+
+    Returns:
+        tuple: `(client, None)` on success, or `(None, error_response)`.
+    """
+    if request.authorization and request.authorization.type == "basic":
+        client_id = request.authorization.username
+        client_secret = request.authorization.password
+
+    client = ClientService.authenticate_client(client_id, client_secret)
+    if not client:
+        response = jsonify({"error": "invalid_client", "error_description": "Invalid client credentials."})
+        if request.authorization:
+            response.headers["WWW-Authenticate"] = 'Basic realm="token"'
+        return None, (response, http.HTTPStatus.UNAUTHORIZED)
+
+    if client.is_public:
+        return None, (jsonify({
+            "error": "unauthorized_client",
+            "error_description": "Public clients cannot use this grant."
+        }), http.HTTPStatus.BAD_REQUEST)
+
+    return client, None
+
+
+def authenticate_device_client(client_id=None, client_secret=None):
+    """
+    Identify the client on a device authorization or device code request.
+
+    Devices are usually public clients and send only their `client_id`; a confidential client must
+    authenticate as it would for any other grant.
+
+    Returns:
+        tuple: `(client, None)` on success, or `(None, error_response)`.
+    """
+    if client_secret or request.authorization:
+        return authenticate_client_request(client_id, client_secret)
+
+    client = ClientService.get_client(client_id) if client_id else None
+    if not client or not client.is_public:
+        return None, (jsonify({
+            "error": "invalid_client",
+            "error_description": "Invalid client credentials."
+        }), http.HTTPStatus.UNAUTHORIZED)
+
+    return client, None
+
+
 def redirect_uri_factory(redirect_uri, **params):
     """Helper function to append query parameters to a redirect URI."""
     from urllib.parse import urlencode
@@ -43,12 +102,17 @@ class AuthorizationApi(MethodView):
         MUST first verify the identity of the resource owner.
         """
 
-        # Ensure the user is authenticated
+        # Ensure the user is authenticated. Only a URI registered for the client may receive the error;
+        # any other is answered in JSON, so the endpoint cannot be used as an open redirect.
         if not current_user.is_authenticated:
+            requested_client = ClientService.get_client(args["client_id"]) if args.get("client_id") else None
             return handle_error(
-                redirect_uri=args.get("redirect_uri"),
+                redirect_uri=ClientService.get_registered_redirect_uri(
+                    requested_client, args.get("redirect_uri")
+                ) if requested_client else None,
                 error="unauthorized",
-                description="User is not authenticated"
+                description="User is not authenticated",
+                state=args.get("state")
             )
 
         client_id = args.get("client_id")
@@ -57,6 +121,8 @@ class AuthorizationApi(MethodView):
         response_type = args.get("response_type")
         resource = args.getlist("resource") if "resource" in request.args else []
         state = args.get("state")
+        code_challenge = args.get("code_challenge")
+        code_challenge_method = args.get("code_challenge_method", "S256")
 
         # Fetch additional ignored query parameters
         additional_params = {k: v for k, v in request.args.items() if k not in args}
@@ -177,7 +243,7 @@ class AuthorizationApi(MethodView):
         # https://datatracker.ietf.org/doc/html/rfc8707#name-resource-parameter
         if resource:
             try:
-                ClientService.validate_resource_uris(resource)
+                ClientService.validate_resource_uris(resource, ClientService.get_resource_allowlist(requested_client))
             except ValueError as e:
                 return {
                     'code': 400,
@@ -186,7 +252,37 @@ class AuthorizationApi(MethodView):
                     'errors': {}
                 }, http.HTTPStatus.BAD_REQUEST
 
-        authorization_code = AuthorizationCodeService.generate_authorization_code(client_id, current_user.user_id)
+        # Proof Key for Code Exchange
+        # https://www.ietf.org/archive/id/draft-ietf-oauth-v2-1-12.html#section-4.1.1
+        if code_challenge and not is_valid_code_challenge(code_challenge, code_challenge_method):
+            return handle_error(
+                redirect_uri=None,
+                error="invalid_request",
+                description="Invalid 'code_challenge' or unsupported 'code_challenge_method'.",
+                state=state
+            )
+
+        if code_challenge and code_challenge_method == "plain" and not current_app.config.get("PKCE_PLAIN_ALLOWED"):
+            return handle_error(
+                redirect_uri=None,
+                error="invalid_request",
+                description="Unsupported 'code_challenge_method'; use 'S256'.",
+                state=state
+            )
+
+        # https://www.ietf.org/archive/id/draft-ietf-oauth-v2-1-12.html#section-7.5.1
+        if not code_challenge and (requested_client.is_public or current_app.config.get("PKCE_REQUIRED")):
+            return handle_error(
+                redirect_uri=None,
+                error="invalid_request",
+                description="Missing 'code_challenge' parameter.",
+                state=state
+            )
+
+        authorization_code = AuthorizationCodeService.generate_authorization_code(
+            client_id, current_user.user_id, code_challenge=code_challenge, code_challenge_method=code_challenge_method,
+            redirect_uri=redirect_uri
+        )
         redirect_params = {"code": authorization_code}
 
         if state:
@@ -204,6 +300,17 @@ class TokenApi(MethodView):
     @oauth_api.response(http.HTTPStatus.OK, TokenResponseSchema)
     @oauth_api.alt_response(status_code=http.HTTPStatus.BAD_REQUEST, schema=ErrorSchema, success=False)
     def post(self):
+        data = request.form
+        grant_type = data.get("grant_type")
+
+        # Machine-to-machine grants authenticate the client itself, with no user session involved.
+        if grant_type == "client_credentials":
+            return self.client_credentials_grant(data)
+        if grant_type == TOKEN_EXCHANGE_GRANT_TYPE:
+            return self.token_exchange_grant(data)
+        if grant_type == DEVICE_CODE_GRANT_TYPE:
+            return self.device_code_grant(data)
+
         if not current_user.is_authenticated:
             return {
                 "code": http.HTTPStatus.UNAUTHORIZED,
@@ -212,8 +319,6 @@ class TokenApi(MethodView):
                 "errors": {}
             }, http.HTTPStatus.UNAUTHORIZED
 
-        data = request.form
-        grant_type = data.get("grant_type")
         client_id = data.get("client_id")
         client_secret = data.get("client_secret")
 
@@ -231,12 +336,11 @@ class TokenApi(MethodView):
         if grant_type == "authorization_code":
             code = data.get("code")
             redirect_uri = data.get("redirect_uri")
-            token_response = TokenService.handle_authorization_code_grant(client, code, redirect_uri)
+            code_verifier = data.get("code_verifier")
+            token_response = TokenService.handle_authorization_code_grant(client, code, redirect_uri, code_verifier)
         elif grant_type == "refresh_token":
             refresh_token = data.get("refresh_token")
             token_response = TokenService.handle_refresh_token_grant(client, refresh_token)
-        elif grant_type == "client_credentials":
-            token_response = TokenService.handle_client_credentials_grant(client)
         else:
             return {
                 "code": http.HTTPStatus.BAD_REQUEST,
@@ -245,6 +349,13 @@ class TokenApi(MethodView):
                 "errors": {}
             }, http.HTTPStatus.BAD_REQUEST
 
+        if not token_response and grant_type == "authorization_code":
+            # https://datatracker.ietf.org/doc/html/rfc6749#section-5.2
+            return jsonify({
+                "error": "invalid_grant",
+                "error_description": "The authorization code is invalid, expired, or was issued for another client or redirect URI."
+            }), http.HTTPStatus.BAD_REQUEST
+
         if not token_response:
             return {
                 "code": http.HTTPStatus.BAD_REQUEST,
@@ -253,9 +364,223 @@ class TokenApi(MethodView):
                 "errors": {}
             }, http.HTTPStatus.BAD_REQUEST
 
+        tokens_issued.inc(grant_type=grant_type)
+        return token_response, http.HTTPStatus.OK
+
+    @staticmethod
+    def client_credentials_grant(data):
+        """
+        Client Credentials Grant
+
+        https://www.ietf.org/archive/id/draft-ietf-oauth-v2-1-12.html#section-4.2
+
+        The client authenticates with HTTP Basic or with `client_id` and `client_secret` in the request body.
+        """
+        client, error_response = authenticate_client_request(data.get("client_id"), data.get("client_secret"))
+        if error_response:
+            return error_response
+
+        token_response = TokenService.handle_client_credentials_grant(client, data.get("scope"))
+        tokens_issued.inc(grant_type="client_credentials")
+        return token_response, http.HTTPStatus.OK
+
+    @staticmethod
+    def token_exchange_grant(data):
+        """
+        Token Exchange Grant
+
+        https://datatracker.ietf.org/doc/html/rfc8693#section-2.1
+
+        Swaps an access token for one with a different audience and an equal or narrower scope.
+        """
+        client, error_response = authenticate_client_request(data.get("client_id"), data.get("client_secret"))
+        if error_response:
+            return error_response
+
+        try:
+            audience = resolve_exchange_audience(client, data.get("audience"), data.get("resource"))
+            token_response = TokenService.handle_token_exchange_grant(
+                client,
+                data.get("subject_token"),
+                data.get("subject_token_type") or ACCESS_TOKEN_TYPE,
+                audience,
+                data.get("scope"),
+            )
+        except TokenExchangeError as e:
+            return jsonify({"error": e.error, "error_description": e.description}), http.HTTPStatus.BAD_REQUEST
+
+        tokens_issued.inc(grant_type="token_exchange")
+        return token_response, http.HTTPStatus.OK
+
+    @staticmethod
+    def device_code_grant(data):
+        """
+        Device Authorization Grant
+
+        https://datatracker.ietf.org/doc/html/rfc8628#section-3.4
+
+        Polled by the device until the user approves or denies it, or the device code expires.
+        """
+        client, error_response = authenticate_device_client(data.get("client_id"), data.get("client_secret"))
+        if error_response:
+            return error_response
+
+        try:
+            token_response = TokenService.handle_device_code_grant(client, data.get("device_code"))
+        except DeviceAuthorizationError as e:
+            return jsonify({"error": e.error, "error_description": e.description}), http.HTTPStatus.BAD_REQUEST
+
+        tokens_issued.inc(grant_type="device_code")
         return token_response, http.HTTPStatus.OK
 
 
+def resolve_exchange_audience(client, audience, resource):
+    """
+    Pick the audience of an exchanged token from the `audience` or `resource` parameter.
+
+    Either must be the configured `AUDIENCE`, one of `TOKEN_EXCHANGE_AUDIENCES`, or one of the
+    resources registered for the client, so that a client can only obtain tokens for the services it
+    was registered to call. A client that has registered no resources can only use the first two.
+
+    Raises:
+        TokenExchangeError: If `resource` is not an absolute URI without a fragment, or if the requested
+            audience or resource is not allowed for the client.
+    """
+    if resource:
+        try:
+            ClientService.validate_resource_uris(resource)
+        except ValueError:
+            raise TokenExchangeError("invalid_target", "The requested resource is invalid, missing, unknown, or malformed.")
+        if not is_exchange_target_allowed(client, resource):
+            raise TokenExchangeError("invalid_target", "The requested resource is unknown or not allowed for this client.")
+        return resource
+
+    if audience and not is_exchange_target_allowed(client, audience):
+        raise TokenExchangeError("invalid_target", "The requested audience is unknown or not allowed for this client.")
+    return audience
+
+
+def is_exchange_target_allowed(client, target):
+    """
+    Returns:
+        bool: Whether `client` may exchange tokens for the audience or resource `target`.
+    """
+    if target == current_app.config.get("AUDIENCE") or target in current_app.config.get("TOKEN_EXCHANGE_AUDIENCES", ()):
+        return True
+    allowed = ClientService.get_resource_allowlist(client)
+    return bool(allowed) and target in allowed
+
+
+@oauth_api.route("/token/batch")
+class TokenExchangeBatchApi(MethodView):
+    """
+    Performs several token exchanges in one request, for services that fan out to many downstream APIs.
+    """
+    @oauth_api.arguments(TokenExchangeBatchRequest, location="json")
+    @oauth_api.response(http.HTTPStatus.OK, TokenExchangeBatchResponse)
+    @oauth_api.alt_response(status_code=http.HTTPStatus.BAD_REQUEST, schema=ErrorSchema, success=False)
+    @oauth_api.alt_response(status_code=http.HTTPStatus.UNAUTHORIZED, schema=ErrorSchema, success=False)
+    def post(self, args):
+        """Batch Token Exchange
+
+        Each exchange is answered independently; a refused exchange returns an OAuth error object in
+        its position without failing the rest of the batch.
+        """
+        client, error_response = authenticate_client_request(args.get("client_id"), args.get("client_secret"))
+        if error_response:
+            return error_response
+
+        exchanges = args["exchanges"]
+        max_batch_size = current_app.config.get("TOKEN_EXCHANGE_MAX_BATCH_SIZE", 50)
+        if len(exchanges) > max_batch_size:
+            return jsonify({
+                "error": "invalid_request",
+                "error_description": f"A batch may contain at most {max_batch_size} exchanges."
+            }), http.HTTPStatus.BAD_REQUEST
+
+        results = [None] * len(exchanges)
+        valid = []
+        for index, exchange in enumerate(exchanges):
+            try:
+                audience = resolve_exchange_audience(client, exchange.get("audience"), exchange.get("resource"))
+            except TokenExchangeError as e:
+                results[index] = {"error": e.error, "error_description": e.description}
+                continue
+            valid.append((index, {
+                "subject_token": exchange.get("subject_token") or args.get("subject_token"),
+                "subject_token_type": exchange.get("subject_token_type") or args.get("subject_token_type"),
+                "audience": audience,
+                "scope": exchange.get("scope"),
+            }))
+
+        for (index, _), result in zip(valid, TokenService.handle_token_exchange_batch(client, [item for _, item in valid])):
+            results[index] = result
+
+        issued = sum(1 for result in results if "access_token" in result)
+        if issued:
+            tokens_issued.inc(issued, grant_type="token_exchange")
+        return {"results": results}, http.HTTPStatus.OK
+
+
+@oauth_api.route("/device_authorization")
+class DeviceAuthorizationApi(MethodView):
+    @oauth_api.response(http.HTTPStatus.OK, DeviceAuthorizationResponse)
+    @oauth_api.alt_response(status_code=http.HTTPStatus.UNAUTHORIZED, schema=ErrorSchema, success=False)
+    def post(self):
+        """Device Authorization Endpoint
+
+        https://datatracker.ietf.org/doc/html/rfc8628#section-3.1
+
+        Issues a device code for the device to poll the token endpoint with, and a short user code for
+        the user to enter at the verification URI from another device.
+        """
+        data = request.form
+        client, error_response = authenticate_device_client(data.get("client_id"), data.get("client_secret"))
+        if error_response:
+            return error_response
+
+        response = DeviceAuthorizationService.start(
+            client.client_id, data.get("scope"), url_for("oauth.DeviceVerificationApi", _external=True)
+        )
+        return response, http.HTTPStatus.OK
+
+
+@oauth_api.route("/device")
+class DeviceVerificationApi(MethodView):
+    @oauth_api.arguments(DeviceVerificationRequest, location="form")
+    @oauth_api.response(http.HTTPStatus.OK, DeviceVerificationResponse)
+    @oauth_api.alt_response(status_code=http.HTTPStatus.BAD_REQUEST, schema=ErrorSchema, success=False)
+    @oauth_api.alt_response(status_code=http.HTTPStatus.UNAUTHORIZED, schema=ErrorSchema, success=False)
+    @oauth_api.alt_response(status_code=http.HTTPStatus.TOO_MANY_REQUESTS, schema=ErrorSchema, success=False)
+    def post(self, args):
+        """Device Verification
+
+        https://datatracker.ietf.org/doc/html/rfc8628#section-3.3
+
+        The signed-in user approves or denies the device showing the user code. A device waiting on
+        the grant in this process is woken immediately.
+        """
+        if not current_user.is_authenticated:
+            return jsonify({
+                "error": "unauthorized",
+                "error_description": "User is not authenticated"
+            }), http.HTTPStatus.UNAUTHORIZED
+
+        resolve = DeviceAuthorizationService.approve if args["action"] == "approve" else DeviceAuthorizationService.deny
+        try:
+            grant = resolve(args["user_code"], current_user.user_id, request.remote_addr)
+        except DeviceAuthorizationError as e:
+            return jsonify({"error": e.error, "error_description": e.description}), http.HTTPStatus.TOO_MANY_REQUESTS
+
+        if grant is None:
+            return jsonify({
+                "error": "invalid_request",
+                "error_description": "The user code is invalid, expired or has already been used."
+            }), http.HTTPStatus.BAD_REQUEST
+
+        return {"status": grant.status}, http.HTTPStatus.OK
+
+
 @oauth_api.route("/revoke")
 class RevocationApi(MethodView):
     @oauth_api.response(http.HTTPStatus.NO_CONTENT)
@@ -289,7 +614,7 @@ class RevocationApi(MethodView):
 
 @oauth_api.route("/introspect")
 class IntrospectionApi(MethodView):
-    @oauth_api.response(http.HTTPStatus.OK, TokenResponseSchema)
+    @oauth_api.response(http.HTTPStatus.OK, IntrospectionResponse)
     @oauth_api.alt_response(status_code=http.HTTPStatus.BAD_REQUEST, schema=ErrorSchema, success=False)
     def post(self):
         """
@@ -1,7 +1,7 @@
 import http
 import logging
 
-from flask import request
+from flask import jsonify, request
 from flask.views import MethodView
 from flask_login import login_required, current_user
 from flask_smorest import Blueprint
@@ -11,8 +11,12 @@ from sqlalchemy.exc import SQLAlchemyError
 from corezilla.app import db
 from corezilla.app.models.Client import Client, ClientMetadata, ClientConfiguration
 from corezilla.app.schemas.create_client_request_schema import CreateClientRequest, ReadClientRequest
-from corezilla.app.schemas.create_client_response_schema import CreateClientResponseSchema, GetClientResponseSchema, ClientMetadataResponseSchema, ClientConfigurationResponseSchema
+from corezilla.app.schemas.create_client_response_schema import (
+    CreateClientResponseSchema, GetClientResponseSchema, client_response_schema, clients_response_schema, dump_client_response
+)
 from corezilla.app.schemas.update_client_request_schema import UpdateClientRequest
+from corezilla.app.services.ClientService import ClientService
+from corezilla.app.utils.etags import make_etag, not_modified, with_etag
 
 client_api = Blueprint("clients", "clients", url_prefix="/api/clients", description="Client endpoints")
 
@@ -20,7 +24,7 @@ client_api = Blueprint("clients", "clients", url_prefix="/api/clients", descript
 @client_api.route("/")
 class ClientsAPI(MethodView):
     @client_api.arguments(ReadClientRequest, location="query", description="Retrieve a list of all OAuth clients associated with the authenticated user.")
-    @client_api.response(status_code=http.HTTPStatus.OK, schema=GetClientResponseSchema(), examples={
+    @client_api.response(status_code=http.HTTPStatus.OK, schema=clients_response_schema, examples={
         "Returning Multiple Clients": {
             "value": {
                 "clients": [{
@@ -138,11 +142,28 @@ class ClientsAPI(MethodView):
         page: int = args.get("page", 1)
         per_page: int = args.get("per_page", 50)
 
+        # The page's weak ETag covers the revisions of its clients and the total, so a poll that finds
+        # nothing changed is answered without loading any client
+        total = Client.query.filter_by(user_id=current_user.user_id).count()
+        revisions = (
+            ClientService.revisions_query()
+            .filter(Client.user_id == current_user.user_id)
+            .order_by(Client.id)
+            .limit(per_page)
+            .offset((page - 1) * per_page)
+            .all()
+        )
+        etag = make_etag("clients", page, per_page, total, *map(tuple, revisions))
+        response = not_modified(etag, weak=True)
+        if response:
+            return response
+
         # Query the database for the user's clients, with pagination
-        paginated_clients = Client.query.filter_by(user_id=current_user.user_id).paginate(
+        paginated_clients = Client.query.filter_by(user_id=current_user.user_id).order_by(Client.id).paginate(
             page=page,
             per_page=per_page,
-            error_out=False
+            error_out=False,
+            count=False
         )
 
         # Fetch the latest metadata and configuration for each client
@@ -153,7 +174,6 @@ class ClientsAPI(MethodView):
                 ClientMetadata.query.filter_by(client_id=client.id)
                 .first()
             )
-            metadata = ClientMetadataResponseSchema().load(metadata.metadata_blob, many=False)
 
             # Fetch the latest configuration
             configuration = (
@@ -161,9 +181,9 @@ class ClientsAPI(MethodView):
                 .order_by(ClientConfiguration.version.desc())
                 .first()
             )
-            configuration = ClientConfigurationResponseSchema().load(configuration.configuration_blob, many=False)
 
-            # Append client data with metadata and configuration to the list
+            # Append client data with metadata and configuration to the list. The blobs were validated
+            # when they were stored, so they are only dumped, which keeps just the documented fields.
             clients_data.append({
                 "client_id": client.client_id,
                 "name": client.client_name,
@@ -172,21 +192,22 @@ class ClientsAPI(MethodView):
                 "client_type": client.app_type,
                 "client_uri": client.client_uri,
 
-                "metadata": metadata,
-                "configuration": configuration,
+                "metadata": metadata.metadata_blob,
+                "configuration": configuration.configuration_blob,
             })
 
         # Serialize client data and prepare pagination details
-        serialized_clients = CreateClientResponseSchema().dump(clients_data, many=True)
+        serialized_clients = [dump_client_response(client_data) for client_data in clients_data]
 
         response = {
             "clients": serialized_clients,
             "page": page,
             "per_page": per_page,
-            "total": paginated_clients.total,
+            "total": total,
         }
 
-        return response, http.HTTPStatus.OK
+        # Already serialized, so skip dumping it again with the response schema
+        return with_etag(jsonify(response), etag, weak=True)
 
     @client_api.arguments(CreateClientRequest, location="json", content_type="application/json")
     @client_api.response(status_code=http.HTTPStatus.CREATED, schema=CreateClientResponseSchema, example={
@@ -305,9 +326,6 @@ class ClientsAPI(MethodView):
         db.session.add(client_configuration)
         db.session.commit()
 
-        serialised_client_configuration_response = ClientConfigurationResponseSchema().load(client_configuration.configuration_blob)
-        serialised_client_metadata_response = ClientMetadataResponseSchema().load(client_metadata.metadata_blob)
-
         client_data = {
             "client_id": client.client_id,
             "name": client.client_name,
@@ -316,13 +334,11 @@ class ClientsAPI(MethodView):
             "client_type": client.app_type,
             "client_uri": client.client_uri,
 
-            "metadata": serialised_client_metadata_response,
-            "configuration": serialised_client_configuration_response
+            "metadata": client_metadata.metadata_blob,
+            "configuration": client_configuration.configuration_blob
         }
 
-        response = CreateClientResponseSchema().dump(client_data)
-
-        return response, http.HTTPStatus.CREATED
+        return jsonify(dump_client_response(client_data)), http.HTTPStatus.CREATED
 
 
 @client_api.route("/<client_id>")
@@ -342,9 +358,13 @@ class ClientAPI(MethodView):
                 'errors': {}
             }, http.HTTPStatus.BAD_REQUEST
 
-        client = Client.query.filter_by(client_id=client_id, user_id=current_user.user_id).first()
+        revisions = (
+            ClientService.revisions_query()
+            .filter(Client.client_id == client_id, Client.user_id == current_user.user_id)
+            .first()
+        )
 
-        if not client:
+        if not revisions:
             return {
                 'code': 404,
                 'status': 'Not Found',
@@ -352,6 +372,14 @@ class ClientAPI(MethodView):
                 'errors': {}
             }, http.HTTPStatus.NOT_FOUND
 
+        # Answer a poll for an unchanged client before loading its blobs
+        etag = make_etag("client", *revisions)
+        response = not_modified(etag)
+        if response:
+            return response
+
+        client = Client.query.filter_by(client_id=client_id, user_id=current_user.user_id).first()
+
         client_data = {
             "client_id": client.client_id,
             "name": client.client_name,
@@ -361,12 +389,10 @@ class ClientAPI(MethodView):
             "client_uri": client.client_uri,
 
             "metadata": client.client_metadata.metadata_blob,
-            "configuration": client.client_configurations[0].configuration_blob
+            "configuration": ClientService.get_client_configuration(client_id).configuration_blob
         }
 
-        response = CreateClientResponseSchema().dump(client_data)
-
-        return response
+        return with_etag(jsonify(dump_client_response(client_data)), etag)
 
     @client_api.arguments(UpdateClientRequest, location="json", content_type="application/json")
     @client_api.response(status_code=http.HTTPStatus.OK, schema=CreateClientResponseSchema)
@@ -415,7 +441,7 @@ class ClientAPI(MethodView):
             logging.error("Database commit failed. Rolling back the session.", exc_info=True)
             raise Exception("An error occurred while committing to the database. Please try again later.") from e
 
-        response = CreateClientResponseSchema().dump(client)
+        response = client_response_schema.dump(client)
 
         return response
 
@@ -479,7 +505,7 @@ class ClientAPI(MethodView):
             db.session.commit()
             logging.info(f"Successfully updated client configuration for client ID {client_id}.")
 
-            client_response_data = GetClientResponseSchema().dump({"client": client})
+            client_response_data = clients_response_schema.dump({"client": client})
             logging.info(f"Response data prepared for client ID {client_id}. Returning response.")
 
             return client_response_data, http.HTTPStatus.OK
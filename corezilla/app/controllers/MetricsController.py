@@ -0,0 +1,28 @@
+from flask import Blueprint, Response
+
+from corezilla.app import db
+from corezilla.app.utils.metrics import registry, render_prometheus
+
+metrics_web = Blueprint('metrics', __name__)
+
+
+def collect_pool_stats():
+    """Sample connection pool usage for every engine of the current application."""
+    stats = {}
+    for bind_key, engine in db.engines.items():
+        pool = engine.pool
+        labels = (("bind", bind_key or "default"),)
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            # Pools such as SQLite's StaticPool do not track these numbers.
+            sample = getattr(pool, name, None)
+            if sample is not None:
+                stats[labels + (("state", name),)] = sample()
+    return stats
+
+
+registry.gauge("db_pool_connections", "Database connection pool usage.", collect_pool_stats)
+
+
+@metrics_web.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_prometheus(registry), mimetype="text/plain; version=0.0.4")
@@ -1,13 +1,50 @@
 import datetime
 import datetime as dt
+import hashlib
+import hmac
 import secrets
 import zlib
 
+from flask import current_app
 from sqlalchemy.ext.mutable import MutableDict
 from xid import Xid
 
 from corezilla.app import db
 
+# Prefix of stored client secret verifiers; stored values without it are legacy plaintext secrets.
+SECRET_VERIFIER_PREFIX = "$blake2b$"
+
+# `onupdate` of the `revision` columns, incremented in the UPDATE statement itself so concurrent updates
+# are all counted
+REVISION_INCREMENT = db.literal_column("revision") + 1
+
+
+def hash_client_secret(secret, key=None):
+    """
+    Derive the stored verifier for a client secret.
+
+    Client secrets are long random strings rather than user-chosen passwords, so a keyed BLAKE2b digest
+    is enough to make a leaked database useless without `CLIENT_SECRET_HASH_KEY`, and it is cheap
+    enough to compute on every token request. A slow password hash would add its full cost to each
+    machine-to-machine call without making a 128-byte random secret any harder to guess.
+
+    Args:
+        secret (str): The plaintext client secret.
+        key (bytes): The hashing key. Defaults to the application's `CLIENT_SECRET_HASH_KEY`.
+
+    Returns:
+        str: The verifier, `$blake2b$` followed by the hex digest.
+    """
+    if key is None:
+        key = current_app.config["CLIENT_SECRET_HASH_KEY"]
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    if len(key) > hashlib.blake2b.MAX_KEY_SIZE:
+        key = hashlib.blake2b(key).digest()
+
+    digest = hashlib.blake2b(secret.encode("utf-8"), key=key, digest_size=32).hexdigest()
+    return f"{SECRET_VERIFIER_PREFIX}{digest}"
+
 
 class ClientMetadata(db.Model):
     """A model representing metadata information for a client application.
@@ -23,6 +60,7 @@ class ClientMetadata(db.Model):
             specific client in the `client` table.
         metadata_blob (dict): A JSON object containing metadata fields that
             describe the application.
+        revision (int): Incremented every time the entry is updated.
 
     The `metadata_blob` JSON structure provides the following fields:
         - "description" (str): A brief description of the application.
@@ -51,6 +89,7 @@ class ClientMetadata(db.Model):
         id (Integer): Autoincrementing primary key for metadata entries.
         client_id (String): Foreign key linking to the `client` table.
         metadata_blob (JSON): A JSON field containing application metadata.
+        revision (Integer): Update counter, starting at 1.
     """
 
     __tablename__ = "client_metadata"
@@ -58,6 +97,7 @@ class ClientMetadata(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, index=True)
     client_id = db.Column(db.String, db.ForeignKey("client.id"), nullable=False)
     metadata_blob = db.Column(MutableDict.as_mutable(db.JSON), nullable=False)
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default="1", onupdate=REVISION_INCREMENT)
 
 
 class ClientConfiguration(db.Model):
@@ -78,6 +118,7 @@ class ClientConfiguration(db.Model):
         configuration_blob (dict): A JSON object containing configuration fields
             that outline the technical setup of the client.
         created_at (datetime): The timestamp when the configuration entry was created.
+        revision (int): Incremented every time the entry is updated in place.
 
     The `configuration_blob` JSON structure provides the following fields:
         - "oidc_conformant" (bool): Indicates if the client conforms to OpenID Connect (OIDC) standards.
@@ -88,6 +129,7 @@ class ClientConfiguration(db.Model):
             - "redirect_uris" (list): List of URIs where the client can be redirected after login.
             - "logout_uris" (list): List of URIs where the client can be redirected after logout.
             - "web_origins" (list): List of allowed web origins for client operations.
+            - "resources" (list): Optional list of resource indicators (RFC 8707) the client may request.
         - "cors" (dict): Cross-Origin Resource Sharing (CORS) configuration for the client:
             - "is_enabled" (bool): Whether CORS is enabled for the client.
             - "allowed_origins" (list): List of allowed origins for cross-origin requests.
@@ -143,6 +185,7 @@ class ClientConfiguration(db.Model):
         version (Integer): Version number for the client configuration.
         configuration_blob (JSON): A JSON field containing configuration details.
         created_at (DateTime): Timestamp indicating when the configuration was created.
+        revision (Integer): Update counter, starting at 1.
     """
 
     __tablename__ = "client_configuration"
@@ -151,6 +194,7 @@ class ClientConfiguration(db.Model):
     client_id = db.Column(db.String, db.ForeignKey("client.id"), nullable=False)
     version = db.Column(db.Integer, nullable=False)
     configuration_blob = db.Column(MutableDict.as_mutable(db.JSON), nullable=False)
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default="1", onupdate=REVISION_INCREMENT)
     created_at = db.Column(db.DateTime, default=dt.datetime.now(dt.UTC), nullable=False)
 
     def __init__(self, client_id, configuration_blob):
@@ -197,6 +241,8 @@ class Client(db.Model):
     client_uri = db.Column(db.String, nullable=True)
     is_public = db.Column(db.Boolean, default=False)
     app_type = db.Column(db.String, nullable=False, default="web")
+    # Incremented by every update, so that ETags change with the client
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default="1", onupdate=REVISION_INCREMENT)
 
     _client_secret = db.Column(db.String, nullable=True)
 
@@ -225,17 +271,48 @@ class Client(db.Model):
         self.app_type = app_type
         self.owner = owner
 
+        self.client_secret = self._generate_client_secret()
+
     @property
     def client_secret(self):
-        if self._client_secret is None:
-            # Generate and set the client_secret if it has not been initialized
-            self._client_secret = self._generate_client_secret()
-        return self._client_secret
+        """
+        The plaintext secret, available only on the instance that generated or set it.
+
+        Only a verifier is stored, so clients loaded from the database return None. The secret is
+        shown to the owner once, when the client is created.
+        """
+        return getattr(self, "_plaintext_secret", None)
 
     @client_secret.setter
     def client_secret(self, value):
-        # Allows setting client_secret explicitly if needed
-        self._client_secret = value
+        self._plaintext_secret = value
+        self._client_secret = hash_client_secret(value)
+
+    def verify_secret(self, secret):
+        """
+        Check a presented secret against the stored verifier in constant time.
+
+        Clients created before secrets were hashed still hold their plaintext secret. Those are compared
+        directly and, on a match, replaced with a verifier; the caller is responsible for committing
+        the change.
+
+        Args:
+            secret (str): The secret presented by the client.
+
+        Returns:
+            bool: True if the secret matches.
+        """
+        stored = self._client_secret
+        if not secret or stored is None:
+            return False
+
+        if stored.startswith(SECRET_VERIFIER_PREFIX):
+            return hmac.compare_digest(stored.encode("utf-8"), hash_client_secret(secret).encode("utf-8"))
+
+        if not hmac.compare_digest(stored.encode("utf-8"), secret.encode("utf-8")):
+            return False
+        self._client_secret = hash_client_secret(secret)
+        return True
 
     @staticmethod
     def _generate_client_secret():
@@ -1,3 +1,6 @@
+from sqlalchemy.exc import IntegrityError
+from xid import Xid
+
 from corezilla.app import db
 
 
@@ -49,4 +52,128 @@ class Token(db.Model):
         return False
 
     def __hash__(self):
-        return hash((self.token, self.client_id))
\ No newline at end of file
+        return hash((self.token, self.client_id))
+
+
+class RefreshTokenFamily(db.Model):
+    """
+    The chain of refresh tokens descended from a single authorization.
+
+    Refresh tokens are JWTs carrying their family id (`fid`) and generation (`gen`), so only one small
+    row is kept per authorization rather than one per token. Each rotation bumps `generation`; a token
+    from an older generation has already been exchanged, so presenting it again is reuse and revokes
+    the whole family. Every check is a primary key lookup, and every change a single update by
+    primary key.
+
+    Times are whole seconds since the epoch. `legacy_jti` is the `jti` of the refresh token from before
+    families existed that started the family, if any, so that such a token can only be used once.
+    """
+    __tablename__ = "refresh_token_family"
+
+    id = db.Column(db.String(20), primary_key=True)
+    client_id = db.Column(db.String(255), db.ForeignKey("client.client_id"), nullable=False)
+    user_id = db.Column(db.String(255), nullable=True, index=True)
+    scope = db.Column(db.Text, nullable=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.Integer, nullable=False)
+    rotated_at = db.Column(db.Integer, nullable=False)
+    last_used_at = db.Column(db.Integer, nullable=False)
+    revoked = db.Column(db.Boolean, nullable=False, default=False)
+    legacy_jti = db.Column(db.String(36), nullable=True, unique=True)
+
+    def __init__(self, client_id, user_id, scope, now):
+        self.id = Xid().string()
+        self.client_id = client_id
+        self.user_id = None if user_id is None else str(user_id)
+        self.scope = scope
+        self.generation = 0
+        self.created_at = self.rotated_at = self.last_used_at = int(now)
+        self.revoked = False
+
+    @classmethod
+    def start(cls, client_id, user_id, scope, now):
+        """Create and commit a new family."""
+        family = cls(client_id, user_id, scope, now)
+        db.session.add(family)
+        db.session.commit()
+        return family
+
+    @classmethod
+    def start_legacy(cls, client_id, user_id, scope, jti, now):
+        """
+        Create and commit a family for a refresh token issued before families existed.
+
+        Each token can start a family once; `legacy_jti` is unique, so of two requests presenting the
+        same token only one can.
+
+        Returns:
+            RefreshTokenFamily: The new family, or None if the token has no `jti` or has already been used.
+        """
+        if not jti:
+            return None
+        family = cls(client_id, user_id, scope, now)
+        family.legacy_jti = jti
+        db.session.add(family)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return None
+        return family
+
+    @classmethod
+    def revoke_legacy(cls, jti):
+        """
+        Revoke the family started by a refresh token from before families existed.
+
+        Returns:
+            str: The id of the family, or None if there was none to revoke.
+        """
+        family_id = db.session.execute(
+            db.select(cls.id).where(cls.legacy_jti == jti, cls.revoked.is_(False))
+        ).scalar()
+        if family_id is None or not cls.revoke_family(family_id):
+            return None
+        return family_id
+
+    @classmethod
+    def advance(cls, family_id, generation, now):
+        """
+        Rotate a family from `generation` to the next one.
+
+        The generation is compared and set in one statement, so of two requests presenting the same
+        token only one can rotate it.
+
+        Returns:
+            bool: True if this call rotated the family.
+        """
+        result = db.session.execute(
+            db.update(cls)
+            .where(cls.id == family_id, cls.generation == generation, cls.revoked.is_(False))
+            .values(generation=generation + 1, rotated_at=int(now), last_used_at=int(now))
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    @classmethod
+    def touch(cls, family_id, now):
+        """Record that a family was used, for its idle lifetime."""
+        db.session.execute(db.update(cls).where(cls.id == family_id).values(last_used_at=int(now)))
+        db.session.commit()
+
+    @classmethod
+    def revoke_family(cls, family_id):
+        """
+        Revoke every refresh token in a family.
+
+        Returns:
+            bool: True if the family existed and was not already revoked.
+        """
+        result = db.session.execute(
+            db.update(cls).where(cls.id == family_id, cls.revoked.is_(False)).values(revoked=True)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def __repr__(self):
+        return f"<RefreshTokenFamily(id={self.id}, client_id={self.client_id}, generation={self.generation}, revoked={self.revoked})>"
@@ -1,4 +1,21 @@
+import itertools
+import os
+
+import xid
+
 from .User import User, Role, RolesUsers, ClientOwners
 from .Client import Client, ClientConfiguration, ClientMetadata
 from .InstallationRecords import InstallationRecords
-from .Token import Token
\ No newline at end of file
+from .Token import Token, RefreshTokenFamily
+
+
+def _reseed_xid():
+    """
+    `xid` reads the process id and seeds its counter once, when it is imported, so workers forked from a
+    preloaded application would otherwise generate the same ids.
+    """
+    xid.pid = os.getpid()
+    xid.objectIDGenerator = itertools.count(int.from_bytes(os.urandom(3), "big"))
+
+
+os.register_at_fork(after_in_child=_reseed_xid)
@@ -0,0 +1,93 @@
+from marshmallow import fields, missing
+
+
+def _has_hooks(schema, tag):
+    # Hooks are registered by tag from marshmallow 3.24, and by (tag, pass_many) before it
+    hooks = schema._hooks
+    return bool(hooks.get(tag) or hooks.get((tag, False)) or hooks.get((tag, True)))
+
+
+def _serializer(field):
+    """
+    Returns:
+        function: Converts a value as `field` does when it is dumped.
+    """
+    if isinstance(field, fields.Nested) and not (field.many or field.only or field.exclude):
+        dump = compile_dump(field.schema)
+        return lambda value: None if value is None else dump(value)
+
+    if isinstance(field, fields.List):
+        serialize_item = _serializer(field.inner)
+        return lambda value: None if value is None else [serialize_item(item) for item in value]
+
+    if type(field) in (fields.String, fields.Url, fields.Email):
+        return lambda value: value if value is None or type(value) is str else str(value)
+
+    if type(field) is fields.Boolean:
+        truthy, falsy = field.truthy, field.falsy
+
+        def serialize(value):
+            if value is None or value is True or value is False:
+                return value
+            try:
+                if value in truthy:
+                    return True
+                if value in falsy:
+                    return False
+            except TypeError:
+                pass
+            return bool(value)
+        return serialize
+
+    if type(field) is fields.Integer and not field.as_string:
+        return lambda value: None if value is None else int(value)
+
+    return lambda value: field._serialize(value, None, None)
+
+
+def compile_dump(schema):
+    """
+    Compile a function that dumps one object the way `schema.dump` does, building the dict directly.
+
+    The fields to dump, their keys and converters are worked out once, here, rather than on every
+    call. Common field types are converted inline; others are converted with the field itself, and
+    `post_dump` hooks are run as usual.
+
+    Args:
+        schema (Schema): The schema instance to compile.
+
+    Returns:
+        function: Takes a dict or an object and returns the dumped dict.
+
+    Raises:
+        ValueError: If the schema dumps many objects, has `pre_dump` hooks, or has fields that do not read
+            a plain attribute, such as dotted attributes or `Method` fields.
+    """
+    if schema.many or _has_hooks(schema, "pre_dump"):
+        raise ValueError(f"{type(schema).__name__} cannot be compiled: many and pre_dump hooks are not supported.")
+
+    plan = []
+    for name, field in schema.dump_fields.items():
+        attribute = field.attribute or name
+        if "." in attribute or not field._CHECK_ATTRIBUTE:
+            raise ValueError(
+                f"{type(schema).__name__}.{name} cannot be compiled: only fields reading a plain attribute are supported."
+            )
+        plan.append((field.data_key or name, attribute, _serializer(field), field.dump_default))
+
+    post_dump = _has_hooks(schema, "post_dump")
+
+    def dump(obj):
+        data = {}
+        for key, attribute, serialize, default in plan:
+            value = obj.get(attribute, missing) if isinstance(obj, dict) else getattr(obj, attribute, missing)
+            if value is missing:
+                if default is missing:
+                    continue
+                value = default() if callable(default) else default
+            data[key] = serialize(value)
+        if post_dump:
+            data = schema._invoke_dump_processors("post_dump", data, many=False, original_data=obj)
+        return data
+
+    return dump
@@ -18,6 +18,10 @@ class URIsSchema(Schema):
         fields.Url(schemes=["https"]),
         description="List of allowed web origins for CORS requests."
     )
+    resources = fields.List(
+        fields.Url(),
+        description="Resource indicators (RFC 8707) the client may request. Any absolute URI is accepted when empty."
+    )
 
 
 class CORSConfigSchema(Schema):
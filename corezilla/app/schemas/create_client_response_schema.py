@@ -1,5 +1,6 @@
 from marshmallow import Schema, fields, post_dump
 
+from corezilla.app.schemas.compiled import compile_dump
 from corezilla.app.schemas.create_client_request_schema import (
     RefreshTokenSettingsSchema, JWTSettingsSchema
 )
@@ -21,6 +22,10 @@ class URIResponseSchema(Schema):
         fields.String(),
         description="List of allowed web origins for CORS requests."
     )
+    resources = fields.List(
+        fields.String(),
+        description="Resource indicators (RFC 8707) the client may request."
+    )
 
 
 class CORSConfigResponseSchema(Schema):
@@ -105,3 +110,11 @@ class GetClientResponseSchema(Schema):
             "page": data.get("page"),
             "per_page": data.get("per_page"),
         }
+
+
+# Schemas keep no state between calls, so one instance of each serves every request
+client_response_schema = CreateClientResponseSchema()
+clients_response_schema = GetClientResponseSchema()
+
+# Builds the same dict as `client_response_schema.dump` for a single client
+dump_client_response = compile_dump(client_response_schema)
@@ -13,6 +13,8 @@ class AuthorizationCodeRequest(Schema):
     scope = fields.Str()
     state = fields.Str()
     response_type = fields.Str()
+    code_challenge = fields.Str()
+    code_challenge_method = fields.Str()
 
     class Meta:
         unknown = INCLUDE
@@ -24,6 +26,75 @@ class AuthorizationCodeResponse(Schema):
 
 class TokenResponseSchema(ma.SQLAlchemySchema):
     access_token = fields.Str(dump_only=True)
+    token_type = fields.Str(dump_only=True)
+    issued_token_type = fields.Str(dump_only=True)
     refresh_token = fields.Str(dump_only=True)
     expires_in = fields.Int(dump_only=True)
-    scope = fields.Str(dump_only=True)
\ No newline at end of file
+    scope = fields.Str(dump_only=True)
+
+
+class IntrospectionResponse(Schema):
+    """
+    https://datatracker.ietf.org/doc/html/rfc7662#section-2.2
+    """
+    active = fields.Bool(dump_only=True)
+    scope = fields.Str(dump_only=True)
+    client_id = fields.Str(dump_only=True)
+    sub = fields.Raw(dump_only=True)
+    aud = fields.Raw(dump_only=True)
+    iss = fields.Str(dump_only=True)
+    exp = fields.Int(dump_only=True)
+    iat = fields.Int(dump_only=True)
+    nbf = fields.Int(dump_only=True)
+    jti = fields.Str(dump_only=True)
+    act = fields.Dict(dump_only=True)
+    token_type = fields.Str(dump_only=True)
+
+
+class TokenExchangeRequest(Schema):
+    """
+    A single exchange within a batch. The subject token and its type default to the ones given at the
+    top level of the batch.
+    """
+    subject_token = fields.Str()
+    subject_token_type = fields.Str()
+    audience = fields.Str()
+    resource = fields.Str()
+    scope = fields.Str()
+
+
+class TokenExchangeBatchRequest(Schema):
+    """
+    Several RFC 8693 token exchanges performed in one request.
+    """
+    client_id = fields.Str()
+    client_secret = fields.Str(load_only=True)
+    subject_token = fields.Str()
+    subject_token_type = fields.Str()
+    exchanges = fields.List(fields.Nested(TokenExchangeRequest), required=True, validate=validate.Length(min=1))
+
+
+class TokenExchangeBatchResponse(Schema):
+    """Each result is either a token exchange response or an OAuth error object, in request order."""
+    results = fields.List(fields.Dict(), dump_only=True)
+
+class DeviceAuthorizationResponse(Schema):
+    """
+    https://datatracker.ietf.org/doc/html/rfc8628#section-3.2
+    """
+    device_code = fields.Str(dump_only=True)
+    user_code = fields.Str(dump_only=True)
+    verification_uri = fields.Str(dump_only=True)
+    verification_uri_complete = fields.Str(dump_only=True)
+    expires_in = fields.Int(dump_only=True)
+    interval = fields.Int(dump_only=True)
+
+
+class DeviceVerificationRequest(Schema):
+    """The user code shown on the device, and whether the signed-in user approves or denies it."""
+    user_code = fields.Str(required=True, validate=validate.Length(min=1))
+    action = fields.Str(load_default="approve", validate=validate.OneOf(["approve", "deny"]))
+
+
+class DeviceVerificationResponse(Schema):
+    status = fields.Str(dump_only=True)
@@ -0,0 +1,22 @@
+from marshmallow import Schema, fields, validate
+
+
+class StartProfilerRequest(Schema):
+    duration = fields.Float(
+        load_default=None,
+        validate=validate.Range(min=0, min_inclusive=False),
+        metadata={"description": "Stop profiling after this many seconds. Capped at PROFILER_MAX_DURATION_SECONDS."}
+    )
+    sample_rate = fields.Float(
+        load_default=None,
+        validate=validate.Range(min=0, max=1, min_inclusive=False),
+        metadata={"description": "Fraction of requests to sample. Every request is sampled when omitted."}
+    )
+
+
+class ProfilerStatusResponse(Schema):
+    running = fields.Bool(dump_only=True)
+    sample_rate = fields.Float(dump_only=True, allow_none=True)
+    remaining_seconds = fields.Float(dump_only=True, allow_none=True)
+    samples = fields.Int(dump_only=True)
+    last_output = fields.Str(dump_only=True, allow_none=True)
@@ -1,21 +1,103 @@
 import secrets
 import datetime
 import base64
+import functools
+import hashlib
+import hmac
 import json
+import re
 
 import flask
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
+from corezilla.app.utils.metrics import registry
+
+authorization_codes_minted = registry.counter(
+    "oauth_authorization_codes_minted_total", "Authorization codes issued by the authorization endpoint."
+)
+authorization_codes_redeemed = registry.counter(
+    "oauth_authorization_codes_redeemed_total", "Authorization codes that passed validation at the token endpoint."
+)
+
+PKCE_METHODS = ("S256", "plain")
+
+# https://datatracker.ietf.org/doc/html/rfc7636#section-4.1
+# Challenges share the verifier alphabet; an S256 challenge is always 43 characters.
+_CODE_VERIFIER = re.compile(r"[A-Za-z0-9\-._~]{43,128}")
+
+
+@functools.lru_cache(maxsize=4)
+def _aesgcm(key: bytes) -> AESGCM:
+    # Building the cipher expands the key schedule, so it is done once per key rather than per code
+    return AESGCM(key)
+
+
+def _auth_code_cipher():
+    auth_code_secret = flask.current_app.config.get('AUTH_CODE_SECRET_KEY')
+    if isinstance(auth_code_secret, str):
+        auth_code_secret = auth_code_secret.encode()
+    return _aesgcm(auth_code_secret)
+
+
+def is_valid_code_challenge(code_challenge, code_challenge_method):
+    """
+    Check that a PKCE code challenge is well-formed for its method.
+
+    Returns:
+        bool: True if the challenge can be stored in an authorization code.
+    """
+    if code_challenge_method not in PKCE_METHODS or not code_challenge:
+        return False
+    if code_challenge_method == "S256":
+        return len(code_challenge) == 43 and _CODE_VERIFIER.fullmatch(code_challenge) is not None
+    return _CODE_VERIFIER.fullmatch(code_challenge) is not None
+
+
+def verify_code_verifier(code_verifier, code_challenge, code_challenge_method):
+    """
+    Check a PKCE code verifier against the challenge sent with the authorization request.
+
+    S256 costs one SHA-256 over at most 128 bytes plus an unpadded base64url encode, and the result
+    is compared in constant time.
+
+    Args:
+        code_verifier (str): The verifier presented at the token endpoint.
+        code_challenge (str): The challenge carried inside the authorization code.
+        code_challenge_method (str): "S256" or "plain".
+
+    Returns:
+        bool: True if the verifier matches the challenge.
+    """
+    if not code_verifier or _CODE_VERIFIER.fullmatch(code_verifier) is None:
+        return False
+
+    if code_challenge_method == "S256":
+        digest = hashlib.sha256(code_verifier.encode("ascii")).digest()
+        expected = base64.urlsafe_b64encode(digest).rstrip(b"=")
+    elif code_challenge_method == "plain":
+        expected = code_verifier.encode("ascii")
+    else:
+        return False
+
+    return hmac.compare_digest(expected, code_challenge.encode("ascii"))
+
+
 class AuthorizationCodeService:
     """Handles generating, encrypting, decrypting, and validating OAuth 2.0 authorization codes"""
 
     @staticmethod
-    def generate_authorization_code(client_id: str, user_id: str):
+    def generate_authorization_code(client_id: str, user_id: str, code_challenge: str = None,
+                                    code_challenge_method: str = None, redirect_uri: str = None):
+        """
+        Generate an encrypted authorization code with required claims.
+
+        The PKCE challenge and the redirect URI travel inside the encrypted code, so the token endpoint
+        can check the verifier and the redirect URI without any server-side storage. A challenge without a
+        method is an S256 challenge.
+        """
         iss = flask.current_app.config.get('ISSUER_NAME')
-        ttl = flask.current_app.config.get('AUTH_CODE_EXPIRY_MINUTES')
-        auth_code_secret = flask.current_app.config.get('AUTH_CODE_SECRET_KEY')
+        ttl = flask.current_app.config.get('AUTH_CODE_EXPIRY_SECONDS', 600)
 
-        """Generate an encrypted authorization code with required claims"""
         now = datetime.datetime.utcnow()
         payload = {
             "client_id": client_id,
@@ -26,35 +108,36 @@ class AuthorizationCodeService:
             "exp": int((now + datetime.timedelta(seconds=ttl)).timestamp())
         }
 
+        if redirect_uri:
+            payload["redirect_uri"] = redirect_uri
+
+        if code_challenge:
+            payload["code_challenge"] = code_challenge
+            payload["code_challenge_method"] = code_challenge_method or "S256"
+
         # Convert payload to JSON bytes
         payload_bytes = json.dumps(payload).encode()
 
-        if isinstance(auth_code_secret, str):
-            auth_code_secret = auth_code_secret.encode()
-
         # Encrypt using AES-GCM
-        aesgcm = AESGCM(auth_code_secret)
+        aesgcm = _auth_code_cipher()
         nonce = secrets.token_bytes(12)  # Generate a unique nonce for encryption
         encrypted_data = aesgcm.encrypt(nonce, payload_bytes, None)
 
+        authorization_codes_minted.inc()
+
         # Encode (nonce + encrypted data) into a compact, URL-safe format
         return base64.urlsafe_b64encode(nonce + encrypted_data).decode()
 
     @staticmethod
     def decrypt_authorization_code(auth_code: str):
         """Decrypts an authorization code and returns the payload"""
-        auth_code_secret = flask.current_app.config.get('AUTH_CODE_SECRET_KEY')
-
-        if isinstance(auth_code_secret, str):
-            auth_code_secret = auth_code_secret.encode()
-
         try:
             # Decode the base64-encoded encrypted data
             decoded_data = base64.urlsafe_b64decode(auth_code)
             nonce, encrypted_payload = decoded_data[:12], decoded_data[12:]
 
             # Decrypt the payload
-            aesgcm = AESGCM(auth_code_secret)
+            aesgcm = _auth_code_cipher()
             decrypted_bytes = aesgcm.decrypt(nonce, encrypted_payload, None)
             payload = json.loads(decrypted_bytes.decode())
 
@@ -63,8 +146,15 @@ class AuthorizationCodeService:
             raise ValueError("Invalid authorization code") from e
 
     @staticmethod
-    def validate_authorization_code(auth_code: str, client_id: str):
-        """Validates the authorization code and checks claims"""
+    def validate_authorization_code(auth_code: str, client_id: str, code_verifier: str = None,
+                                    redirect_uri: str = None):
+        """
+        Validates the authorization code and checks claims.
+
+        If the code was issued with a PKCE challenge, `code_verifier` must match it. A verifier sent for
+        a code issued without a challenge is rejected, as required by OAuth 2.1. If the code was issued
+        for a redirect URI, `redirect_uri` must be identical to it, as required by RFC 6749 section 4.1.3.
+        """
         try:
             payload = AuthorizationCodeService.decrypt_authorization_code(auth_code)
             iss = flask.current_app.config.get('ISSUER_NAME')
@@ -84,6 +174,18 @@ class AuthorizationCodeService:
             if now > payload.get("exp"):
                 raise ValueError("Authorization code has expired")
 
+            # https://datatracker.ietf.org/doc/html/rfc6749#section-4.1.3
+            if "redirect_uri" in payload and payload["redirect_uri"] != redirect_uri:
+                raise ValueError("Redirect URI mismatch")
+
+            code_challenge = payload.get("code_challenge")
+            if code_challenge is not None:
+                if not verify_code_verifier(code_verifier, code_challenge, payload.get("code_challenge_method")):
+                    raise ValueError("Invalid code_verifier")
+            elif code_verifier:
+                raise ValueError("Unexpected code_verifier")
+
+            authorization_codes_redeemed.inc()
             return payload
 
         except Exception as e:
@@ -1,6 +1,117 @@
+import functools
+import hashlib
+import hmac
+import secrets
 from urllib.parse import urlparse
 
-from corezilla.app.models.Client import Client, ClientConfiguration
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from corezilla.app import db
+from corezilla.app.models.Client import Client, ClientConfiguration, ClientMetadata
+from corezilla.app.utils.cache import TTLCache
+from corezilla.app.utils.metrics import registry
+
+# Key for hashing (client_id, secret) pairs into credential cache keys, so that secrets are never held
+# in the cache itself. It only has to be stable for the life of the process.
+_CREDENTIAL_CACHE_KEY = secrets.token_bytes(32)
+
+
+def _credential_cache_key(client_id, client_secret):
+    return hmac.new(_CREDENTIAL_CACHE_KEY, f"{client_id}\0{client_secret}".encode("utf-8"), hashlib.sha256).digest()
+
+
+@functools.lru_cache(maxsize=1024)
+def _resource_uri_error(uri):
+    """
+    Check a resource indicator against RFC 8707. Results are memoised, as clients send the same few
+    resource URIs with every request.
+
+    Returns:
+        str: Why `uri` is not a valid resource indicator, or None if it is.
+    """
+    parsed = urlparse(uri)
+
+    if not parsed.scheme or not parsed.netloc:
+        return f"Invalid resource URI: {uri}. Must be an absolute URI."
+
+    if parsed.fragment:
+        return f"Invalid resource URI: {uri}. Must not include a fragment component."
+
+    return None
+
+
+class AuthenticatedClient:
+    """
+    A snapshot of a client that passed authentication.
+
+    Unlike a `Client` instance it is not bound to a database session, so it can be cached and shared
+    between requests. `claims` holds the access token claims that are the same for every token issued
+    to the client.
+    """
+
+    __slots__ = ("id", "client_id", "is_public", "claims")
+
+    def __init__(self, client, issuer, audience):
+        self.id = client.id
+        self.client_id = client.client_id
+        self.is_public = client.is_public
+        self.claims = {
+            "iss": issuer,
+            "aud": audience,
+            "sub": client.client_id,
+            "client_id": client.client_id,
+            "token_type": "access_token",
+        }
+
+
+class RefreshPolicy:
+    """
+    The refresh token settings from a client's `configuration_blob["refresh"]`, with lifetimes that are
+    not enabled set to None.
+    """
+
+    __slots__ = ("rotation_enabled", "overlap_period", "idle_lifetime", "max_lifetime")
+
+    def __init__(self, settings=None):
+        settings = settings or {}
+        self.rotation_enabled = bool(settings.get("refresh_token_rotation_enabled", False))
+        self.overlap_period = int(settings.get("rotation_overlap_period") or 0)
+        self.idle_lifetime = (
+            settings.get("idle_refresh_token_lifetime") if settings.get("idle_refresh_token_lifetime_enabled") else None
+        )
+        self.max_lifetime = (
+            settings.get("maximum_refresh_token_lifetime") if settings.get("maximum_refresh_token_lifetime_enabled") else None
+        )
+
+
+class ClientPolicy:
+    """
+    The settings from a client's latest configuration that are checked on every request, compiled once
+    per configuration. Policies are cached per worker by `ClientService.get_policy`, which compiles them
+    on a cache miss rather than when a configuration is saved: a save only reaches the worker handling
+    it, and the others drop their copy by TTL.
+
+    `resources` is the set of resource indicators registered in `configuration_blob["uris"]["resources"]`,
+    leaving out any that are not valid, or None if the client has not registered any. `redirect_uris` is
+    the set of absolute URIs in `configuration_blob["uris"]["redirect_uris"]`.
+    """
+
+    __slots__ = ("refresh", "resources", "redirect_uris")
+
+    def __init__(self, configuration_blob=None):
+        configuration_blob = configuration_blob or {}
+        self.refresh = RefreshPolicy(configuration_blob.get("refresh"))
+
+        uris = configuration_blob.get("uris") or {}
+        resources = uris.get("resources")
+        self.resources = frozenset(
+            uri for uri in resources if isinstance(uri, str) and _resource_uri_error(uri) is None
+        ) if resources else None
+
+        self.redirect_uris = frozenset(
+            uri for uri in uris.get("redirect_uris") or () if isinstance(uri, str) and ClientService.is_absolute_uri(uri)
+        )
 
 
 class ClientService:
@@ -11,16 +122,158 @@ class ClientService:
         """
         return Client.query.filter_by(client_id=client_id).first()
 
+    @staticmethod
+    def revisions_query():
+        """
+        Query what the representation of each client is built from, without loading any blob: rows of
+        `(id, revision, configuration version, configuration count, configuration revisions, metadata
+        revisions)`, where the revisions are summed over the client's entries.
+
+        Filter, order and limit it as a query of `Client`. Any change to a client, its metadata or its
+        configurations changes its row, so the rows can be hashed into ETags.
+        """
+        client_pk = db.cast(Client.id, db.String)
+        configurations = (
+            db.session.query(
+                ClientConfiguration.client_id,
+                db.func.max(ClientConfiguration.version).label("version"),
+                db.func.count().label("count"),
+                db.func.sum(ClientConfiguration.revision).label("revision"),
+            )
+            .group_by(ClientConfiguration.client_id)
+            .subquery()
+        )
+        metadata = (
+            db.session.query(ClientMetadata.client_id, db.func.sum(ClientMetadata.revision).label("revision"))
+            .group_by(ClientMetadata.client_id)
+            .subquery()
+        )
+        return (
+            db.session.query(
+                Client.id,
+                Client.revision,
+                configurations.c.version,
+                configurations.c.count,
+                configurations.c.revision,
+                metadata.c.revision,
+            )
+            .outerjoin(configurations, configurations.c.client_id == client_pk)
+            .outerjoin(metadata, metadata.c.client_id == client_pk)
+        )
+
     @staticmethod
     def verify_client(client_id, client_secret):
         """
-        Verify client credentials.
+        Verify client credentials, upgrading a legacy plaintext secret to a verifier on success.
         """
         client = ClientService.get_client(client_id)
         if client and client.verify_secret(client_secret):
+            if db.session.is_modified(client):
+                db.session.commit()
             return client
         return None
 
+    @staticmethod
+    def authenticate_client(client_id, client_secret):
+        """
+        Authenticate a confidential client, answering repeat requests from an in-process cache.
+
+        Verified credentials are cached under a keyed hash of the client ID and secret for
+        `CLIENT_CREDENTIAL_CACHE_TTL_SECONDS`, so machine-to-machine clients that authenticate on every
+        request only hit the database once per TTL. Failed attempts are never cached.
+
+        Args:
+            client_id (str): The public client ID.
+            client_secret (str): The secret presented by the client.
+
+        Returns:
+            AuthenticatedClient: The authenticated client, or None if the credentials are invalid.
+        """
+        if not client_id or not client_secret:
+            return None
+
+        cache = ClientService._credential_cache()
+        key = _credential_cache_key(client_id, client_secret)
+
+        authenticated = cache.get(key)
+        if authenticated is not None:
+            return authenticated
+
+        client = ClientService.verify_client(client_id, client_secret)
+        if client is None:
+            return None
+
+        authenticated = AuthenticatedClient(
+            client,
+            issuer=current_app.config.get("ISSUER_NAME"),
+            audience=current_app.config.get("AUDIENCE"),
+        )
+        cache.set(key, authenticated)
+        return authenticated
+
+    @staticmethod
+    async def authenticate_client_async(client_id, client_secret, database):
+        """
+        Authenticate a confidential client like `authenticate_client`, without blocking the event loop.
+
+        Cache hits are answered in memory as before; misses are verified through `database`.
+
+        Args:
+            client_id (str): The public client ID.
+            client_secret (str): The secret presented by the client.
+            database (AsyncDatabase): The asyncio database used by the ASGI application.
+
+        Returns:
+            AuthenticatedClient: The authenticated client, or None if the credentials are invalid.
+        """
+        if not client_id or not client_secret:
+            return None
+
+        cache = ClientService._credential_cache()
+        key = _credential_cache_key(client_id, client_secret)
+
+        authenticated = cache.get(key)
+        if authenticated is not None:
+            return authenticated
+
+        client = await database.verify_client(client_id, client_secret)
+        if client is None:
+            return None
+
+        authenticated = AuthenticatedClient(
+            client,
+            issuer=current_app.config.get("ISSUER_NAME"),
+            audience=current_app.config.get("AUDIENCE"),
+        )
+        cache.set(key, authenticated)
+        return authenticated
+
+    @staticmethod
+    def _credential_cache():
+        cache = current_app.extensions.get("client_credential_cache")
+        if cache is None:
+            cache = current_app.extensions["client_credential_cache"] = TTLCache(
+                max_entries=current_app.config.get("CLIENT_CREDENTIAL_CACHE_MAX_ENTRIES", 1024),
+                ttl=current_app.config.get("CLIENT_CREDENTIAL_CACHE_TTL_SECONDS", 60),
+            )
+            registry.register_cache("client_credentials", cache)
+        return cache
+
+    @staticmethod
+    def invalidate_cached_credentials(client_id):
+        """
+        Forget cached authentications and tokens for a client, e.g. after its secret changes.
+
+        Only this worker's caches are cleared; other workers keep theirs until their TTL expires.
+        """
+        if not has_app_context():
+            return
+
+        for name in ("client_credential_cache", "client_token_cache"):
+            cache = current_app.extensions.get(name)
+            if cache is not None:
+                cache.discard_if(lambda cached: cached.client_id == client_id)
+
     @staticmethod
     def validate_authorization_code(client, code, redirect_uri):
         """
@@ -54,14 +307,129 @@ class ClientService:
 
     @staticmethod
     def get_client_configuration(client_id):
-        ClientConfiguration.query.filter_by(client_id=client_id).order_by(ClientConfiguration.version.desc()).first()
+        """
+        Retrieve the latest configuration of a client by its public client_id.
+        """
+        return (
+            ClientConfiguration.query
+            .join(Client, Client.id == ClientConfiguration.client_id)
+            .filter(Client.client_id == client_id)
+            .order_by(ClientConfiguration.version.desc())
+            .first()
+        )
+
+    @staticmethod
+    def get_policy(client):
+        """
+        Return the policy compiled from the client's latest configuration.
+
+        Policies are cached per worker for `CLIENT_CONFIGURATION_CACHE_TTL_SECONDS`, keyed by the client's
+        primary key, and dropped when the client or its configuration changes in this worker.
+
+        Args:
+            client (Client | AuthenticatedClient): The client.
+
+        Returns:
+            ClientPolicy: The client's policy.
+        """
+        cache = ClientService._configuration_cache()
+        # `client_configuration.client_id` is a string column holding `client.id`
+        key = str(client.id)
+        policy = cache.get(key)
+        if policy is None:
+            configuration = (
+                ClientConfiguration.query
+                .filter_by(client_id=key)
+                .order_by(ClientConfiguration.version.desc())
+                .first()
+            )
+            policy = ClientPolicy(configuration.configuration_blob if configuration else None)
+            cache.set(key, policy)
+        return policy
+
+    @staticmethod
+    async def get_policy_async(client, database):
+        """
+        Return the client's policy like `get_policy`, loading it through `database` on a cache miss.
+        """
+        cache = ClientService._configuration_cache()
+        key = str(client.id)
+        policy = cache.get(key)
+        if policy is None:
+            configuration = await database.get_latest_client_configuration(key)
+            policy = ClientPolicy(configuration.configuration_blob if configuration else None)
+            cache.set(key, policy)
+        return policy
+
+    @staticmethod
+    def get_refresh_policy(client):
+        """
+        Return the refresh token policy from the client's latest configuration.
+
+        Returns:
+            RefreshPolicy: The client's policy.
+        """
+        return ClientService.get_policy(client).refresh
+
+    @staticmethod
+    def get_resource_allowlist(client):
+        """
+        Return the resource indicators registered in the client's latest configuration.
+
+        Returns:
+            frozenset: The registered resource URIs, or None if the client accepts any valid resource.
+        """
+        return ClientService.get_policy(client).resources
 
     @staticmethod
-    def validate_resource_uris(resource):
+    def get_registered_redirect_uri(client, redirect_uri=None):
+        """
+        Return the redirect URI to send the user agent back to, if it is registered for the client.
+
+        Args:
+            client (Client): The client.
+            redirect_uri (str, optional): The URI requested; when omitted, the client's only registered
+                URI, if it has exactly one.
+
+        Returns:
+            str: The registered redirect URI, or None.
+        """
+        registered = ClientService.get_policy(client).redirect_uris
+        if redirect_uri is None:
+            return next(iter(registered)) if len(registered) == 1 else None
+        return redirect_uri if redirect_uri in registered else None
+
+    @staticmethod
+    def _configuration_cache():
+        cache = current_app.extensions.get("client_configuration_cache")
+        if cache is None:
+            cache = current_app.extensions["client_configuration_cache"] = TTLCache(
+                max_entries=current_app.config.get("CLIENT_CREDENTIAL_CACHE_MAX_ENTRIES", 1024),
+                ttl=current_app.config.get("CLIENT_CONFIGURATION_CACHE_TTL_SECONDS", 60),
+            )
+            registry.register_cache("client_configurations", cache)
+        return cache
+
+    @staticmethod
+    def invalidate_cached_configuration(client_pk):
+        """Forget this worker's cached policy for a client, given its primary key."""
+        if not has_app_context():
+            return
+
+        cache = current_app.extensions.get("client_configuration_cache")
+        if cache is not None:
+            cache.discard(str(client_pk))
+
+    @staticmethod
+    def validate_resource_uris(resource, allowed=None):
         """
         Validate resource URIs according to RFC 8707:
         - Must be an absolute URI
         - Must not include a fragment component
+
+        When `allowed` is given, as returned by `get_resource_allowlist`, each URI must also be one of
+        them. Those were validated when the client's policy was compiled, so a URI is only looked up in
+        the set, and an unknown one is rejected without being parsed.
         """
         if isinstance(resource, str):
             resource = [resource]  # Convert single string to list
@@ -72,13 +440,16 @@ class ClientService:
         valid_resources = []
 
         for res in resource:
-            parsed = urlparse(res)
-
-            if not parsed.scheme or not parsed.netloc:
-                raise ValueError(f"Invalid resource URI: {res}. Must be an absolute URI.")
+            if not isinstance(res, str):
+                raise ValueError("resource parameter must be a string or a list of strings.")
 
-            if parsed.fragment:
-                raise ValueError(f"Invalid resource URI: {res}. Must not include a fragment component.")
+            if allowed is not None:
+                if res not in allowed:
+                    raise ValueError(f"Unknown resource URI: {res}. Must be registered for the client.")
+            else:
+                error = _resource_uri_error(res)
+                if error:
+                    raise ValueError(error)
 
             valid_resources.append(res)
 
@@ -105,3 +476,16 @@ class ClientService:
 
         return code
 
+
+@event.listens_for(Client, "after_update")
+@event.listens_for(Client, "after_delete")
+def _invalidate_client_caches(mapper, connection, target):
+    ClientService.invalidate_cached_credentials(target.client_id)
+    ClientService.invalidate_cached_configuration(target.id)
+
+
+@event.listens_for(ClientConfiguration, "after_insert")
+@event.listens_for(ClientConfiguration, "after_update")
+@event.listens_for(ClientConfiguration, "after_delete")
+def _invalidate_configuration_cache(mapper, connection, target):
+    ClientService.invalidate_cached_configuration(target.client_id)
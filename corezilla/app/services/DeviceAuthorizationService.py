@@ -0,0 +1,218 @@
+import secrets
+import time
+
+import flask
+
+from corezilla.app.utils.cache import TTLCache
+from corezilla.app.utils.device_grants import APPROVED, DENIED, PENDING, DeviceGrant, create_device_grant_store
+from corezilla.app.utils.metrics import registry
+
+# https://datatracker.ietf.org/doc/html/rfc8628#section-3.4
+DEVICE_CODE_GRANT_TYPE = "urn:ietf:params:oauth:grant-type:device_code"
+
+# https://datatracker.ietf.org/doc/html/rfc8628#section-6.1
+# Consonants only, so user codes are easy to read aloud and never spell words. 20^8 codes give about
+# 34 bits of entropy, which is ample while codes expire in minutes and a user or address entering
+# DEVICE_VERIFICATION_MAX_FAILURES wrong codes is locked out.
+USER_CODE_ALPHABET = "BCDFGHJKLMNPQRSTVWXZ"
+USER_CODE_LENGTH = 8
+
+device_codes_started = registry.counter(
+    "oauth_device_authorizations_started_total", "Device authorization requests accepted."
+)
+device_poll_results = registry.counter(
+    "oauth_device_polls_total", "Device code polls at the token endpoint, by result."
+)
+
+
+class DeviceAuthorizationError(ValueError):
+    """A device authorization or polling request that must be answered with an OAuth error code."""
+
+    def __init__(self, error, description):
+        super().__init__(description)
+        self.error = error
+        self.description = description
+
+
+def normalize_user_code(user_code):
+    """Upper-case a user code and drop the dash and any other separators the user typed."""
+    return "".join(character for character in (user_code or "").upper() if character.isalnum())
+
+
+def format_user_code(user_code):
+    return f"{user_code[:4]}-{user_code[4:]}"
+
+
+class DeviceAuthorizationService:
+    """Handles the device authorization grant for input-constrained devices"""
+
+    @staticmethod
+    def store():
+        """
+        Returns:
+            DeviceGrantStore: The application's pending grant store, created on first use.
+        """
+        store = flask.current_app.extensions.get("device_grant_store")
+        if store is None:
+            store = flask.current_app.extensions["device_grant_store"] = create_device_grant_store(
+                flask.current_app.config
+            )
+        return store
+
+    @staticmethod
+    def start(client_id, scope=None, verification_uri=None):
+        """
+        Create a pending grant for a device.
+
+        https://datatracker.ietf.org/doc/html/rfc8628#section-3.2
+
+        Args:
+            client_id (str): The client the device is running.
+            scope (str): The requested scope, if any.
+            verification_uri (str): Where the user enters the user code.
+
+        Returns:
+            dict: The device authorization response.
+        """
+        config = flask.current_app.config
+        expires_in = config.get("DEVICE_CODE_EXPIRY_SECONDS", 600)
+        interval = config.get("DEVICE_CODE_POLL_INTERVAL_SECONDS", 5)
+        store = DeviceAuthorizationService.store()
+
+        now = time.time()
+        if now >= store.next_sweep:
+            store.next_sweep = now + config.get("DEVICE_GRANT_SWEEP_INTERVAL_SECONDS", 60)
+            store.sweep(now)
+
+        user_code = DeviceAuthorizationService._unused_user_code(store, now)
+        device_code = secrets.token_urlsafe(32)
+        store.add(DeviceGrant(device_code, user_code, client_id, scope, now + expires_in, interval))
+        device_codes_started.inc()
+
+        verification_uri = config.get("DEVICE_VERIFICATION_URI") or verification_uri
+        return {
+            "device_code": device_code,
+            "user_code": format_user_code(user_code),
+            "verification_uri": verification_uri,
+            "verification_uri_complete": f"{verification_uri}?user_code={format_user_code(user_code)}",
+            "expires_in": expires_in,
+            "interval": interval,
+        }
+
+    @staticmethod
+    def _unused_user_code(store, now):
+        while True:
+            user_code = "".join(secrets.choice(USER_CODE_ALPHABET) for _ in range(USER_CODE_LENGTH))
+            if store.get_by_user_code(user_code, now) is None:
+                return user_code
+
+    @staticmethod
+    def approve(user_code, user_id, remote_addr=None):
+        """
+        Approve a pending grant on behalf of the signed-in user.
+
+        A user, or an address, that enters `DEVICE_VERIFICATION_MAX_FAILURES` unknown, expired or used
+        codes is refused until `DEVICE_VERIFICATION_LOCKOUT_SECONDS` after the last of them, so user codes
+        cannot be guessed. Failures are counted per worker.
+
+        Raises:
+            DeviceAuthorizationError: If the user or address is locked out.
+
+        Returns:
+            DeviceGrant | None: The approved grant, or None if the user code is unknown, expired or already used.
+        """
+        return DeviceAuthorizationService._resolve(user_code, APPROVED, user_id, remote_addr)
+
+    @staticmethod
+    def deny(user_code, user_id, remote_addr=None):
+        return DeviceAuthorizationService._resolve(user_code, DENIED, user_id, remote_addr)
+
+    @staticmethod
+    def _resolve(user_code, status, user_id, remote_addr):
+        failures = DeviceAuthorizationService._verification_failures()
+        keys = [("user", str(user_id))] + ([("addr", remote_addr)] if remote_addr else [])
+        counts = [failures.get(key, 0) for key in keys]
+        if max(counts) >= flask.current_app.config.get("DEVICE_VERIFICATION_MAX_FAILURES", 5):
+            raise DeviceAuthorizationError("invalid_request", "Too many invalid user codes; try again later.")
+
+        grant = DeviceAuthorizationService.store().resolve(normalize_user_code(user_code), status, user_id, time.time())
+        if grant is None:
+            for key, count in zip(keys, counts):
+                failures.set(key, count + 1)
+        return grant
+
+    @staticmethod
+    def _verification_failures():
+        cache = flask.current_app.extensions.get("device_verification_failures")
+        if cache is None:
+            cache = flask.current_app.extensions["device_verification_failures"] = TTLCache(
+                max_entries=flask.current_app.config.get("DEVICE_VERIFICATION_MAX_TRACKED", 10000),
+                ttl=flask.current_app.config.get("DEVICE_VERIFICATION_LOCKOUT_SECONDS", 900),
+            )
+        return cache
+
+    @staticmethod
+    def poll(client_id, device_code):
+        """
+        Check on a pending grant for the device polling the token endpoint.
+
+        https://datatracker.ietf.org/doc/html/rfc8628#section-3.5
+
+        A device that polls faster than its interval is told to `slow_down` from in-process state,
+        without reading the store, so a misbehaving device costs at most one read per interval. With
+        `DEVICE_CODE_POLL_HOLD_SECONDS` set, a pending poll is held open until the grant is resolved
+        in this process or the hold runs out, so the device sees an approval without polling again.
+
+        An approved grant is removed from the store, so its tokens are issued only once.
+
+        Args:
+            client_id (str): The authenticated client polling for the grant.
+            device_code (str): The device code returned by `start`.
+
+        Returns:
+            DeviceGrant: The approved grant.
+
+        Raises:
+            DeviceAuthorizationError: If no tokens can be issued yet, or ever, for the device code.
+        """
+        if not device_code:
+            raise DeviceAuthorizationError("invalid_request", "Missing 'device_code' parameter.")
+
+        store = DeviceAuthorizationService.store()
+        now = time.time()
+
+        rate = store.check_poll_rate(device_code, now)
+        if rate is False:
+            device_poll_results.inc(result="slow_down")
+            raise DeviceAuthorizationError("slow_down", "The device is polling too frequently.")
+
+        grant = store.get_by_device_code(device_code, now)
+        if grant is None or grant.client_id != client_id:
+            store.forget(device_code)
+            if rate is None or grant is not None:
+                device_poll_results.inc(result="invalid_grant")
+                raise DeviceAuthorizationError("invalid_grant", "Invalid device code.")
+            device_poll_results.inc(result="expired_token")
+            raise DeviceAuthorizationError("expired_token", "The device code has expired.")
+
+        if rate is None:
+            store.start_polling(grant, now)
+
+        hold = flask.current_app.config.get("DEVICE_CODE_POLL_HOLD_SECONDS", 0)
+        if grant.status == PENDING and hold and store.wait(device_code, min(hold, grant.expires_at - now)):
+            grant = store.get_by_device_code(device_code, time.time()) or grant
+
+        if grant.status == PENDING:
+            device_poll_results.inc(result="authorization_pending")
+            raise DeviceAuthorizationError("authorization_pending", "The user has not yet approved the device.")
+
+        if grant.status == DENIED:
+            device_poll_results.inc(result="access_denied")
+            raise DeviceAuthorizationError("access_denied", "The user denied the authorization request.")
+
+        if not store.consume(device_code):
+            device_poll_results.inc(result="invalid_grant")
+            raise DeviceAuthorizationError("invalid_grant", "The device code has already been used.")
+
+        device_poll_results.inc(result="approved")
+        return grant
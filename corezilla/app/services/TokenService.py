@@ -1,3 +1,10 @@
+import base64
+import calendar
+import datetime
+import functools
+import json
+import logging
+import time
 import uuid
 from datetime import timedelta
 
@@ -5,14 +12,108 @@ import flask.config
 import jwt
 from flask_security.utils import aware_utcnow
 
+from corezilla.app import db
+from corezilla.app.models.Token import RefreshTokenFamily
+from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService
+from corezilla.app.services.ClientService import ClientService
+from corezilla.app.services.DeviceAuthorizationService import DeviceAuthorizationService
+from corezilla.app.utils.cache import TTLCache
+from corezilla.app.utils.metrics import registry
+
+
+refresh_token_reuse_detected = registry.counter(
+    "oauth_refresh_token_reuse_total", "Refresh token families revoked because an old refresh token was presented again."
+)
+
+# https://datatracker.ietf.org/doc/html/rfc8693#section-3
+TOKEN_EXCHANGE_GRANT_TYPE = "urn:ietf:params:oauth:grant-type:token-exchange"
+ACCESS_TOKEN_TYPE = "urn:ietf:params:oauth:token-type:access_token"
+JWT_TOKEN_TYPE = "urn:ietf:params:oauth:token-type:jwt"
+
+
+def _base64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return calendar.timegm(value.utctimetuple())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JWTSigner:
+    """
+    Signs and verifies JWTs with a key and algorithm that are prepared once.
+
+    `jwt.encode` looks up the algorithm, prepares the key and serializes the header on every call.
+    A signer does that work when it is created, so signing a token is a JSON dump, two base64
+    encodes and the signature itself. Signers are cached per key and algorithm by `get_signer`.
+    """
+
+    __slots__ = ("algorithm", "_secret", "_algorithm", "_key", "_header")
+
+    def __init__(self, secret, algorithm):
+        self.algorithm = algorithm
+        self._secret = secret
+        self._algorithm = jwt.get_algorithm_by_name(algorithm)
+        self._key = self._algorithm.prepare_key(secret)
+        self._header = _base64url(json.dumps({"alg": algorithm, "typ": "JWT"}, separators=(",", ":"), sort_keys=True).encode())
+
+    def encode(self, payload):
+        body = _base64url(json.dumps(payload, separators=(",", ":"), default=_json_default).encode())
+        signing_input = self._header + b"." + body
+        return (signing_input + b"." + _base64url(self._algorithm.sign(signing_input, self._key))).decode("ascii")
+
+    def decode(self, token, **kwargs):
+        """Verify and decode a token; keyword arguments are passed to `jwt.decode`."""
+        return jwt.decode(token, self._secret, algorithms=[self.algorithm], **kwargs)
+
+
+@functools.lru_cache(maxsize=8)
+def get_signer(secret, algorithm):
+    return JWTSigner(secret, algorithm)
+
+
+class TokenExchangeError(ValueError):
+    """A token exchange request that must be answered with an OAuth error code."""
+
+    def __init__(self, error, description):
+        super().__init__(description)
+        self.error = error
+        self.description = description
+
+
+class IssuedToken:
+    """An access token kept so it can be handed out again within the reuse window."""
+
+    __slots__ = ("client_id", "access_token", "expires_at", "scope")
+
+    def __init__(self, client_id, access_token, expires_at, scope):
+        self.client_id = client_id
+        self.access_token = access_token
+        self.expires_at = expires_at
+        self.scope = scope
+
 
 class TokenService:
     @staticmethod
-    def generate_jwt(payload, expires_in, resources:str):
-        """Generate a JWT access or refresh token with required parameters."""
+    def signer():
+        """
+        Returns:
+            JWTSigner: The cached signer for the configured `ACCESS_TOKEN_SECRET` and `JWT_ALGORITHM`.
+        """
+        config = flask.current_app.config
+        return get_signer(config.get('ACCESS_TOKEN_SECRET'), config.get('JWT_ALGORITHM', "HS256"))
+
+    @staticmethod
+    def generate_jwt(payload, expires_in, resources: str = None):
+        """
+        Generate a JWT access or refresh token with required parameters.
+
+        The audience is `resources` when given, otherwise the configured `AUDIENCE`.
+        """
         iss = flask.current_app.config.get('ISSUER_NAME')
-        aud = resources
-        access_token_secret = flask.current_app.config.get('ACCESS_TOKEN_SECRET')
+        aud = resources or flask.current_app.config.get('AUDIENCE')
 
         if not iss or not iss.strip():
             raise ValueError("Issuer (iss) cannot be None or empty.")
@@ -27,14 +128,13 @@ class TokenService:
             "exp": aware_utcnow().replace(tzinfo=None) + timedelta(seconds=expires_in),
             "jti": str(uuid.uuid4())
         })
-        return jwt.encode(payload, access_token_secret, algorithm=flask.current_app.config.get('JWT_ALGORITHM', "HS256"))
+        return TokenService.signer().encode(payload)
 
     @staticmethod
     def generate_refresh_token(payload, expires_in):
         """Generate a JWT refresh token with required parameters."""
         iss = flask.current_app.config.get('ISSUER_NAME')
         aud = flask.current_app.config.get('AUDIENCE')
-        access_token_secret = flask.current_app.config.get('ACCESS_TOKEN_SECRET')
 
         if not iss or not iss.strip():
             raise ValueError("Issuer (iss) cannot be None or empty.")
@@ -49,34 +149,53 @@ class TokenService:
             "jti": str(uuid.uuid4()),
             "token_type": "refresh_token"
         })
-        return jwt.encode(payload, access_token_secret, algorithm=flask.current_app.config.get('JWT_ALGORITHM', "HS256"))
+        return TokenService.signer().encode(payload)
 
 
     @staticmethod
-    def handle_authorization_code_grant(client, code, redirect_uri):
-        """Validate authorization code and generate access and refresh JWT tokens."""
-        auth_code = client.validate_authorization_code(code, redirect_uri)
-        if not auth_code:
+    def handle_authorization_code_grant(client, code, redirect_uri, code_verifier=None):
+        """
+        Validate the authorization code, the redirect URI it was issued for and the PKCE verifier, and
+        generate access and refresh JWT tokens.
+        """
+        try:
+            auth_code = AuthorizationCodeService.validate_authorization_code(
+                code, client.client_id, code_verifier, redirect_uri
+            )
+        except ValueError:
             return None
 
-        access_token_exp = flask.current_app.config.get('ACCESS_TOKEN_EXPIRE_MINUTES', 60) * 60
-        refresh_token_exp = flask.current_app.config.get('REFRESH_TOKEN_EXPIRE_MINUTES', 43200) * 60
+        return TokenService._user_token_response(client, auth_code["user_id"], auth_code.get("scope"))
+
+    @staticmethod
+    def handle_device_code_grant(client, device_code):
+        """
+        Issue access and refresh tokens once the user has approved the device.
+
+        Raises:
+            DeviceAuthorizationError: If the grant is still pending, was denied, has expired, or the
+                device is polling too fast.
+        """
+        grant = DeviceAuthorizationService.poll(client.client_id, device_code)
+        return TokenService._user_token_response(client, grant.user_id, grant.scope)
+
+    @staticmethod
+    def _user_token_response(client, user_id, scope):
+        """Issue an access token and the first refresh token of a new refresh token family."""
+        access_token_exp = flask.current_app.config.get('ACCESS_TOKEN_EXPIRE_SECONDS', 3600)
 
         access_token_payload = {
-            "sub": auth_code.user_id,
+            "sub": user_id,
             "client_id": client.client_id,
-            "scope": auth_code.scope,
+            "scope": scope,
             "token_type": "access_token"
         }
-        refresh_token_payload = {
-            "sub": auth_code.user_id,
-            "client_id": client.client_id,
-            "scope": auth_code.scope,
-            "token_type": "refresh_token"
-        }
-
         access_token = TokenService.generate_jwt(access_token_payload, access_token_exp)
-        refresh_token = TokenService.generate_refresh_token(refresh_token_payload, refresh_token_exp)
+
+        family = RefreshTokenFamily.start(client.client_id, user_id, scope, time.time())
+        refresh_token = TokenService._family_refresh_token(
+            client, family, family.generation, ClientService.get_refresh_policy(client), family.created_at
+        )
 
         return {
             "access_token": access_token,
@@ -85,25 +204,175 @@ class TokenService:
             "refresh_token": refresh_token
         }
 
+    @staticmethod
+    def _family_refresh_token(client, family, generation, policy, now):
+        refresh_token_exp = flask.current_app.config.get('REFRESH_TOKEN_EXPIRE_SECONDS', 2592000)
+        if policy.max_lifetime:
+            refresh_token_exp = max(min(refresh_token_exp, family.created_at + policy.max_lifetime - int(now)), 0)
+
+        refresh_token_payload = {
+            "sub": family.user_id,
+            "client_id": client.client_id,
+            "scope": family.scope,
+            "token_type": "refresh_token",
+            "fid": family.id,
+            "gen": generation,
+        }
+        return TokenService.generate_refresh_token(refresh_token_payload, refresh_token_exp)
+
+    @staticmethod
+    def handle_client_credentials_grant(client, scope=None):
+        """
+        Issue an access token to a client acting on its own behalf.
+
+        The token is built from the claims precomputed when the client was authenticated, so issuing
+        it needs no database access. When `CLIENT_CREDENTIALS_TOKEN_REUSE_SECONDS` is set, a token
+        issued to the same client for the same scope within that window is returned again instead of
+        signing a new one.
+
+        Args:
+            client (AuthenticatedClient): The authenticated client.
+            scope (str): The requested scope, if any.
+
+        Returns:
+            dict: The token response.
+        """
+        config = flask.current_app.config
+        reuse_window = config.get('CLIENT_CREDENTIALS_TOKEN_REUSE_SECONDS', 0)
+        token_cache = TokenService._issued_token_cache() if reuse_window else None
+
+        if token_cache is not None:
+            issued = token_cache.get((client.client_id, scope))
+            if issued is not None:
+                return TokenService._client_credentials_response(issued, time.time())
+
+        now = time.time()
+        expires_in = config.get('ACCESS_TOKEN_EXPIRE_SECONDS', 3600)
+        payload = dict(client.claims, iat=int(now), exp=int(now) + expires_in, jti=str(uuid.uuid4()))
+        if scope:
+            payload["scope"] = scope
+
+        if not payload["iss"] or not payload["aud"]:
+            raise ValueError("Issuer (iss) and audience (aud) must be configured.")
+
+        access_token = TokenService.signer().encode(payload)
+        issued = IssuedToken(client.client_id, access_token, payload["exp"], scope)
+
+        if token_cache is not None:
+            token_cache.set((client.client_id, scope), issued, ttl=min(reuse_window, expires_in))
+
+        return TokenService._client_credentials_response(issued, now)
+
+    @staticmethod
+    def _client_credentials_response(issued, now):
+        response = {
+            "access_token": issued.access_token,
+            "token_type": "Bearer",
+            "expires_in": max(int(issued.expires_at - now), 0),
+        }
+        if issued.scope:
+            response["scope"] = issued.scope
+        return response
+
+    @staticmethod
+    def _issued_token_cache():
+        cache = flask.current_app.extensions.get("client_token_cache")
+        if cache is None:
+            cache = flask.current_app.extensions["client_token_cache"] = TTLCache(
+                max_entries=flask.current_app.config.get('CLIENT_CREDENTIAL_CACHE_MAX_ENTRIES', 1024),
+                ttl=flask.current_app.config.get('CLIENT_CREDENTIALS_TOKEN_REUSE_SECONDS', 0),
+            )
+            registry.register_cache("client_tokens", cache)
+        return cache
+
     @staticmethod
     def handle_refresh_token_grant(client, refresh_token):
-        """Validate refresh JWT token and generate a new access JWT token."""
-        access_token_secret = flask.current_app.config.get('ACCESS_TOKEN_SECRET')
+        """
+        Validate a refresh token and issue a new access token, rotating the refresh token if the client's
+        configuration asks for it.
+
+        Refresh tokens belong to a `RefreshTokenFamily`. With `refresh_token_rotation_enabled`, every use
+        returns a token from the next generation, and presenting an older generation again revokes the
+        family, unless it is the previous generation presented within `rotation_overlap_period` seconds of
+        the rotation, which covers a client retrying a request whose response it lost. The idle and
+        maximum lifetimes are measured from the family's last use and creation. The client's policy comes
+        from `ClientService.get_refresh_policy`, so the only database work per refresh is a lookup and an
+        update of the family by primary key.
+
+        A refresh token issued before families existed is enrolled in a new family the first time it is
+        used, and exchanged for a token of that family. Presenting it again is reuse, and revokes the
+        family it started.
 
+        Returns:
+            dict: The token response, or None if the refresh token cannot be used.
+        """
         try:
-            decoded_token = jwt.decode(refresh_token, access_token_secret, algorithms=[flask.current_app.config.get('JWT_ALGORITHM', "HS256")], audience=flask.current_app.config.get('AUDIENCE', AUDIENCE))
-        except jwt.ExpiredSignatureError:
+            decoded_token = TokenService.signer().decode(refresh_token, audience=flask.current_app.config.get('AUDIENCE'))
+        except jwt.InvalidTokenError:
             return None
 
-        if decoded_token["token_type"] != "refresh_token":
+        if decoded_token.get("token_type") != "refresh_token" or decoded_token.get("client_id") != client.client_id:
             return None
 
-        access_token_exp = flask.current_app.config.get('ACCESS_TOKEN_EXPIRE_MINUTES', 60) * 60
+        policy = ClientService.get_refresh_policy(client)
+        now = int(time.time())
+        family_id = decoded_token.get("fid")
+
+        if family_id is None:
+            family = RefreshTokenFamily.start_legacy(
+                client.client_id, decoded_token["sub"], decoded_token.get("scope"), decoded_token.get("jti"), now
+            )
+            if family is None:
+                revoked_family_id = RefreshTokenFamily.revoke_legacy(decoded_token.get("jti"))
+                refresh_token_reuse_detected.inc()
+                logging.warning(
+                    "Legacy refresh token reuse detected; revoked family %s of client %s",
+                    revoked_family_id, client.client_id
+                )
+                return None
+            refresh_token = TokenService._family_refresh_token(client, family, family.generation, policy, now)
+        else:
+            family = db.session.get(RefreshTokenFamily, family_id)
+            if family is None or family.revoked or family.client_id != client.client_id:
+                return None
+            if policy.max_lifetime and now - family.created_at > policy.max_lifetime:
+                return None
+            if policy.idle_lifetime and now - family.last_used_at > policy.idle_lifetime:
+                return None
+
+            generation = decoded_token.get("gen")
+            if generation == family.generation and policy.rotation_enabled:
+                if RefreshTokenFamily.advance(family_id, generation, now):
+                    generation += 1
+                else:
+                    # Another request rotated or revoked the family since it was read
+                    db.session.refresh(family)
+                    if family.revoked:
+                        return None
+
+            if generation == family.generation:
+                if policy.rotation_enabled:
+                    refresh_token = TokenService._family_refresh_token(client, family, generation, policy, now)
+                else:
+                    RefreshTokenFamily.touch(family_id, now)
+            elif generation == family.generation - 1 and now - family.rotated_at <= policy.overlap_period:
+                RefreshTokenFamily.touch(family_id, now)
+                refresh_token = TokenService._family_refresh_token(client, family, family.generation, policy, now)
+            else:
+                RefreshTokenFamily.revoke_family(family_id)
+                refresh_token_reuse_detected.inc()
+                logging.warning(
+                    "Refresh token reuse detected; revoked family %s of client %s (generation %s presented, %s current)",
+                    family_id, client.client_id, generation, family.generation
+                )
+                return None
+
+        access_token_exp = flask.current_app.config.get('ACCESS_TOKEN_EXPIRE_SECONDS', 3600)
 
         new_access_token_payload = {
             "sub": decoded_token["sub"],
             "client_id": decoded_token["client_id"],
-            "scope": decoded_token["scope"],
+            "scope": decoded_token.get("scope"),
             "token_type": "access_token"
         }
         new_access_token = TokenService.generate_jwt(new_access_token_payload, access_token_exp)
@@ -114,3 +383,242 @@ class TokenService:
             "expires_in": access_token_exp,
             "refresh_token": refresh_token
         }
+
+    @staticmethod
+    def revoke_token(token, token_type_hint="refresh_token"):
+        """
+        Revoke a refresh token, and with it every other refresh token in its family.
+
+        https://datatracker.ietf.org/doc/html/rfc7009#section-2.1
+
+        Access tokens are self-contained JWTs and cannot be revoked before they expire.
+
+        Returns:
+            bool: True if a refresh token family was revoked.
+        """
+        try:
+            decoded_token = TokenService.signer().decode(token, audience=flask.current_app.config.get('AUDIENCE'))
+        except jwt.InvalidTokenError:
+            return False
+
+        family_id = decoded_token.get("fid")
+        if decoded_token.get("token_type") != "refresh_token" or family_id is None:
+            return False
+        return RefreshTokenFamily.revoke_family(family_id)
+
+    @staticmethod
+    def introspection_claims(token):
+        """
+        Verify a token for introspection without checking its audience or any server-side state.
+
+        Returns:
+            dict: The token's claims, or None if it is malformed, forged or expired.
+        """
+        if not token:
+            return None
+        try:
+            return TokenService.signer().decode(
+                token,
+                issuer=flask.current_app.config.get('ISSUER_NAME'),
+                options={"verify_aud": False, "require": ["exp"]},
+            )
+        except jwt.InvalidTokenError:
+            return None
+
+    @staticmethod
+    def is_current_refresh_token(claims, family):
+        """Whether a refresh token is the unrevoked, latest generation of its family."""
+        return family is not None and not family.revoked and family.generation == claims.get("gen")
+
+    @staticmethod
+    def introspection_response(claims):
+        """
+        https://datatracker.ietf.org/doc/html/rfc7662#section-2.2
+        """
+        response = {"active": True}
+        for claim in ("scope", "client_id", "sub", "aud", "iss", "exp", "iat", "nbf", "jti", "act", "token_type"):
+            if claims.get(claim) is not None:
+                response[claim] = claims[claim]
+        return response
+
+    @staticmethod
+    def introspect_token(token, token_type_hint=None):
+        """
+        Describe an active token.
+
+        Access tokens are self-contained, so introspecting one needs no database access. A refresh
+        token is only active while it is the latest generation of an unrevoked family.
+
+        Args:
+            token (str): The token to introspect.
+            token_type_hint (str): Accepted for RFC 7662 compatibility; the token type is read from the token.
+
+        Returns:
+            dict: The introspection response, or None if the token is not active.
+        """
+        claims = TokenService.introspection_claims(token)
+        if claims is None:
+            return None
+
+        family_id = claims.get("fid")
+        if claims.get("token_type") == "refresh_token" and family_id is not None:
+            if not TokenService.is_current_refresh_token(claims, db.session.get(RefreshTokenFamily, family_id)):
+                return None
+
+        return TokenService.introspection_response(claims)
+
+    @staticmethod
+    def decode_subject_token(client, subject_token, subject_token_type=ACCESS_TOKEN_TYPE):
+        """
+        Verify a subject token presented for token exchange.
+
+        Only access tokens issued by this server can be exchanged, and only by a client that may act on
+        them: the client the token was issued to, the client that obtained it by an earlier exchange, or
+        a client named in its audience, as a service exchanging the tokens it receives is.
+
+        Raises:
+            TokenExchangeError: If the token type is unsupported, the token is invalid or expired, or the
+                client may not act on it.
+
+        Returns:
+            dict: The subject token's claims.
+        """
+        if subject_token_type not in (ACCESS_TOKEN_TYPE, JWT_TOKEN_TYPE):
+            raise TokenExchangeError("invalid_request", "Unsupported subject_token_type.")
+        if not subject_token:
+            raise TokenExchangeError("invalid_request", "Missing subject_token parameter.")
+
+        try:
+            claims = TokenService.signer().decode(
+                subject_token,
+                issuer=flask.current_app.config.get('ISSUER_NAME'),
+                options={"verify_aud": False, "require": ["exp", "sub"]},
+            )
+        except jwt.InvalidTokenError:
+            raise TokenExchangeError("invalid_grant", "The subject token is invalid or expired.")
+
+        if claims.get("token_type") != "access_token":
+            raise TokenExchangeError("invalid_grant", "Only access tokens can be exchanged.")
+
+        audience = claims.get("aud")
+        audience = [audience] if isinstance(audience, str) else audience or []
+        actor = claims.get("act") or {}
+        if client.client_id not in (claims.get("client_id"), actor.get("sub")) and client.client_id not in audience:
+            raise TokenExchangeError("invalid_grant", "The subject token was not issued to or for this client.")
+        return claims
+
+    @staticmethod
+    def exchange_token(client, subject_claims, audience=None, scope=None, now=None):
+        """
+        Issue a token for another audience on behalf of the subject of an already decoded token.
+
+        https://datatracker.ietf.org/doc/html/rfc8693#section-2.2
+
+        The new token can only narrow the subject token: its scope must be a subset of the subject's
+        scope and it never outlives the subject token. The exchanging client is recorded in the `act`
+        claim, nested in front of any earlier actors.
+
+        Args:
+            client (AuthenticatedClient): The client performing the exchange.
+            subject_claims (dict): Claims from `decode_subject_token`.
+            audience (str): The audience of the new token. Defaults to the configured `AUDIENCE`.
+            scope (str): Space separated scopes. Defaults to the subject token's scope.
+            now (float): The current time, so a batch can share one clock reading.
+
+        Raises:
+            TokenExchangeError: If the requested scope exceeds the subject token's scope.
+
+        Returns:
+            dict: The token exchange response.
+        """
+        config = flask.current_app.config
+        now = int(time.time() if now is None else now)
+        audience = audience or config.get('AUDIENCE')
+
+        subject_scope = subject_claims.get("scope")
+        if scope:
+            if not set(scope.split()) <= set((subject_scope or "").split()):
+                raise TokenExchangeError("invalid_scope", "The requested scope exceeds the scope of the subject token.")
+        else:
+            scope = subject_scope
+
+        actor = {"sub": client.client_id}
+        if "act" in subject_claims:
+            actor["act"] = subject_claims["act"]
+
+        expires_at = min(int(subject_claims["exp"]), now + config.get('ACCESS_TOKEN_EXPIRE_SECONDS', 3600))
+        payload = {
+            "iss": config.get('ISSUER_NAME'),
+            "aud": audience,
+            "sub": subject_claims["sub"],
+            "client_id": subject_claims.get("client_id"),
+            "act": actor,
+            "token_type": "access_token",
+            "iat": now,
+            "exp": expires_at,
+            "jti": str(uuid.uuid4()),
+        }
+        if scope:
+            payload["scope"] = scope
+
+        response = {
+            "access_token": TokenService.signer().encode(payload),
+            "issued_token_type": ACCESS_TOKEN_TYPE,
+            "token_type": "Bearer",
+            "expires_in": expires_at - now,
+        }
+        if scope:
+            response["scope"] = scope
+        return response
+
+    @staticmethod
+    def handle_token_exchange_grant(client, subject_token, subject_token_type=ACCESS_TOKEN_TYPE, audience=None, scope=None):
+        """
+        Exchange a single subject token.
+
+        Raises:
+            TokenExchangeError: If the exchange is refused.
+        """
+        subject_claims = TokenService.decode_subject_token(client, subject_token, subject_token_type)
+        return TokenService.exchange_token(client, subject_claims, audience, scope)
+
+    @staticmethod
+    def handle_token_exchange_batch(client, exchanges):
+        """
+        Perform several token exchanges in one call.
+
+        Each distinct subject token is verified once, however many exchanges use it, and every token
+        is signed with the same cached signer and clock reading. A refused exchange does not affect the
+        others.
+
+        Args:
+            client (AuthenticatedClient): The client performing the exchanges.
+            exchanges (list[dict]): Items with `subject_token`, and optionally `subject_token_type`,
+                `audience` and `scope`.
+
+        Returns:
+            list[dict]: A token exchange response or an OAuth error for each item, in order.
+        """
+        now = time.time()
+        decoded = {}
+        results = []
+
+        for exchange in exchanges:
+            key = (exchange.get("subject_token"), exchange.get("subject_token_type") or ACCESS_TOKEN_TYPE)
+            if key not in decoded:
+                try:
+                    decoded[key] = TokenService.decode_subject_token(client, *key)
+                except TokenExchangeError as e:
+                    decoded[key] = e
+
+            try:
+                subject_claims = decoded[key]
+                if isinstance(subject_claims, TokenExchangeError):
+                    raise subject_claims
+                results.append(TokenService.exchange_token(
+                    client, subject_claims, exchange.get("audience"), exchange.get("scope"), now
+                ))
+            except TokenExchangeError as e:
+                results.append({"error": e.error, "error_description": e.description})
+
+        return results
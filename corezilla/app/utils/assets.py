@@ -0,0 +1,185 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import shutil
+from pathlib import Path
+
+import click
+from flask import current_app, request, send_file, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional; gzip is always available
+    brotli = None
+
+MANIFEST_NAME = "manifest.json"
+
+# Images, fonts and archives are compressed already
+COMPRESSIBLE_SUFFIXES = frozenset({".css", ".js", ".mjs", ".map", ".json", ".svg", ".ico", ".html", ".txt", ".xml"})
+
+assets_cli = AppGroup("assets", help="Static asset commands.")
+
+
+def _fingerprint(path: Path) -> str:
+    return hashlib.blake2b(path.read_bytes(), digest_size=6).hexdigest()
+
+
+def _compress(path: Path):
+    """
+    Write the gzip, and brotli if available, encodings of `path` next to it, keeping only those that are
+    smaller than the file itself.
+
+    Returns:
+        list: The encodings written, best first.
+    """
+    body = path.read_bytes()
+    compressors = {"gzip": (".gz", lambda: gzip.compress(body, compresslevel=9, mtime=0))}
+    if brotli is not None:
+        compressors = {"br": (".br", lambda: brotli.compress(body, quality=11)), **compressors}
+
+    encodings = []
+    for encoding, (suffix, compress) in compressors.items():
+        compressed = compress()
+        if len(compressed) < len(body):
+            path.with_name(path.name + suffix).write_bytes(compressed)
+            encodings.append(encoding)
+    return encodings
+
+
+def build_assets(static_folder, build_folder) -> dict:
+    """
+    Copy every file in `static_folder` to `build_folder` under a name that includes a hash of its
+    contents, e.g. `imgs/logo.png` to `imgs/logo.3f2a1b9c0d4e.png`, pre-compress the files that benefit
+    from it, and write a manifest mapping each file to its fingerprinted copy.
+
+    Args:
+        static_folder (Path): The application's static folder.
+        build_folder (Path): Where to write the fingerprinted files and the manifest; replaced entirely.
+
+    Returns:
+        dict: The manifest: for each file, its fingerprinted path and the encodings it is available in.
+    """
+    static_folder, build_folder = Path(static_folder), Path(build_folder)
+    if build_folder.exists():
+        shutil.rmtree(build_folder)
+
+    manifest = {}
+    for source in sorted(path for path in static_folder.rglob("*") if path.is_file()):
+        name = source.relative_to(static_folder)
+        fingerprinted = name.with_name(f"{name.stem}.{_fingerprint(source)}{name.suffix}")
+        target = build_folder / fingerprinted
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, target)
+
+        encodings = _compress(target) if source.suffix.lower() in COMPRESSIBLE_SUFFIXES else []
+        manifest[name.as_posix()] = {"path": fingerprinted.as_posix(), "encodings": encodings}
+
+    (build_folder / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    return manifest
+
+
+class AssetManifest:
+    """
+    The fingerprinted static files built by `flask assets build`, loaded once when the application is
+    created. Empty when they have not been built, in which case static files are served as they are.
+    """
+
+    ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+    def __init__(self, build_folder, max_age):
+        self.build_folder = Path(build_folder)
+        self.max_age = max_age
+        self.paths = {}
+        self.encodings = {}
+
+        try:
+            manifest = json.loads((self.build_folder / MANIFEST_NAME).read_text())
+        except FileNotFoundError:
+            return
+        for name, entry in manifest.items():
+            self.paths[name] = entry["path"]
+            self.encodings[entry["path"]] = entry["encodings"]
+
+    def url_for(self, filename):
+        """
+        Returns:
+            str: The URL of the fingerprinted copy of the static file `filename`, or of the file itself if
+            there is none.
+        """
+        return url_for("static", filename=self.paths.get(filename, filename))
+
+    def send(self, filename):
+        """
+        Send a fingerprinted file in the best encoding the request accepts, to be cached for `max_age`
+        without revalidation: its name changes whenever its contents do.
+
+        Returns:
+            Response: The file, or None if `filename` is not a fingerprinted file.
+        """
+        encodings = self.encodings.get(filename)
+        if encodings is None:
+            return None
+
+        encoding = next((encoding for encoding in encodings if request.accept_encodings[encoding]), None)
+        path = self.build_folder / (filename + (self.ENCODING_SUFFIXES[encoding] if encoding else ""))
+
+        # A path rather than a file object, so that the server can use its file wrapper (sendfile), or
+        # the front end with USE_X_SENDFILE
+        response = send_file(
+            path, mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            conditional=True, max_age=self.max_age,
+        )
+        if encoding:
+            response.content_encoding = encoding
+        if encodings:
+            response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+def asset_url(filename):
+    """
+    Template helper returning the URL of a static file, fingerprinted if the assets have been built.
+
+    Args:
+        filename (str): The path of the file in the static folder, e.g. "imgs/default_logo.png".
+    """
+    return current_app.extensions["assets"].url_for(filename)
+
+
+def register_assets(app):
+    """
+    Serve fingerprinted static files from `STATIC_BUILD_FOLDER` when they have been built, add the
+    `asset_url` template helper, and the `flask assets` commands.
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    manifest = AssetManifest(app.config["STATIC_BUILD_FOLDER"], app.config.get("STATIC_ASSETS_MAX_AGE_SECONDS", 0))
+    app.extensions["assets"] = manifest
+    app.add_template_global(asset_url)
+    app.cli.add_command(assets_cli)
+
+    if not manifest.paths or "static" not in app.view_functions:
+        return
+
+    send_static_file = app.view_functions["static"]
+
+    def static(filename):
+        return manifest.send(filename) or send_static_file(filename=filename)
+
+    app.view_functions["static"] = static
+    logging.info("Serving %d fingerprinted static files", len(manifest.paths))
+
+
+@assets_cli.command("build")
+def build_command():
+    """Fingerprint and pre-compress the static files."""
+    app = current_app
+    manifest = build_assets(app.static_folder, app.config["STATIC_BUILD_FOLDER"])
+    compressed = sum(1 for entry in manifest.values() if entry["encodings"])
+    click.echo(f"Built {len(manifest)} static files ({compressed} pre-compressed) into {app.config['STATIC_BUILD_FOLDER']}")
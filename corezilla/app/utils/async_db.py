@@ -0,0 +1,94 @@
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+
+from corezilla.app.models.Client import Client, ClientConfiguration
+from corezilla.app.models.Token import RefreshTokenFamily
+
+# Async drivers used when `ASYNC_SQLALCHEMY_DATABASE_URI` is not set and the synchronous URI names a
+# backend without one
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_database_uri(uri):
+    """
+    Derive an asyncio database URI from a synchronous one, e.g. `sqlite:///app.db` to
+    `sqlite+aiosqlite:///app.db`.
+
+    Raises:
+        ValueError: If there is no known async driver for the backend.
+    """
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver is known for {backend}; set ASYNC_SQLALCHEMY_DATABASE_URI.")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """
+    Asyncio access to the few tables the native ASGI endpoints read, using SQLAlchemy's asyncio extension.
+
+    It shares the models of the Flask-SQLAlchemy application but has its own engine and connection
+    pool. The asyncio extension needs `greenlet`, and the database needs an async driver such as
+    `aiosqlite`, which is why they are only imported when an `AsyncDatabase` is created.
+    """
+
+    def __init__(self, uri, **engine_options):
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        self.engine = create_async_engine(uri, **engine_options)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Build the database from `ASYNC_SQLALCHEMY_DATABASE_URI`, or derive it from `SQLALCHEMY_DATABASE_URI`.
+        """
+        uri = config.get("ASYNC_SQLALCHEMY_DATABASE_URI") or async_database_uri(config["SQLALCHEMY_DATABASE_URI"])
+        # JSON columns are (de)serialised by the application's JSON provider, as in the synchronous engine
+        json_options = {
+            key: value for key, value in config.get("SQLALCHEMY_ENGINE_OPTIONS", {}).items()
+            if key in ("json_serializer", "json_deserializer")
+        }
+        return cls(uri, pool_pre_ping=True, **json_options)
+
+    async def verify_client(self, client_id, client_secret):
+        """
+        Verify client credentials, upgrading a legacy plaintext secret to a verifier on success.
+
+        Returns:
+            Client: The detached client, or None if the credentials are invalid.
+        """
+        async with self.session() as session:
+            result = await session.execute(select(Client).where(Client.client_id == client_id))
+            client = result.scalar_one_or_none()
+            if client is None or not client.verify_secret(client_secret):
+                return None
+            if session.is_modified(client):
+                await session.commit()
+            return client
+
+    async def get_latest_client_configuration(self, client_pk):
+        """
+        Returns:
+            ClientConfiguration: The detached latest configuration of a client, given its primary key, or None.
+        """
+        async with self.session() as session:
+            result = await session.execute(
+                select(ClientConfiguration)
+                .where(ClientConfiguration.client_id == str(client_pk))
+                .order_by(ClientConfiguration.version.desc())
+                .limit(1)
+            )
+            return result.scalar_one_or_none()
+
+    async def get_refresh_token_family(self, family_id):
+        async with self.session() as session:
+            return await session.get(RefreshTokenFamily, family_id)
+
+    async def dispose(self):
+        await self.engine.dispose()
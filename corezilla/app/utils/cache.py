@@ -0,0 +1,75 @@
+import collections
+import threading
+import time
+
+
+class TTLCache:
+    """
+    A small, thread-safe, in-process LRU cache whose entries expire after a time-to-live.
+
+    The cache exposes `hits` and `misses` so it can be registered with the metrics registry. It is
+    local to a worker process, so anything cached here may be stale for up to `ttl` seconds in other
+    workers after the source of truth changes.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """
+        Args:
+            key: Any hashable key.
+            value: The value to cache.
+            ttl (float): Seconds until the entry expires. Defaults to the cache's `ttl`.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_if(self, predicate):
+        """
+        Remove every entry whose value matches `predicate`.
+
+        This scans the whole cache, so it is meant for rare invalidations such as a client being
+        updated or deleted, not for the request path.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        with self._lock:
+            keys = [key for key, (_, value) in self._entries.items() if predicate(value)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
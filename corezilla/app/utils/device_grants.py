@@ -0,0 +1,297 @@
+import os
+import sqlite3
+import threading
+
+PENDING = "pending"
+APPROVED = "approved"
+DENIED = "denied"
+
+# https://datatracker.ietf.org/doc/html/rfc8628#section-3.5
+SLOW_DOWN_INCREMENT_SECONDS = 5
+
+
+class DeviceGrant:
+    """A device authorization request waiting for the user to approve or deny it on another device."""
+
+    __slots__ = ("device_code", "user_code", "client_id", "scope", "expires_at", "interval", "status", "user_id")
+
+    def __init__(self, device_code, user_code, client_id, scope, expires_at, interval, status=PENDING, user_id=None):
+        self.device_code = device_code
+        self.user_code = user_code
+        self.client_id = client_id
+        self.scope = scope
+        self.expires_at = expires_at
+        self.interval = interval
+        self.status = status
+        self.user_id = user_id
+
+
+class DeviceGrantStore:
+    """
+    Interface implemented by every pending device grant backend.
+
+    Grants are indexed by both their device code, which the polling device presents, and their user
+    code, which the user types on the verification page.
+
+    Two pieces of state are kept in-process whatever the backend. The first is the time of each
+    code's last poll, so polling too fast gets `slow_down` without reading the store. The second is
+    an `Event` per code that is set when the grant is resolved in this process, so waiting pollers see
+    an approval immediately.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._poll_state = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        self.next_sweep = 0.0
+
+    def add(self, grant):
+        raise NotImplementedError
+
+    def get_by_device_code(self, device_code, now):
+        """
+        Returns:
+            DeviceGrant | None: The grant, or None if it is unknown or has expired.
+        """
+        raise NotImplementedError
+
+    def get_by_user_code(self, user_code, now):
+        raise NotImplementedError
+
+    def _resolve(self, user_code, status, user_id, now):
+        raise NotImplementedError
+
+    def resolve(self, user_code, status, user_id, now):
+        """
+        Approve or deny a pending grant and wake any poller waiting on it.
+
+        Returns:
+            DeviceGrant | None: The resolved grant, or None if no pending, unexpired grant has the user code.
+        """
+        grant = self._resolve(user_code, status, user_id, now)
+        if grant is not None:
+            self._event(grant.device_code).set()
+        return grant
+
+    def consume(self, device_code):
+        """
+        Remove an approved grant so its tokens can only be issued once.
+
+        Returns:
+            bool: True if this call removed the grant.
+        """
+        raise NotImplementedError
+
+    def _sweep(self, now):
+        raise NotImplementedError
+
+    def sweep(self, now):
+        """
+        Remove expired grants and their in-process polling state.
+
+        Events are kept only for codes that are being polled in this process. An event set by `resolve`
+        for a grant polled by another worker, or never polled, has no waiter and is dropped.
+
+        Returns:
+            int: The number of grants that were removed.
+        """
+        with self._lock:
+            for device_code in [code for code, (_, _, expires_at) in self._poll_state.items() if expires_at <= now]:
+                del self._poll_state[device_code]
+            for device_code in [code for code in self._events if code not in self._poll_state]:
+                del self._events[device_code]
+        return self._sweep(now)
+
+    def check_poll_rate(self, device_code, now):
+        """
+        Record a poll and check it against the interval the device was told to use.
+
+        Returns:
+            bool | None: None if this process has not seen the code polled before, False if the device
+            is polling too fast (its interval is increased), otherwise True.
+        """
+        with self._lock:
+            state = self._poll_state.get(device_code)
+            if state is None:
+                return None
+            last_polled_at, interval, _ = state
+            state[0] = now
+            if now - last_polled_at < interval:
+                state[1] = interval + SLOW_DOWN_INCREMENT_SECONDS
+                return False
+            return True
+
+    def start_polling(self, grant, now):
+        with self._lock:
+            self._poll_state.setdefault(grant.device_code, [now, grant.interval, grant.expires_at])
+
+    def forget(self, device_code):
+        with self._lock:
+            self._poll_state.pop(device_code, None)
+            self._events.pop(device_code, None)
+
+    def _event(self, device_code):
+        with self._lock:
+            event = self._events.get(device_code)
+            if event is None:
+                event = self._events[device_code] = threading.Event()
+            return event
+
+    def wait(self, device_code, timeout):
+        """
+        Block until the grant is resolved in this process or `timeout` seconds pass.
+
+        Returns:
+            bool: True if the grant was resolved by this process.
+        """
+        return self._event(device_code).wait(timeout)
+
+
+class MemoryDeviceGrantStore(DeviceGrantStore):
+    """An in-process grant store; pending grants are lost on restart and not shared between workers."""
+
+    name = "memory"
+
+    def __init__(self):
+        super().__init__()
+        self._by_device_code = {}
+        self._by_user_code = {}
+        self._grants_lock = threading.Lock()
+
+    def add(self, grant):
+        with self._grants_lock:
+            self._by_device_code[grant.device_code] = grant
+            self._by_user_code[grant.user_code] = grant
+
+    def get_by_device_code(self, device_code, now):
+        grant = self._by_device_code.get(device_code)
+        return grant if grant is not None and grant.expires_at > now else None
+
+    def get_by_user_code(self, user_code, now):
+        grant = self._by_user_code.get(user_code)
+        return grant if grant is not None and grant.expires_at > now else None
+
+    def _resolve(self, user_code, status, user_id, now):
+        with self._grants_lock:
+            grant = self._by_user_code.get(user_code)
+            if grant is None or grant.status != PENDING or grant.expires_at <= now:
+                return None
+            grant.status = status
+            grant.user_id = user_id
+            return grant
+
+    def consume(self, device_code):
+        with self._grants_lock:
+            grant = self._by_device_code.get(device_code)
+            if grant is None or grant.status != APPROVED:
+                return False
+            del self._by_device_code[device_code]
+            self._by_user_code.pop(grant.user_code, None)
+        self.forget(device_code)
+        return True
+
+    def _sweep(self, now):
+        with self._grants_lock:
+            expired = [grant for grant in self._by_device_code.values() if grant.expires_at <= now]
+            for grant in expired:
+                del self._by_device_code[grant.device_code]
+                self._by_user_code.pop(grant.user_code, None)
+        return len(expired)
+
+
+class SQLiteDeviceGrantStore(DeviceGrantStore):
+    """
+    A grant store backed by a SQLite database, shared by every worker on the host.
+
+    A grant approved by one worker is seen by another the next time that worker reads it, which
+    happens at most once per polling interval per code.
+    """
+
+    name = "sqlite"
+
+    _columns = "device_code, user_code, client_id, scope, expires_at, interval, status, user_id"
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = os.fspath(path)
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS device_grant ("
+                "device_code TEXT PRIMARY KEY, user_code TEXT NOT NULL UNIQUE, client_id TEXT NOT NULL, "
+                "scope TEXT, expires_at REAL NOT NULL, interval INTEGER NOT NULL, status TEXT NOT NULL, user_id TEXT)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_device_grant_expires_at ON device_grant (expires_at)")
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def add(self, grant):
+        with self._connection() as connection:
+            connection.execute(
+                f"INSERT INTO device_grant ({self._columns}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                tuple(getattr(grant, name) for name in DeviceGrant.__slots__)
+            )
+
+    def _get(self, column, value, now):
+        row = self._connection().execute(
+            f"SELECT {self._columns} FROM device_grant WHERE {column} = ? AND expires_at > ?", (value, now)
+        ).fetchone()
+        return DeviceGrant(*row) if row else None
+
+    def get_by_device_code(self, device_code, now):
+        return self._get("device_code", device_code, now)
+
+    def get_by_user_code(self, user_code, now):
+        return self._get("user_code", user_code, now)
+
+    def _resolve(self, user_code, status, user_id, now):
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "UPDATE device_grant SET status = ?, user_id = ? WHERE user_code = ? AND status = ? AND expires_at > ?",
+                (status, user_id, user_code, PENDING, now)
+            )
+        if cursor.rowcount != 1:
+            return None
+        return self._get("user_code", user_code, now)
+
+    def consume(self, device_code):
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "DELETE FROM device_grant WHERE device_code = ? AND status = ?", (device_code, APPROVED)
+            )
+        self.forget(device_code)
+        return cursor.rowcount == 1
+
+    def _sweep(self, now):
+        with self._connection() as connection:
+            cursor = connection.execute("DELETE FROM device_grant WHERE expires_at <= ?", (now,))
+        return cursor.rowcount
+
+
+def create_device_grant_store(config):
+    """
+    Build the store selected by `DEVICE_GRANT_BACKEND`.
+
+    Args:
+        config (flask.Config): The application configuration.
+
+    Returns:
+        DeviceGrantStore: The configured store.
+    """
+    backend = config.get("DEVICE_GRANT_BACKEND", "memory")
+
+    if backend == "memory":
+        return MemoryDeviceGrantStore()
+    if backend == "sqlite":
+        return SQLiteDeviceGrantStore(config["DEVICE_GRANT_SQLITE_PATH"])
+
+    raise ValueError(f"Unknown DEVICE_GRANT_BACKEND: {backend}")
@@ -0,0 +1,32 @@
+import hashlib
+
+from flask import current_app, request
+
+
+def make_etag(*parts):
+    """
+    Returns:
+        str: An opaque ETag value for `parts`, which must have stable `repr`s, such as numbers and strings.
+    """
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def with_etag(response, etag, weak=False):
+    """Set the ETag of a response, and have clients revalidate it rather than reuse it."""
+    response.set_etag(etag, weak=weak)
+    # The responses belong to the signed in user, so they must not be stored by shared caches
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(etag, weak=False):
+    """
+    Answer a conditional GET whose `If-None-Match` already has `etag`, before any work is done to build
+    the response. As RFC 9110 requires, a weak tag matches the strong tag of the same value and vice versa.
+
+    Returns:
+        Response: An empty 304 response carrying the ETag, or None if the response must be built.
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_etag(current_app.response_class(status=304), etag, weak=weak)
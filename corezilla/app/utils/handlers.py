@@ -1,7 +1,40 @@
+import functools
 import http
-from urllib.parse import urlencode
+import json
+from urllib.parse import urlencode, urlparse
 
-from flask import jsonify, redirect
+from flask import current_app
+
+DEFAULT_ERROR_DESCRIPTION = "An error occurred during authorization."
+
+
+@functools.lru_cache(maxsize=256)
+def _error_body(error, description):
+    """
+    Serialise the parts of an error response that do not depend on the request, once per pair.
+
+    Returns:
+        tuple: The JSON body as bytes, and the query string for a redirect.
+    """
+    error_response = {"error": error, "error_description": description}
+    return json.dumps(error_response, separators=(",", ":")).encode(), urlencode(error_response)
+
+
+@functools.lru_cache(maxsize=1024)
+def _redirect_base(redirect_uri):
+    """
+    Validate a redirect URI once. Only URIs registered for a client are passed in, so the cache is not
+    filled by arbitrary request parameters.
+
+    Returns:
+        str: `redirect_uri` followed by the separator for more query parameters, or None if it is not an
+        absolute URI.
+    """
+    parsed_uri = urlparse(redirect_uri)
+    if not parsed_uri.scheme or not parsed_uri.netloc:
+        return None
+    # Keep any query component of the registered URI, as RFC 6749 section 3.1.2 requires
+    return redirect_uri + ("&" if parsed_uri.query else "?")
 
 
 def handle_error(redirect_uri, error, description=None, state=None):
@@ -11,35 +44,31 @@ def handle_error(redirect_uri, error, description=None, state=None):
     If a valid `redirect_uri` is provided, redirects the user with the error
     parameters. Otherwise, returns a JSON error response.
 
+    Error bodies are serialised once per (error, description) pair and redirect URIs are validated once
+    each, so only `state` is encoded per request, and the response is built without `jsonify`.
+
     Args:
-        redirect_uri (str): The redirect URI to send the error response to.
+        redirect_uri (str): The redirect URI to send the error response to. It must be one registered
+            for the client, e.g. from `ClientService.get_registered_redirect_uri`.
         error (str): The OAuth error code (e.g., "invalid_request", "unauthorized").
         description (str, optional): A human-readable error description.
         state (str, optional): The original state parameter to maintain CSRF protection.
 
     Returns:
-        A Flask `redirect` response if `redirect_uri` is valid, else a JSON error response.
+        A redirect response if `redirect_uri` is valid, else a JSON error response.
     """
-    error_response = {
-        "error": error,
-        "error_description": description or "An error occurred during authorization."
-    }
-
-    if state:
-        error_response["state"] = state  # Preserve state for CSRF protection
+    body, query = _error_body(error, description or DEFAULT_ERROR_DESCRIPTION)
 
     # If `redirect_uri` is provided, validate and redirect
-    if redirect_uri:
-        from urllib.parse import urlparse
-
-        parsed_uri = urlparse(redirect_uri)
-        if not parsed_uri.scheme or not parsed_uri.netloc:
-            # Invalid `redirect_uri`, fallback to JSON response
-            return jsonify(error_response), http.HTTPStatus.BAD_REQUEST
+    redirect_base = _redirect_base(redirect_uri) if redirect_uri else None
+    if redirect_base:
+        # Append error parameters to redirect URI, preserving state for CSRF protection
+        location = redirect_base + query
+        if state:
+            location += "&" + urlencode({"state": state})
+        return current_app.response_class(status=http.HTTPStatus.FOUND, headers={"Location": location})
 
-        # Append error parameters to redirect URI
-        redirect_url = f"{redirect_uri}?{urlencode(error_response)}"
-        return redirect(redirect_url)
-
-    # If no `redirect_uri`, return JSON error response
-    return jsonify(error_response), http.HTTPStatus.BAD_REQUEST
\ No newline at end of file
+    # Otherwise, or if `redirect_uri` is invalid, return JSON error response
+    if state:
+        body = body[:-1] + b',"state":' + json.dumps(state).encode() + b"}"
+    return current_app.response_class(body, status=http.HTTPStatus.BAD_REQUEST, mimetype="application/json")
@@ -0,0 +1,153 @@
+import logging
+import time
+
+from flask import Flask, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+from corezilla.app.utils.metrics import registry
+
+db_queries_per_request = registry.histogram(
+    "db_queries_per_request", "Number of SQL queries executed while handling a request.",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+db_seconds_per_request = registry.histogram(
+    "db_seconds_per_request", "Total time spent executing SQL queries while handling a request."
+)
+db_slow_queries_total = registry.counter(
+    "db_slow_queries_total", "Number of SQL queries slower than SQLALCHEMY_SLOW_QUERY_THRESHOLD_SECONDS."
+)
+
+
+class QueryStats:
+    """Query count and total database time for a single request."""
+
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+def redact_parameters(parameters):
+    """
+    Replace bound parameter values with placeholders so they never reach the logs.
+
+    Args:
+        parameters: The parameters passed to the DBAPI cursor, a sequence, a mapping, or a list of
+            either for `executemany` calls.
+
+    Returns:
+        The same shape of parameters with every value replaced by "?". Parameter lists from
+        `executemany` calls are summarised by their length.
+    """
+    if isinstance(parameters, dict):
+        return {key: "?" for key in parameters}
+    if isinstance(parameters, list):
+        return f"<{len(parameters)} parameter sets>"
+    if isinstance(parameters, tuple):
+        return tuple("?" for _ in parameters)
+    return "?"
+
+
+def _current_query_stats():
+    if not has_app_context():
+        return None
+    return g.get("query_stats")
+
+
+def register_sql_instrumentation(app: Flask, engines) -> None:
+    """
+    Count queries and database time per request, and log slow queries.
+
+    Every query executed while a request is being handled is added to the `QueryStats` that
+    `before_request_handler` places on `g`. Queries slower than `SQLALCHEMY_SLOW_QUERY_THRESHOLD_SECONDS`
+    are logged with their parameters redacted. At the end of the request the totals are recorded in the
+    metrics registry and, in debug mode, returned as `X-DB-Query-Count` and `X-DB-Query-Time` headers.
+
+    Args:
+        app (Flask): The Flask application instance
+        engines (Iterable[sqlalchemy.engine.Engine]): The engines to instrument
+    """
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context, which is discarded with a statement that fails before
+        # `after_cursor_execute`; statements run without one, such as the dialect's own, are not counted
+        if context is not None:
+            context._query_started_at = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = getattr(context, "_query_started_at", None)
+        if started_at is None:
+            return
+        duration = time.perf_counter() - started_at
+
+        stats = _current_query_stats()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += duration
+
+        threshold = app.config.get("SQLALCHEMY_SLOW_QUERY_THRESHOLD_SECONDS")
+        if threshold is not None and duration >= threshold:
+            endpoint = request.endpoint if has_request_context() else None
+            db_slow_queries_total.inc(endpoint=endpoint or "")
+            logging.warning(
+                "Slow query (%.1f ms) for request %s on %s: %s; parameters: %s",
+                duration * 1000,
+                g.get("request_id") if has_app_context() else None,
+                endpoint,
+                statement,
+                redact_parameters(parameters),
+            )
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    @app.after_request
+    def record_query_stats(response):
+        stats = g.get("query_stats")
+        if stats is None:
+            return response
+
+        endpoint = request.endpoint or ""
+        db_queries_per_request.observe(stats.count, endpoint=endpoint)
+        db_seconds_per_request.observe(stats.duration, endpoint=endpoint)
+        logging.debug(
+            "Request %s on %s ran %d queries in %.1f ms",
+            g.get("request_id"), endpoint, stats.count, stats.duration * 1000
+        )
+
+        if app.debug:
+            response.headers["X-DB-Query-Count"] = str(stats.count)
+            response.headers["X-DB-Query-Time"] = f"{stats.duration * 1000:.2f}"
+        return response
+
+
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "Time spent handling a request, by blueprint."
+)
+
+
+def register_request_metrics(app: Flask) -> None:
+    """
+    Record how long each request took in a latency histogram labelled by blueprint.
+
+    The start time is taken in `before_request_handler`. Bound histograms are cached per blueprint so
+    recording a request is a dictionary lookup, a bisect and two list increments on a thread-local shard.
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    bound_histograms = {}
+
+    @app.after_request
+    def record_request_duration(response):
+        started_at = g.get("request_started_at")
+        if started_at is None:
+            return response
+
+        blueprint = request.blueprint or ""
+        histogram = bound_histograms.get(blueprint)
+        if histogram is None:
+            histogram = bound_histograms[blueprint] = http_request_duration_seconds.labels(blueprint=blueprint)
+        histogram.observe(time.perf_counter() - started_at)
+        return response
@@ -0,0 +1,306 @@
+import bisect
+import math
+import threading
+import weakref
+
+# Upper bounds (in seconds) used for latency histograms unless a metric asks for its own.
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Shards of finished threads are folded together once this many shards exist.
+_MAX_SHARDS_BEFORE_PRUNE = 64
+
+
+class _ThreadShards:
+    """
+    Per-thread storage for metric values.
+
+    Each thread writes only to its own shard, so recording a value never takes a lock; the lock is
+    only taken when a thread creates its shard and when the shards are read for collection. Shards
+    belonging to threads that have finished are merged into a single retired shard so that servers
+    which start a thread per request do not accumulate shards forever.
+    """
+
+    def __init__(self, merge):
+        self._merge = merge
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def get(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                if len(self._shards) >= _MAX_SHARDS_BEFORE_PRUNE:
+                    self._prune()
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+            return shard
+
+    def _prune(self):
+        live = []
+        for thread_ref, shard in self._shards:
+            thread = thread_ref()
+            if thread is None or not thread.is_alive():
+                self._merge(self._retired, shard)
+            else:
+                live.append((thread_ref, shard))
+        self._shards = live
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Every shard merged into a single mapping of label tuples to values.
+        """
+        with self._lock:
+            self._prune()
+            merged = {}
+            self._merge(merged, self._retired)
+            for _, shard in self._shards:
+                self._merge(merged, dict(shard))
+            return merged
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Counter:
+    """A monotonically increasing counter, optionally split by labels."""
+
+    type = "counter"
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._shards = _ThreadShards(self._merge)
+
+    @staticmethod
+    def _merge(target, source):
+        for key, value in source.items():
+            target[key] = target.get(key, 0) + value
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def labels(self, **labels):
+        return _BoundCounter(self, _label_key(labels))
+
+    def collect(self):
+        """
+        Returns:
+            dict: A mapping of label tuples to the current counter value.
+        """
+        return self._shards.snapshot()
+
+
+class _BoundCounter:
+    __slots__ = ("_shards", "_key")
+
+    def __init__(self, counter, key):
+        self._shards = counter._shards
+        self._key = key
+
+    def inc(self, amount=1):
+        shard = self._shards.get()
+        shard[self._key] = shard.get(self._key, 0) + amount
+
+
+class Histogram:
+    """A cumulative histogram of observed values, optionally split by labels."""
+
+    type = "histogram"
+
+    def __init__(self, name, description, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _ThreadShards(self._merge)
+
+    @staticmethod
+    def _merge(target, source):
+        for key, series in source.items():
+            existing = target.get(key)
+            if existing is None:
+                target[key] = list(series)
+            else:
+                for index, value in enumerate(series):
+                    existing[index] += value
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def labels(self, **labels):
+        """
+        Bind label values once so that hot paths can skip building the label key on every observation.
+
+        Returns:
+            _BoundHistogram: An object with an `observe(value)` method.
+        """
+        return _BoundHistogram(self, _label_key(labels))
+
+    def collect(self):
+        """
+        Returns:
+            dict: A mapping of label tuples to ``(bucket_counts, total_count, total_sum)``, where
+            ``bucket_counts`` holds the non-cumulative count for each bucket followed by +Inf.
+        """
+        return {
+            key: (series[:-1], sum(series[:-1]), series[-1])
+            for key, series in self._shards.snapshot().items()
+        }
+
+
+class _BoundHistogram:
+    __slots__ = ("_shards", "_key", "_buckets", "_size")
+
+    def __init__(self, histogram, key):
+        self._shards = histogram._shards
+        self._key = key
+        self._buckets = histogram.buckets
+        self._size = len(histogram.buckets) + 2
+
+    def observe(self, value):
+        shard = self._shards.get()
+        series = shard.get(self._key)
+        if series is None:
+            # One slot per bucket, one for +Inf, then the running sum
+            series = shard[self._key] = [0] * (self._size - 1) + [0.0]
+        series[bisect.bisect_left(self._buckets, value)] += 1
+        series[-1] += value
+
+
+class Gauge:
+    """A value sampled from a callback whenever the metrics are collected."""
+
+    type = "gauge"
+
+    def __init__(self, name, description, callback):
+        self.name = name
+        self.description = description
+        self.callback = callback
+
+    def collect(self):
+        """
+        Returns:
+            dict: A mapping of label tuples to the current value, as returned by the callback.
+        """
+        return self.callback()
+
+
+class MetricsRegistry:
+    """Holds every metric created by the application so they can be collected in one place."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+
+        self.gauge("cache_hits", "Lookups answered from an in-process cache.", self._collect_cache_hits)
+        self.gauge("cache_misses", "Lookups an in-process cache could not answer.", self._collect_cache_misses)
+        self.gauge("cache_hit_ratio", "Fraction of lookups answered from an in-process cache.", self._collect_cache_ratio)
+
+    def _get_or_create(self, cls, name, description, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, description, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {type(metric).__name__}.")
+            return metric
+
+    def counter(self, name, description):
+        return self._get_or_create(Counter, name, description)
+
+    def histogram(self, name, description, buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def gauge(self, name, description, callback):
+        return self._get_or_create(Gauge, name, description, callback=callback)
+
+    def register_cache(self, name, cache):
+        """
+        Export the hit and miss counts of an in-process cache.
+
+        Args:
+            name (str): The value of the `cache` label.
+            cache: Any object with integer `hits` and `misses` attributes. A later registration under
+                the same name replaces the earlier one.
+        """
+        with self._lock:
+            self._caches[name] = cache
+
+    def _cache_stats(self):
+        with self._lock:
+            return [(name, cache.hits, cache.misses) for name, cache in self._caches.items()]
+
+    def _collect_cache_hits(self):
+        return {(("cache", name),): hits for name, hits, _ in self._cache_stats()}
+
+    def _collect_cache_misses(self):
+        return {(("cache", name),): misses for name, _, misses in self._cache_stats()}
+
+    def _collect_cache_ratio(self):
+        return {
+            (("cache", name),): hits / (hits + misses) if hits + misses else 0.0
+            for name, hits, misses in self._cache_stats()
+        }
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key, extra=()):
+    labels = key + extra
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + "}"
+
+
+def render_prometheus(metrics_registry):
+    """
+    Render every metric in the Prometheus text exposition format (version 0.0.4).
+
+    Args:
+        metrics_registry (MetricsRegistry): The registry to render.
+
+    Returns:
+        str: The exposition document.
+    """
+    lines = []
+    for metric in sorted(metrics_registry.metrics(), key=lambda metric: metric.name):
+        values = metric.collect()
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+
+        if metric.type != "histogram":
+            for key, value in sorted(values.items()):
+                lines.append(f"{metric.name}{_format_labels(key)} {_format_value(value)}")
+            continue
+
+        for key, (bucket_counts, count, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(metric.buckets + (math.inf,), bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{metric.name}_bucket{_format_labels(key, (('le', _format_value(float(bound))),))} {cumulative}")
+            lines.append(f"{metric.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{metric.name}_count{_format_labels(key)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
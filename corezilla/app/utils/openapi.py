@@ -0,0 +1,164 @@
+import gzip
+import hashlib
+import threading
+
+from flask import current_app, request
+from flask_smorest import Api
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional; gzip is always available
+    brotli = None
+
+
+class RenderedDocument:
+    """
+    A document rendered once, kept along with its compressed encodings and an ETag for each.
+
+    Each encoding is a different representation, so it has its own strong ETag (RFC 9110 section
+    8.8.3), derived from the document's by a suffix.
+    """
+
+    __slots__ = ("mimetype", "etags", "encodings")
+
+    ETAG_SUFFIXES = {"identity": "", "gzip": "-gz", "br": "-br"}
+
+    def __init__(self, body, mimetype):
+        self.mimetype = mimetype
+        # Compressed once, so the best ratio is worth its time
+        self.encodings = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.encodings["br"] = brotli.compress(body, quality=11)
+
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.etags = {encoding: etag + self.ETAG_SUFFIXES[encoding] for encoding in self.encodings}
+
+    def response(self, max_age):
+        """
+        Returns:
+            Response: A 304 if the request's `If-None-Match` matches the ETag of the best encoding the
+            request accepts, else the document in that encoding, with caching headers.
+        """
+        encoding = next(
+            (encoding for encoding in ("br", "gzip") if encoding in self.encodings and request.accept_encodings[encoding]),
+            "identity",
+        )
+        etag = self.etags[encoding]
+
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            # The stored bytes are the body itself; they are not copied or re-encoded
+            response = current_app.response_class(self.encodings[encoding], mimetype=self.mimetype)
+            if encoding != "identity":
+                response.content_encoding = encoding
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.vary.add("Accept-Encoding")
+        return response
+
+
+class LazySpecApi(Api):
+    """
+    A flask-smorest `Api` that documents its blueprints the first time the OpenAPI spec is used, such as
+    when `/api-spec.json` is first requested or `flask openapi write` runs, rather than when they are
+    registered.
+
+    Documenting a blueprint copies the documentation of every view and resolves every schema it uses,
+    which was most of the time `create_app` took. Workers and test fixtures that never serve the spec
+    no longer pay for it.
+
+    The spec and the ReDoc, Swagger UI and RapiDoc pages are rendered once per process, compressed, and
+    served from memory with an ETag and `OPENAPI_CACHE_MAX_AGE_SECONDS` of caching, rather than the spec
+    being converted to a dict and serialised on every request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._spec = None
+        self._undocumented = []
+        self._documenting = False
+        self._document_lock = threading.RLock()
+        self._rendered = {}
+        super().__init__(*args, **kwargs)
+
+    @property
+    def spec(self):
+        if self._undocumented:
+            with self._document_lock:
+                # Views documented below may use the spec themselves; they get it as it is so far
+                if self._undocumented and not self._documenting:
+                    self._documenting = True
+                    try:
+                        self._document_blueprints()
+                    finally:
+                        self._documenting = False
+        return self._spec
+
+    @spec.setter
+    def spec(self, spec):
+        # Set by `init_app`; blueprints registered with a previous application are not documented in it
+        self._spec = spec
+        self._undocumented = []
+        self._rendered = {}
+
+    def _document_blueprints(self):
+        while self._undocumented:
+            blp, name, parameters = self._undocumented[0]
+            blp.register_views_in_doc(self, self._app, self._spec, name=name, parameters=parameters)
+            self._spec.tag({"name": name, "description": blp.description})
+            del self._undocumented[0]
+
+    def register_blueprint(self, blp, *, parameters=None, **options):
+        """
+        Register a blueprint in the application, and queue its views to be documented when the spec is
+        next used.
+        """
+        name = options.get("name", blp.name)
+        self._app.extensions["flask-smorest"]["blp_name_to_api"][name] = self
+        self._app.register_blueprint(blp, **options)
+
+        with self._document_lock:
+            self._undocumented.append((blp, name, parameters))
+            self._rendered = {}
+
+    def render_spec(self):
+        """
+        Render the spec, documenting any blueprints not yet documented, and compress it, unless that has
+        already been done. Called by `prewarm` so that pre-forked workers inherit the result.
+
+        Returns:
+            RenderedDocument: The rendered spec.
+        """
+        return self._render("openapi_json", self._spec_document)
+
+    def _spec_document(self):
+        return super()._openapi_json().get_data(), "application/json"
+
+    def _render(self, key, render):
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            with self._document_lock:
+                rendered = self._rendered.get(key)
+                if rendered is None:
+                    rendered = self._rendered[key] = RenderedDocument(*render())
+        return rendered
+
+    def _serve(self, key, render):
+        return self._render(key, render).response(self.config.get("OPENAPI_CACHE_MAX_AGE_SECONDS", 0))
+
+    def _serve_page(self, endpoint, view):
+        # The pages link to the spec by path, which depends on where the application is mounted
+        return self._serve((endpoint, request.script_root), lambda: (view().encode(), "text/html"))
+
+    def _openapi_json(self):
+        return self._serve("openapi_json", self._spec_document)
+
+    def _openapi_redoc(self):
+        return self._serve_page("openapi_redoc", super()._openapi_redoc)
+
+    def _openapi_swagger_ui(self):
+        return self._serve_page("openapi_swagger_ui", super()._openapi_swagger_ui)
+
+    def _openapi_rapidoc(self):
+        return self._serve_page("openapi_rapidoc", super()._openapi_rapidoc)
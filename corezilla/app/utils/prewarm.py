@@ -0,0 +1,114 @@
+import logging
+import time
+
+import marshmallow
+from flask import Flask
+from jinja2 import TemplateError
+from sqlalchemy.orm import configure_mappers
+from werkzeug.exceptions import HTTPException
+
+
+def _subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _subclasses(subclass)
+
+
+def compile_schemas():
+    """
+    Instantiate every Marshmallow schema defined by the application, which binds and validates its
+    fields. Schemas that need constructor arguments are skipped.
+
+    Returns:
+        int: The number of schemas instantiated.
+    """
+    count = 0
+    for schema in set(_subclasses(marshmallow.Schema)):
+        if not schema.__module__.startswith("corezilla."):
+            continue
+        try:
+            schema()
+        except Exception:  # noqa: a schema that cannot be built without arguments is simply not warmed
+            logging.debug("Skipped prewarming schema %s", schema.__qualname__)
+            continue
+        count += 1
+    return count
+
+
+def compile_templates(app: Flask):
+    """
+    Compile every Jinja template the application can render into the environment's template cache.
+
+    Returns:
+        int: The number of templates compiled.
+    """
+    count = 0
+    for name in app.jinja_env.list_templates(extensions=("html", "txt", "xml")):
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateError:
+            logging.debug("Skipped prewarming template %s", name)
+            continue
+        count += 1
+    return count
+
+
+def prepare_signers():
+    """Build the cached JWT signer and authorization code cipher."""
+    from corezilla.app.services.AuthorizationCodeService import _auth_code_cipher
+    from corezilla.app.services.TokenService import TokenService
+
+    TokenService.signer()
+    _auth_code_cipher()
+
+
+def render_spec(app: Flask):
+    """Document the blueprints, then render and compress the OpenAPI spec, rather than on its first request."""
+    for api in app.extensions["flask-smorest"]["apis"].values():
+        api["ext_obj"].render_spec()
+
+
+def compile_url_map(app: Flask):
+    """Build the URL map's matcher, which Werkzeug otherwise does on the first request."""
+    try:
+        app.url_map.bind("localhost").match("/")
+    except HTTPException:
+        pass
+
+
+def prewarm(app: Flask) -> dict:
+    """
+    Do the work that would otherwise fall on the first requests each worker serves.
+
+    Run in a pre-forking server's master process, so that every worker inherits the result: SQLAlchemy
+    mappers are configured, Marshmallow schemas instantiated, Jinja templates compiled, JWT signers
+    built, the OpenAPI spec rendered and the URL map compiled. Nothing here opens a database connection, so nothing is shared
+    with the forked workers that must not be.
+
+    Args:
+        app (Flask): The Flask application instance
+
+    Returns:
+        dict: Seconds spent on each step.
+    """
+    steps = {
+        "mappers": configure_mappers,
+        "schemas": compile_schemas,
+        "templates": lambda: compile_templates(app),
+        "signers": prepare_signers,
+        "spec": lambda: render_spec(app),
+        "url_map": lambda: compile_url_map(app),
+    }
+
+    timings = {}
+    with app.app_context():
+        for name, step in steps.items():
+            started_at = time.perf_counter()
+            step()
+            timings[name] = time.perf_counter() - started_at
+
+    logging.info(
+        "Prewarmed the application in %.3f seconds (%s)",
+        sum(timings.values()), ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items())
+    )
+    return timings
@@ -0,0 +1,207 @@
+import collections
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from flask import Flask, request
+
+# Frames from this file are the profiler itself and are left out of the collapsed stacks.
+_PROFILER_FILE = __file__
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler that periodically samples the stacks of threads handling requests.
+
+    While a profile is running, a background thread wakes up every `interval` seconds, reads the current
+    frame of every thread that is handling a sampled request via `sys._current_frames()`, and counts the
+    collapsed stack, prefixed with the request's endpoint. Requests are sampled either for a fixed duration
+    or, with `sample_rate`, a random fraction of them. When the profile stops the counts are written out
+    in the collapsed-stack format understood by flamegraph.pl and speedscope.
+
+    When no profile is running, the only cost per request is reading the `running` attribute.
+    """
+
+    def __init__(self, interval=0.005, output_dir="profiles", max_duration=300):
+        self.interval = interval
+        self.output_dir = output_dir
+        self.max_duration = max_duration
+
+        self.running = False
+        self.sample_rate = 1.0
+        self.started_at = None
+        self.deadline = None
+        self.last_output = None
+
+        self._stacks = collections.Counter()
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._sampler = None
+
+    def start(self, duration=None, sample_rate=None):
+        """
+        Start profiling requests.
+
+        Args:
+            duration (float): Stop automatically after this many seconds. Capped at `max_duration`.
+            sample_rate (float): Fraction of requests to sample, between 0 and 1. Defaults to every request.
+
+        Raises:
+            RuntimeError: If a profile is already running.
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A profile is already running.")
+
+            duration = min(duration or self.max_duration, self.max_duration)
+            self.sample_rate = 1.0 if sample_rate is None else sample_rate
+            self.started_at = time.time()
+            self.deadline = time.monotonic() + duration
+            self._stacks.clear()
+            self._threads.clear()
+            self._stop_event.clear()
+
+            self._sampler = threading.Thread(target=self._run, name="corezilla-profiler", daemon=True)
+            self.running = True
+            self._sampler.start()
+
+        logging.info("Profiler started for %.0f seconds at a sample rate of %.2f", duration, self.sample_rate)
+
+    def stop(self):
+        """
+        Stop the running profile and write out its samples.
+
+        Returns:
+            str: The path of the collapsed-stack file, or None if no profile was running.
+        """
+        sampler = self._sampler
+        if sampler is None:
+            return None
+
+        self._stop_event.set()
+        if sampler is not threading.current_thread():
+            sampler.join()
+        return self.last_output
+
+    def status(self):
+        """
+        Returns:
+            dict: Whether a profile is running, when it will end, how many samples it has taken, and
+            where the previous profile was written.
+        """
+        with self._lock:
+            return {
+                "running": self.running,
+                "sample_rate": self.sample_rate if self.running else None,
+                "remaining_seconds": max(self.deadline - time.monotonic(), 0) if self.running else None,
+                "samples": sum(self._stacks.values()),
+                "last_output": self.last_output,
+            }
+
+    def request_started(self, endpoint):
+        """Mark the current thread as handling `endpoint` if this request is sampled."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self._threads[threading.get_ident()] = endpoint or "<unknown>"
+
+    def request_finished(self):
+        self._threads.pop(threading.get_ident(), None)
+
+    def _run(self):
+        try:
+            while not self._stop_event.wait(self.interval):
+                if time.monotonic() >= self.deadline:
+                    break
+                self._sample()
+        finally:
+            with self._lock:
+                self.running = False
+                self._threads.clear()
+                self._sampler = None
+                self.last_output = self._write()
+
+    def _sample(self):
+        threads = dict(self._threads)
+        if not threads:
+            return
+
+        frames = sys._current_frames()
+        for thread_id, endpoint in threads.items():
+            frame = frames.get(thread_id)
+            if frame is not None:
+                self._stacks[collapse_stack(endpoint, frame)] += 1
+
+    def _write(self):
+        if not self._stacks:
+            logging.info("Profiler stopped without collecting any samples")
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(
+            self.output_dir, time.strftime("profile-%Y%m%dT%H%M%S.collapsed", time.gmtime(self.started_at))
+        )
+        with open(path, "w") as output:
+            for stack, count in self._stacks.most_common():
+                output.write(f"{stack} {count}\n")
+
+        logging.info("Profiler wrote %d samples to %s", sum(self._stacks.values()), path)
+        return path
+
+
+def collapse_stack(endpoint, frame):
+    """
+    Render a stack as a single `endpoint;outermost;...;innermost` line.
+
+    Args:
+        endpoint (str): The endpoint of the request, used as the root of the stack.
+        frame (types.FrameType): The innermost frame.
+
+    Returns:
+        str: The collapsed stack.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename != _PROFILER_FILE:
+            # Spaces separate the stack from its count in the collapsed format, e.g. "<frozen runpy>"
+            filename = os.path.basename(code.co_filename).replace(" ", "_")
+            names.append(f"{filename}:{code.co_name}:{code.co_firstlineno}")
+        frame = frame.f_back
+    names.append(endpoint)
+    return ";".join(reversed(names))
+
+
+def register_profiler(app: Flask) -> SamplingProfiler:
+    """
+    Attach a `SamplingProfiler` to the application as `app.extensions["profiler"]`.
+
+    The profiler stays idle until it is started from the admin API.
+
+    Args:
+        app (Flask): The Flask application instance
+
+    Returns:
+        SamplingProfiler: The profiler
+    """
+    profiler = SamplingProfiler(
+        interval=app.config.get("PROFILER_INTERVAL_SECONDS", 0.005),
+        output_dir=app.config.get("PROFILER_OUTPUT_DIR", "profiles"),
+        max_duration=app.config.get("PROFILER_MAX_DURATION_SECONDS", 300),
+    )
+    app.extensions["profiler"] = profiler
+
+    @app.before_request
+    def start_request_sampling():
+        if profiler.running:
+            profiler.request_started(request.endpoint)
+
+    @app.teardown_request
+    def finish_request_sampling(exception=None):
+        if profiler.running:
+            profiler.request_finished()
+
+    return profiler
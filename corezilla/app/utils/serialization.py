@@ -0,0 +1,76 @@
+import logging
+
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    A Flask JSON provider that serialises with orjson, used for every `jsonify` and flask-smorest response
+    and for the SQLAlchemy JSON columns.
+
+    Its output is the same as Flask's default provider: keys are sorted, dates and datetimes are HTTP
+    dates, UUIDs, decimals and dataclasses are converted the same way, and responses are indented in
+    debug mode. The one difference is that non-ASCII characters are written as UTF-8 rather than escaped.
+
+    Calls that pass arguments for the standard library, such as the separators used by the session
+    serializer, and values orjson cannot encode, such as integers wider than 64 bits, are handed to the
+    default provider.
+    """
+
+    def __init__(self, app):
+        import orjson
+
+        super().__init__(app)
+        self._orjson = orjson
+        # Leave dates to `default`, which formats them as HTTP dates like the default provider
+        self._options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _encode(self, obj, options=0):
+        if self.sort_keys:
+            options |= self._orjson.OPT_SORT_KEYS
+        return self._orjson.dumps(obj, default=self.default, option=self._options | options)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._encode(obj).decode()
+        except self._orjson.JSONEncodeError:
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            body = self._encode(obj, self._orjson.OPT_INDENT_2 if indent else 0) + b"\n"
+        except self._orjson.JSONEncodeError:
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def register_json_provider(app):
+    """
+    Install the JSON provider named by `JSON_PROVIDER`, and have the SQLAlchemy engines (de)serialise
+    JSON columns with it.
+
+    Must be called before the database is initialised. If orjson is not installed, the default provider
+    is kept.
+    """
+    if app.config.get("JSON_PROVIDER") == "orjson":
+        try:
+            app.json = OrjsonProvider(app)
+            # Extensions such as Flask-Security install subclasses of the provider class
+            app.json_provider_class = OrjsonProvider
+        except ImportError:
+            logging.warning("JSON_PROVIDER is 'orjson' but orjson is not installed; using the json module")
+
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "json_serializer": app.json.dumps,
+        "json_deserializer": app.json.loads,
+        **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+    }
@@ -0,0 +1,513 @@
+import collections
+import contextlib
+import itertools
+import mmap
+import os
+import secrets
+import sqlite3
+import struct
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+from corezilla.app.utils.metrics import registry
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows, where workers are not forked
+    fcntl = None
+
+session_load_seconds = registry.histogram(
+    "session_load_seconds", "Time spent loading a server-side session from its store."
+)
+session_save_seconds = registry.histogram(
+    "session_save_seconds", "Time spent writing a server-side session to its store."
+)
+
+
+class SessionStore:
+    """
+    Interface implemented by every server-side session backend.
+
+    Stores only deal in opaque session ids and serialised payloads; signing the cookie,
+    (de)serialising the session and tracking expiry times is handled by `ServerSideSessionInterface`.
+    """
+
+    name = "base"
+
+    def load(self, sid, now):
+        """
+        Args:
+            sid (str): The session id taken from the session cookie.
+            now (float): The current UNIX timestamp, used to ignore expired entries.
+
+        Returns:
+            bytes | None: The stored payload, or None if the session is unknown or expired.
+        """
+        raise NotImplementedError
+
+    def save(self, sid, payload, expires_at):
+        """
+        Args:
+            sid (str): The session id.
+            payload (bytes): The serialised session.
+            expires_at (float): UNIX timestamp after which the session must no longer be returned.
+        """
+        raise NotImplementedError
+
+    def delete(self, sid):
+        raise NotImplementedError
+
+    def sweep(self, now, limit):
+        """
+        Remove up to `limit` expired sessions.
+
+        Returns:
+            int: The number of sessions that were removed.
+        """
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+    An in-process LRU session store.
+
+    Sessions are lost when the worker restarts and are not shared between workers, so this
+    backend suits development and single-process deployments.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid, now):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None or entry[0] <= now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(sid)
+            self.hits += 1
+            return entry[1]
+
+    def save(self, sid, payload, expires_at):
+        with self._lock:
+            self._entries[sid] = (expires_at, payload)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def sweep(self, now, limit):
+        # The least recently used sessions sit at the front, so they are the most likely to have expired.
+        with self._lock:
+            expired = [
+                sid for sid, (expires_at, _) in itertools.islice(self._entries.items(), limit)
+                if expires_at <= now
+            ]
+            for sid in expired:
+                del self._entries[sid]
+        return len(expired)
+
+
+class MmapSessionStore(SessionStore):
+    """
+    An append-only session log read through a memory map.
+
+    Every save appends a record to the end of the file and every delete appends a tombstone, so
+    writes never rewrite existing bytes and several workers on the same host can share the file.
+    Each worker keeps an index of record offsets and catches up from the tail of the file before
+    every read. Sweeps compact the log once dead records outweigh live ones.
+
+    Appends hold a shared `flock` on a lock file next to the log, and compaction an exclusive one, so
+    no worker can append to the old file while another copies it and swaps the copy in.
+    """
+
+    name = "mmap"
+
+    # sid length, expiry timestamp, payload length
+    _header = struct.Struct("<HdI")
+
+    def __init__(self, path, compact_min_bytes=1024 * 1024):
+        self.path = os.fspath(path)
+        self.compact_min_bytes = compact_min_bytes
+        self._lock = threading.Lock()
+        # sid -> (record offset, record length, payload length, expires_at)
+        self._index = {}
+        self._live_bytes = 0
+        self._indexed_to = 0
+        self._fd = None
+        self._inode = None
+        self._map = None
+        self._lock_fd = None
+        self._lock_pid = None
+        self._reopen()
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive=False):
+        """Hold an `flock` on the lock file, shared by every worker using the log."""
+        if fcntl is None:
+            yield
+            return
+        # Forked workers share open file descriptions, and with them their locks, so each process opens
+        # the lock file itself
+        if self._lock_pid != os.getpid():
+            self._lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+            self._lock_pid = os.getpid()
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _reopen(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        self._inode = os.fstat(self._fd).st_ino
+        self._index.clear()
+        self._live_bytes = 0
+        self._indexed_to = 0
+        self._catch_up()
+
+    def _check_file(self):
+        """Reopen the log if another worker compacted it into a new file."""
+        try:
+            if os.stat(self.path).st_ino != self._inode:
+                self._reopen()
+        except FileNotFoundError:
+            self._reopen()
+
+    def _catch_up(self):
+        size = os.fstat(self._fd).st_size
+        if size <= self._indexed_to:
+            return
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+
+        offset = self._indexed_to
+        header_size = self._header.size
+        while offset + header_size <= size:
+            sid_length, expires_at, payload_length = self._header.unpack_from(self._map, offset)
+            record_length = header_size + sid_length + payload_length
+            if offset + record_length > size:
+                # A record still being written by another worker; pick it up next time.
+                break
+
+            sid = self._map[offset + header_size:offset + header_size + sid_length].decode()
+            previous = self._index.pop(sid, None)
+            if previous is not None:
+                self._live_bytes -= previous[1]
+            if payload_length:
+                self._index[sid] = (offset, record_length, payload_length, expires_at)
+                self._live_bytes += record_length
+            offset += record_length
+
+        self._indexed_to = offset
+
+    def _append(self, sid, payload, expires_at):
+        sid_bytes = sid.encode()
+        # A single write keeps the record contiguous even when other workers append concurrently.
+        os.write(self._fd, self._header.pack(len(sid_bytes), expires_at, len(payload)) + sid_bytes + payload)
+
+    def load(self, sid, now):
+        with self._lock:
+            # Another worker may have written a newer record for this session since we last looked.
+            self._check_file()
+            self._catch_up()
+            entry = self._index.get(sid)
+            if entry is None:
+                return None
+
+            offset, record_length, payload_length, expires_at = entry
+            if expires_at <= now:
+                return None
+            end = offset + record_length
+            return self._map[end - payload_length:end]
+
+    def save(self, sid, payload, expires_at):
+        with self._lock:
+            with self._file_lock():
+                self._check_file()
+                self._append(sid, payload, expires_at)
+            self._catch_up()
+
+    def delete(self, sid):
+        with self._lock:
+            with self._file_lock():
+                self._check_file()
+                self._append(sid, b"", 0.0)
+            self._catch_up()
+
+    def sweep(self, now, limit):
+        with self._lock:
+            with self._file_lock():
+                self._check_file()
+                self._catch_up()
+                expired = [sid for sid, entry in self._index.items() if entry[3] <= now][:limit]
+                for sid in expired:
+                    self._append(sid, b"", 0.0)
+            self._catch_up()
+
+            if self._indexed_to >= self.compact_min_bytes and self._live_bytes * 2 < self._indexed_to:
+                self._compact(now)
+        return len(expired)
+
+    def _compact(self, now):
+        """Rewrite the live, unexpired records into a fresh file and atomically swap it in."""
+        with self._file_lock(exclusive=True):
+            # Records appended by other workers before the lock was taken must be copied too
+            self._check_file()
+            self._catch_up()
+            temp_path = f"{self.path}.{os.getpid()}.compact"
+            with open(temp_path, "wb") as temp_file:
+                for offset, record_length, _, expires_at in self._index.values():
+                    if expires_at > now:
+                        temp_file.write(self._map[offset:offset + record_length])
+            os.replace(temp_path, self.path)
+            self._reopen()
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    A session store backed by a SQLite database, shared by every worker on the host.
+
+    Each thread of each process opens its own connection on first use. The schema is created on a
+    connection that is closed straight away, so an application created before a preloading server
+    forks its workers does not hand them an open connection.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self._local = threading.local()
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS session ("
+                    "sid TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload BLOB NOT NULL)"
+                )
+                connection.execute("CREATE INDEX IF NOT EXISTS ix_session_expires_at ON session (expires_at)")
+        finally:
+            connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        # The forking thread's connection is still in its thread-local in the child, but must not be used there
+        if connection is None or self._local.pid != os.getpid():
+            connection = self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return connection
+
+    def load(self, sid, now):
+        row = self._connection().execute(
+            "SELECT payload FROM session WHERE sid = ? AND expires_at > ?", (sid, now)
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, payload, expires_at):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO session (sid, expires_at, payload) VALUES (?, ?, ?) "
+                "ON CONFLICT(sid) DO UPDATE SET expires_at = excluded.expires_at, payload = excluded.payload",
+                (sid, expires_at, payload)
+            )
+
+    def delete(self, sid):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM session WHERE sid = ?", (sid,))
+
+    def sweep(self, now, limit):
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "DELETE FROM session WHERE sid IN (SELECT sid FROM session WHERE expires_at <= ? LIMIT ?)",
+                (now, limit)
+            )
+        return cursor.rowcount
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """
+    A session whose contents live in a `SessionStore`, keyed by the id held in the session cookie.
+
+    The store is only read the first time the session is actually used, so requests that never touch
+    `flask.session` (static assets, token endpoints, health checks) do not pay for a store lookup.
+    """
+
+    def __init__(self, sid=None, loader=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(on_update=on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self._loader = loader
+
+    def _load(self):
+        self.accessed = True
+        loader, self._loader = self._loader, None
+        if loader is not None:
+            data = loader()
+            if data:
+                dict.update(self, data)
+
+
+def _loading(name):
+    method = getattr(CallbackDict, name)
+
+    def wrapper(self, *args, **kwargs):
+        if self._loader is not None or not self.accessed:
+            self._load()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in (
+    "__getitem__", "__setitem__", "__delitem__", "__contains__", "__iter__", "__len__", "__eq__", "__repr__",
+    "get", "keys", "values", "items", "copy", "setdefault", "pop", "popitem", "update", "clear",
+):
+    setattr(ServerSideSession, _name, _loading(_name))
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Keeps session data on the server and only a signed, random session id in the cookie.
+
+    Expired sessions are removed in batches: at most once per `SESSION_SWEEP_INTERVAL_SECONDS` the
+    request that saves a session also asks the store to drop up to `SESSION_SWEEP_BATCH_SIZE` expired
+    entries, so no single request pays for a full scan and no background thread is needed.
+    """
+
+    salt = "server-side-session"
+    serializer = session_json_serializer
+    session_class = ServerSideSession
+
+    def __init__(self, store, sweep_interval=60, sweep_batch_size=500):
+        self.store = store
+        if isinstance(store, MemorySessionStore):
+            registry.register_cache("sessions", store)
+        self.sweep_interval = sweep_interval
+        self.sweep_batch_size = sweep_batch_size
+        self._next_sweep = 0.0
+
+    def get_signer(self, app):
+        return Signer(app.secret_key, salt=self.salt, key_derivation="hmac")
+
+    @staticmethod
+    def generate_sid():
+        return secrets.token_urlsafe(32)
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self.get_signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                return self.session_class(sid=sid, loader=lambda: self._load(sid))
+
+        return self.session_class(sid=self.generate_sid(), new=True)
+
+    def _load(self, sid):
+        started = time.perf_counter()
+        payload = self.store.load(sid, time.time())
+        data = self.serializer.loads(bytes(payload).decode()) if payload else None
+        session_load_seconds.observe(time.perf_counter() - started, backend=self.store.name)
+        return data
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        # Nothing was read or written, so the stored session (if any) is still correct as it is.
+        if not session.accessed:
+            return
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        now = time.time()
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified or app.config.get("SESSION_REFRESH_EACH_REQUEST") and session.permanent:
+            started = time.perf_counter()
+            expires_at = now + app.permanent_session_lifetime.total_seconds()
+            payload = self.serializer.dumps(dict(session)).encode()
+            self.store.save(session.sid, payload, expires_at)
+            session_save_seconds.observe(time.perf_counter() - started, backend=self.store.name)
+
+        if self.should_set_cookie(app, session) or session.new:
+            response.set_cookie(
+                name,
+                self.get_signer(app).sign(session.sid).decode(),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self.store.sweep(now, self.sweep_batch_size)
+
+
+def create_session_store(config):
+    """
+    Build the session store selected by `SESSION_BACKEND`.
+
+    Args:
+        config (flask.Config): The application configuration.
+
+    Returns:
+        SessionStore: The configured store.
+    """
+    backend = config.get("SESSION_BACKEND")
+
+    if backend == "memory":
+        return MemorySessionStore(max_entries=config.get("SESSION_MEMORY_MAX_ENTRIES", 10000))
+    if backend == "mmap":
+        return MmapSessionStore(config["SESSION_FILE_PATH"])
+    if backend == "sqlite":
+        return SQLiteSessionStore(config["SESSION_SQLITE_PATH"])
+
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
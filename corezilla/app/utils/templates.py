@@ -0,0 +1,50 @@
+import logging
+from pathlib import Path
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from jinja2 import FileSystemBytecodeCache
+
+templates_cli = AppGroup("templates", help="Jinja template commands.")
+
+
+def register_template_cache(app):
+    """
+    Store compiled Jinja templates in `TEMPLATE_BYTECODE_CACHE_DIR`, so that workers, and restarts, load
+    them rather than each compiling every template on first use. Add the `flask templates` commands.
+
+    Cache files are written atomically and keyed by a checksum of the template source, so workers can
+    share the directory, and an edited template is compiled again.
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    app.cli.add_command(templates_cli)
+
+    directory = app.config.get("TEMPLATE_BYTECODE_CACHE_DIR")
+    if not directory:
+        return
+
+    try:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+    except OSError:
+        logging.warning("Cannot create TEMPLATE_BYTECODE_CACHE_DIR %s; templates are compiled by each worker", directory)
+        return
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(directory))
+
+
+@templates_cli.command("compile")
+@click.option("--clear", is_flag=True, help="Remove the cached bytecode before compiling.")
+def compile_command(clear):
+    """Compile every template into the bytecode cache, e.g. when deploying."""
+    from corezilla.app.utils.prewarm import compile_templates
+
+    bytecode_cache = current_app.jinja_env.bytecode_cache
+    if bytecode_cache is None:
+        raise click.ClickException("TEMPLATE_BYTECODE_CACHE_DIR is not set.")
+    if clear:
+        bytecode_cache.clear()
+
+    count = compile_templates(current_app)
+    click.echo(f"Compiled {count} templates into {bytecode_cache.directory}")
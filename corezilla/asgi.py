@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Create an ASGI application instance.
+
+Serve it with an ASGI server, e.g. `uvicorn corezilla.asgi:app --workers 4`. The token and
+introspection endpoints are served on the event loop; everything else runs in the Flask application.
+"""
+from corezilla.app.asgi import create_asgi_app
+from corezilla.run import app as flask_app
+
+app = create_asgi_app(flask_app)
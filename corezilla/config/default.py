@@ -8,6 +8,7 @@ BASEDIR = Path(__file__).resolve().parent
 APP_DIR = BASEDIR.parent
 TEMPLATES_DIR = BASEDIR.parent / 'app' / 'views' / 'templates'
 STATIC_DIR = BASEDIR.parent / 'app' / 'views' / 'static'
+STATIC_BUILD_DIR = BASEDIR.parent / 'app' / 'views' / 'static_build'
 
 
 class Configuration(object):
@@ -27,9 +28,28 @@ class Configuration(object):
     TESTING = False
     THREADS_PER_PAGE = 8
 
+    # "orjson" serialises responses and JSON columns with orjson when it is installed; "json" keeps the json module
+    JSON_PROVIDER = "orjson"
+
     # Set the template and static directories
     TEMPLATE_FOLDER = TEMPLATES_DIR
     STATIC_FOLDER = STATIC_DIR
+    # Written by `flask assets build`: fingerprinted, pre-compressed copies of the static files, which are
+    # served instead of the originals, and cached by browsers without revalidation for the max-age
+    STATIC_BUILD_FOLDER = STATIC_BUILD_DIR
+    STATIC_ASSETS_MAX_AGE_SECONDS = 31536000
+    # Compiled templates are cached here, shared by the workers; `flask templates compile` fills it when deploying
+    TEMPLATE_BYTECODE_CACHE_DIR = APP_DIR / "template_cache"
+
+    """Server Configuration"""
+    # Used by the production launcher (python -m corezilla.serve); command line options take precedence
+    SERVER_BIND = "127.0.0.1:8000"
+    # None starts 2 * CPUs + 1 workers
+    SERVER_WORKERS = None
+    SERVER_THREADS = 1
+    SERVER_TIMEOUT_SECONDS = 30
+    # Warm up mappers, schemas, templates and signers in the master process before forking the workers
+    SERVER_PREWARM = True
 
     """Security Configuration"""
     ADMINS = frozenset()
@@ -39,6 +59,15 @@ class Configuration(object):
     SECURITY_REGISTERABLE = True
     SECURITY_SEND_REGISTER_EMAIL = False
 
+    """Session Configuration"""
+    # None keeps Flask's signed cookie sessions, otherwise one of "memory", "mmap" or "sqlite"
+    SESSION_BACKEND = None
+    SESSION_MEMORY_MAX_ENTRIES = 10000
+    SESSION_FILE_PATH = APP_DIR / "sessions.log"
+    SESSION_SQLITE_PATH = APP_DIR / "sessions.db"
+    SESSION_SWEEP_INTERVAL_SECONDS = 60
+    SESSION_SWEEP_BATCH_SIZE = 500
+
     """Database Configuration"""
     DATABASE_NAME = APP_DIR / "app.db"
 
@@ -46,6 +75,13 @@ class Configuration(object):
     def SQLALCHEMY_DATABASE_URI(self):  # noqa
         return f"sqlite:///{self.DATABASE_NAME}"
 
+    # Count queries and database time per request, and log queries slower than the threshold
+    SQLALCHEMY_INSTRUMENTATION_ENABLED = True
+    SQLALCHEMY_SLOW_QUERY_THRESHOLD_SECONDS = 0.1
+    # Used by the ASGI application (corezilla.asgi); derived from SQLALCHEMY_DATABASE_URI when unset,
+    # e.g. sqlite:/// becomes sqlite+aiosqlite:///
+    ASYNC_SQLALCHEMY_DATABASE_URI = None
+
     """API Meta Configuration"""
     API_TITLE = f"{TITLE} - API Reference"
     API_VERSION = "1.0"
@@ -69,6 +105,24 @@ class Configuration(object):
         "schema-hide-read-only": "never",
         "default-schema-tab": "example",
     }
+    # The spec and documentation pages are rendered once per process and served with this max-age and an
+    # ETag; they only change when the application is deployed
+    OPENAPI_CACHE_MAX_AGE_SECONDS = 86400
+
+    """Request Tracing Configuration"""
+    # Incoming ids in this header are reused so that logs can be correlated with upstream proxies
+    REQUEST_ID_HEADER = "X-Request-ID"
+
+    """Metrics Configuration"""
+    # Serve Prometheus-style metrics at /metrics; keep it reachable only from the monitoring network
+    METRICS_ENABLED = False
+
+    """Profiler Configuration"""
+    # Allow admins to sample request stacks via /api/admin/profiler
+    PROFILER_ENABLED = False
+    PROFILER_INTERVAL_SECONDS = 0.005
+    PROFILER_MAX_DURATION_SECONDS = 300
+    PROFILER_OUTPUT_DIR = "profiles"
 
     """AuthZilla Configuration"""
     ENABLE_OAUTH2 = False
@@ -77,14 +131,54 @@ class Configuration(object):
 
     """Access Token Configuration"""
     ISSUER_NAME = "https://authzilla.invalid"
+    AUDIENCE = "https://authzilla.invalid"
     ACCESS_TOKEN_SECRET = "this-is-a-secret"
     ACCESS_TOKEN_EXPIRE_SECONDS = 3600
     REFRESH_TOKEN_EXPIRE_SECONDS = 2592000
     ACCESS_TOKEN_ALGORITHM = "HS256"
 
+    """Client Credentials Configuration"""
+    # Key for the stored client secret verifiers; changing it invalidates every existing client secret
+    CLIENT_SECRET_HASH_KEY = "this-is-a-secret"
+    # Verified client credentials are cached per worker; a rotated secret may keep working in other
+    # workers for up to the TTL
+    CLIENT_CREDENTIAL_CACHE_TTL_SECONDS = 60
+    CLIENT_CREDENTIAL_CACHE_MAX_ENTRIES = 1024
+    # Return the same access token to a client asking again within this many seconds; 0 always issues a new one
+    CLIENT_CREDENTIALS_TOKEN_REUSE_SECONDS = 0
+    # Client configurations, such as refresh token policies, are cached per worker for this long
+    CLIENT_CONFIGURATION_CACHE_TTL_SECONDS = 60
+
+    """Token Exchange Configuration"""
+    TOKEN_EXCHANGE_MAX_BATCH_SIZE = 50
+    # Audiences any client may request by exchange, besides AUDIENCE and the resources registered for the client
+    TOKEN_EXCHANGE_AUDIENCES = frozenset()
+
+    """Device Authorization Configuration"""
+    # "memory" keeps pending device grants in each worker; "sqlite" shares them between the workers on a host
+    DEVICE_GRANT_BACKEND = "memory"
+    DEVICE_GRANT_SQLITE_PATH = APP_DIR / "device_grants.db"
+    DEVICE_GRANT_SWEEP_INTERVAL_SECONDS = 60
+    DEVICE_CODE_EXPIRY_SECONDS = 600
+    DEVICE_CODE_POLL_INTERVAL_SECONDS = 5
+    # Hold a pending poll open for up to this many seconds so an approval is returned as soon as it happens
+    DEVICE_CODE_POLL_HOLD_SECONDS = 0
+    # Where users enter their user code; defaults to the device verification endpoint
+    DEVICE_VERIFICATION_URI = None
+    # A user or address entering this many invalid user codes is locked out for the lockout period after
+    # the last one; failures are counted per worker, for up to DEVICE_VERIFICATION_MAX_TRACKED users and addresses
+    DEVICE_VERIFICATION_MAX_FAILURES = 5
+    DEVICE_VERIFICATION_LOCKOUT_SECONDS = 900
+    DEVICE_VERIFICATION_MAX_TRACKED = 10000
+
     """Authorization Code Configuration"""
     AUTH_CODE_SECRET_KEY = "this-is-a-secret"
     AUTH_CODE_EXPIRY_SECONDS = 600
     AUTH_CODE_ALGORITHM = "HS256"
+    # Reject authorization requests without a PKCE code_challenge from confidential clients too; public
+    # clients must always send one
+    PKCE_REQUIRED = False
+    # Accept the "plain" code_challenge_method; without it only S256, the default method, is accepted
+    PKCE_PLAIN_ALLOWED = False
 
 
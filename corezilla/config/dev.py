@@ -21,6 +21,10 @@ class DevConfiguration(Configuration):
     DEBUG = True
     TEMPLATES_AUTO_RELOAD = True
     EXPLAIN_TEMPLATE_LOADING = True
+    TEMPLATE_BYTECODE_CACHE_DIR = None  # Compile templates in memory only
+
+    """Open API Configuration"""
+    OPENAPI_CACHE_MAX_AGE_SECONDS = 0  # Have browsers revalidate the docs after every restart
 
     """Flask-Security Configuration"""
     SECURITY_PASSWORD_HASH = "plaintext"  # Store passwords as plain text in development
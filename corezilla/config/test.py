@@ -23,6 +23,7 @@ class TestConfiguration(Configuration):
     DEBUG = True
     TEMPLATES_AUTO_RELOAD = True
     EXPLAIN_TEMPLATE_LOADING = True
+    TEMPLATE_BYTECODE_CACHE_DIR = None  # Compile templates in memory only
 
     """Flask-Security Configuration"""
     SECURITY_PASSWORD_HASH = "plaintext"  # Store passwords as plain text in development
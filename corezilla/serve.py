@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Serve the application in production with gunicorn.
+
+Usage:
+    python -m corezilla.serve [--bind 127.0.0.1:8000] [--workers 9] [--threads 1] [--timeout 30]
+
+The application is created and prewarmed once in the master process, which then forks the workers,
+so that every worker starts with its mappers configured and templates compiled, and the memory they
+hold is shared copy-on-write. Defaults come from the `SERVER_*` configuration keys.
+"""
+import argparse
+import gc
+import logging
+import multiprocessing
+
+from gunicorn.app.base import BaseApplication
+
+from corezilla.app import db
+from corezilla.app.utils.prewarm import prewarm
+
+
+class PreloadedApplication(BaseApplication):
+    """
+    A gunicorn application serving an already created Flask application.
+    """
+
+    def __init__(self, app, options):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def post_fork(server, worker):
+    """
+    Drop the database connections inherited from the master process, which must not be shared
+    between processes. Each worker opens its own on first use.
+    """
+    app = worker.app.application
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def server_options(config, args):
+    """
+    Returns:
+        dict: gunicorn settings from the command line arguments, falling back to the configuration.
+    """
+    workers = args.workers or config.get("SERVER_WORKERS") or multiprocessing.cpu_count() * 2 + 1
+    return {
+        "bind": args.bind or config.get("SERVER_BIND", "127.0.0.1:8000"),
+        "workers": workers,
+        "threads": args.threads or config.get("SERVER_THREADS", 1),
+        "timeout": args.timeout or config.get("SERVER_TIMEOUT_SECONDS", 30),
+        "preload_app": True,
+        "post_fork": post_fork,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bind")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--timeout", type=int)
+    parser.add_argument("--no-prewarm", action="store_true", help="Skip warming up the application before forking")
+    args = parser.parse_args()
+
+    from corezilla.run import app
+
+    if app.config.get("SERVER_PREWARM", True) and not args.no_prewarm:
+        prewarm(app)
+    # Keep the objects created so far out of the collector's generations, so that collections in the
+    # workers do not touch, and so copy, the pages they share with the master process
+    gc.collect()
+    gc.freeze()
+
+    options = server_options(app.config, args)
+    logging.info("Starting %s workers on %s", options["workers"], options["bind"])
+    PreloadedApplication(app, options).run()
+
+
+if __name__ == "__main__":
+    main()
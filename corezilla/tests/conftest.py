@@ -1,10 +1,12 @@
 import http
 import secrets
+import sqlite3
 from pydoc import describe
 
 import flask_login
 import pytest
 from flask import url_for
+from sqlalchemy import insert
 
 from corezilla.app import create_app, db, login_manager
 from corezilla.app.models import Client, ClientMetadata, ClientConfiguration
@@ -12,14 +14,62 @@ from corezilla.app.models.User import User
 from corezilla.config.test import TestConfiguration
 
 
-@pytest.fixture
-def app():
-    """Create and configure a new app instance for each test."""
+@pytest.fixture(scope="session")
+def schema_template():
+    """
+    An in-memory SQLite database holding the empty schema, built once per session.
+
+    Copying it into a test's database with SQLite's backup API is much faster than creating every
+    table again.
+    """
     app = create_app(TestConfiguration)
+    template = sqlite3.connect(":memory:")
     with app.app_context():
-        db.create_all()  # Create tables in the test database
-        yield app
-        db.drop_all()  # Drop all tables after the test
+        db.create_all()
+        connection = db.engine.raw_connection()
+        try:
+            connection.driver_connection.backup(template)
+        finally:
+            connection.close()
+        db.engine.dispose()
+    yield template
+    template.close()
+
+
+@pytest.fixture
+def make_app(schema_template):
+    """
+    Returns a function creating an app from a configuration class, with its application context
+    pushed and its own copy of the schema. Every app it created is torn down after the test.
+    """
+    contexts = []
+
+    def make_app(configuration):
+        app = create_app(configuration)
+        context = app.app_context()
+        context.push()
+        contexts.append(context)
+
+        connection = db.engine.raw_connection()
+        try:
+            schema_template.backup(connection.driver_connection)
+        finally:
+            connection.close()
+        return app
+
+    yield make_app
+
+    for context in reversed(contexts):
+        # Closing the only connection discards an in-memory database
+        db.session.remove()
+        db.engine.dispose()
+        context.pop()
+
+
+@pytest.fixture
+def app(make_app):
+    """Create and configure a new app instance for each test, with its own copy of the schema."""
+    return make_app(TestConfiguration)
 
 
 @pytest.fixture
@@ -44,43 +94,43 @@ def oauth_client(db_session, user):
     """A fixture that creates and returns a test client object."""
     client = Client(owner=user, name="Test Client")
     db_session.add(client)
-    db_session.commit()
+    db_session.flush()
 
-    client_metadata = ClientMetadata(
-        client_id=client.id,
-        metadata_blob={"description": "A client created for testing."}
-    )
-
-    client_configuration = ClientConfiguration(
-        client_id=client.id,
-        configuration_blob={"oidc_conformant": True,
-                            "sender_constrained": True,
-                            "token_endpoint_auth_method": "authorization_code",
-                            "uris": {
-                                "app_login_uri": "https://example.com",
-                                "redirect_uris": ["https://example.com", "https://login.example.com"],
-                                "logout_uris": ["https://example.com/logout", "https://login.example.com/logout"],
-                                "web_origins": ["https://example.com", "https://resources.example.com"]
-                            },
-                            "cors": {
-                                "is_enabled": True,
-                                "allowed_origins": ["https://example.com", "https://anotherexample.invalid"],
-                                "fallback_url": "https://example.com"
-                            },
-                            "refresh": {
-                                "refresh_token_rotation_enabled": False,
-                                "rotation_overlap_period": 0,
-                                "idle_refresh_token_lifetime_enabled": False,
-                                "idle_refresh_token_lifetime": 1296000,
-                                "maximum_refresh_token_lifetime_enabled": False,
-                                "maximum_refresh_token_lifetime": 2592000
-                            },
-                            "jwt": {
-                                "algorithm": "RS256"
-                            }}
-    )
-
-    db_session.add_all([client_metadata, client_configuration])
+    # The client and user are built by their constructors, which derive their ids and hash their
+    # secrets; the metadata and configuration are plain rows, inserted without the ORM
+    db_session.execute(insert(ClientMetadata), [{
+        "client_id": client.id,
+        "metadata_blob": {"description": "A client created for testing."},
+    }])
+    db_session.execute(insert(ClientConfiguration), [{
+        "client_id": client.id,
+        "version": 1,
+        "configuration_blob": {"oidc_conformant": True,
+                              "sender_constrained": True,
+                              "token_endpoint_auth_method": "authorization_code",
+                              "uris": {
+                                  "app_login_uri": "https://example.com",
+                                  "redirect_uris": ["https://example.com", "https://login.example.com"],
+                                  "logout_uris": ["https://example.com/logout", "https://login.example.com/logout"],
+                                  "web_origins": ["https://example.com", "https://resources.example.com"]
+                              },
+                              "cors": {
+                                  "is_enabled": True,
+                                  "allowed_origins": ["https://example.com", "https://anotherexample.invalid"],
+                                  "fallback_url": "https://example.com"
+                              },
+                              "refresh": {
+                                  "refresh_token_rotation_enabled": False,
+                                  "rotation_overlap_period": 0,
+                                  "idle_refresh_token_lifetime_enabled": False,
+                                  "idle_refresh_token_lifetime": 1296000,
+                                  "maximum_refresh_token_lifetime_enabled": False,
+                                  "maximum_refresh_token_lifetime": 2592000
+                              },
+                              "jwt": {
+                                  "algorithm": "RS256"
+                              }},
+    }])
     db_session.commit()
     return client
 
@@ -93,7 +143,7 @@ def auth_config(app):
     app.config["AUTH_CODE_EXPIRY_SECONDS"] = 600  # 10 minutes
     app.config["AUTH_CODE_SECRET_KEY"] = secrets.token_bytes(32)  # Secure key
     app.config["JWT_ALGORITHM"] = "HS256"
-    app.config["ACCESS_TOKEN_EXPIRE_MINUTES"] = 60
-    app.config["REFRESH_TOKEN_EXPIRE_MINUTES"] = 43200
+    app.config["ACCESS_TOKEN_EXPIRE_SECONDS"] = 3600
+    app.config["REFRESH_TOKEN_EXPIRE_SECONDS"] = 2592000
     app.config["SECRET_KEY"] = "super-secret-key"  # Secure in production
     return app.config
\ No newline at end of file
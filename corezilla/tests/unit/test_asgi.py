@@ -0,0 +1,201 @@
+import asyncio
+import base64
+import http
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+pytest.importorskip("asgiref")
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+from corezilla.app import db
+from corezilla.app.asgi import create_asgi_app, parse_basic_authorization
+from corezilla.app.models import Client
+from corezilla.app.models.Client import ClientConfiguration
+from corezilla.app.models.User import User
+from corezilla.app.services.ClientService import ClientService
+from corezilla.app.services.TokenService import TokenService
+from corezilla.config.test import TestConfiguration
+
+
+@pytest.fixture
+def asgi(make_app, tmp_path):
+    class AsgiConfiguration(TestConfiguration):
+        # The async engine cannot share an in-memory database with the Flask application
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        ISSUER_NAME = "https://authzilla.example.com"
+        AUDIENCE = "https://example.invalid"
+
+    app = make_app(AsgiConfiguration)
+    user = User(username="test_user", email="user@example.invalid", password="password")
+    client = Client(owner=user, name="Test Client")
+    db.session.add_all([user, client])
+    db.session.commit()
+    app.test_credentials = (client.client_id, client.client_secret)
+
+    asgi_app = create_asgi_app(app)
+    yield asgi_app
+
+    asyncio.run(asgi_app.database.dispose())
+
+
+def call(asgi_app, path, form, headers=()):
+    """Send one form POST through the ASGI application and return `(status, headers, body)`."""
+    body = urlencode(form).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "server": ("localhost", 80),
+        "client": ("127.0.0.1", 12345),
+        "headers": [(b"content-type", b"application/x-www-form-urlencoded"), *headers],
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    start = sent[0]
+    response_headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    return start["status"], response_headers, b"".join(message.get("body", b"") for message in sent[1:])
+
+
+class TestOAuthASGIApplication:
+    def test_client_credentials(self, asgi):
+        """Ensure the client_credentials grant is served natively, authenticating through the async database."""
+        client_id, client_secret = asgi.app.test_credentials
+        basic = base64.b64encode(f"{client_id}:{client_secret}".encode())
+
+        status, headers, body = call(
+            asgi, "/api/oauth/token", {"grant_type": "client_credentials"}, [(b"authorization", b"Basic " + basic)]
+        )
+
+        assert status == http.HTTPStatus.OK
+        assert json.loads(body)["token_type"] == "Bearer"
+        assert "x-request-id" in headers
+
+    def test_invalid_client(self, asgi):
+        client_id, _ = asgi.app.test_credentials
+        status, _, body = call(asgi, "/api/oauth/token", {
+            "grant_type": "client_credentials", "client_id": client_id, "client_secret": "wrong"
+        })
+
+        assert status == http.HTTPStatus.UNAUTHORIZED
+        assert json.loads(body)["error"] == "invalid_client"
+
+    def test_introspect(self, asgi):
+        with asgi.app.app_context():
+            access_token = TokenService.generate_jwt({"sub": "user123", "token_type": "access_token"}, 3600)
+
+        status, _, body = call(asgi, "/api/oauth/introspect", {"token": access_token})
+        assert status == http.HTTPStatus.OK
+        assert json.loads(body)["sub"] == "user123"
+
+        status, _, body = call(asgi, "/api/oauth/introspect", {"token": "not-a-token"})
+        assert json.loads(body) == {"active": False}
+
+    def test_token_exchange_checks_registered_resources(self, asgi):
+        """Ensure the client's registered resources are loaded through the async database and enforced, for
+        both the resource and the audience parameters."""
+        client_id, client_secret = asgi.app.test_credentials
+        with asgi.app.app_context():
+            client = Client.query.filter_by(client_id=client_id).one()
+            db.session.add(ClientConfiguration(client.id, {"uris": {"resources": ["https://api.example.invalid"]}}))
+            db.session.commit()
+            subject_token = TokenService.generate_jwt(
+                {"sub": "user123", "scope": "read", "token_type": "access_token"}, 3600, client_id
+            )
+
+        def exchange(target, parameter="resource"):
+            return call(asgi, "/api/oauth/token", {
+                "grant_type": "urn:ietf:params:oauth:grant-type:token-exchange",
+                "client_id": client_id,
+                "client_secret": client_secret,
+                "subject_token": subject_token,
+                parameter: target,
+            })
+
+        for parameter in ("resource", "audience"):
+            status, _, _ = exchange("https://api.example.invalid", parameter)
+            assert status == http.HTTPStatus.OK
+
+            status, _, body = exchange("https://other.example.invalid", parameter)
+            assert status == http.HTTPStatus.BAD_REQUEST
+            assert json.loads(body)["error"] == "invalid_target"
+
+    def test_token_exchange_audience_loads_the_policy_without_blocking(self, asgi, mocker):
+        """Ensure the audience parameter, like resource, has the client's policy loaded through the async database."""
+        client_id, client_secret = asgi.app.test_credentials
+        with asgi.app.app_context():
+            subject_token = TokenService.generate_jwt({"sub": "user123", "token_type": "access_token"}, 3600, client_id)
+        load_async = mocker.spy(ClientService, "get_policy_async")
+
+        status, _, _ = call(asgi, "/api/oauth/token", {
+            "grant_type": "urn:ietf:params:oauth:grant-type:token-exchange",
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "subject_token": subject_token,
+            "audience": "https://other.example.invalid",
+        })
+
+        assert status == http.HTTPStatus.BAD_REQUEST
+        assert load_async.call_count == 1
+
+    def test_other_grants_use_the_flask_application(self, asgi):
+        """Ensure grants that need a user session are answered by the Flask token endpoint."""
+        status, _, _ = call(asgi, "/api/oauth/token", {"grant_type": "authorization_code", "code": "code"})
+
+        assert status == http.HTTPStatus.UNAUTHORIZED
+
+    def test_forwarded_requests_on_a_kept_alive_connection(self, asgi):
+        """Ensure a request started from within `send` of a forwarded request, as uvicorn starts the next
+        request on a kept-alive connection, can itself be forwarded to the Flask application."""
+        form = urlencode({"grant_type": "authorization_code", "code": "code"}).encode()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+            "path": "/api/oauth/token", "raw_path": b"/api/oauth/token", "query_string": b"", "root_path": "",
+            "server": ("localhost", 80), "client": ("127.0.0.1", 12345),
+            "headers": [(b"content-type", b"application/x-www-form-urlencoded")],
+        }
+        statuses = []
+
+        def connection(requests):
+            async def receive():
+                return {"type": "http.request", "body": form, "more_body": False}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+                elif not message.get("more_body") and requests > 1:
+                    next_requests.append(asyncio.create_task(asgi(scope, *connection(requests - 1))))
+
+            return receive, send
+
+        next_requests = []
+
+        async def serve():
+            await asgi(scope, *connection(2))
+            while next_requests:
+                await next_requests.pop()
+
+        asyncio.run(serve())
+
+        assert statuses == [http.HTTPStatus.UNAUTHORIZED, http.HTTPStatus.UNAUTHORIZED]
+
+    def test_parse_basic_authorization(self):
+        assert parse_basic_authorization("Basic " + base64.b64encode(b"id:se:cret").decode()) == ("id", "se:cret")
+        assert parse_basic_authorization("Basic !!!") is None
+        assert parse_basic_authorization("Bearer token") is None
@@ -0,0 +1,82 @@
+import gzip
+
+import pytest
+from flask import render_template_string
+
+from corezilla.app import create_app
+from corezilla.app.utils.assets import build_assets
+from corezilla.config.test import TestConfiguration
+
+STYLESHEET = b"body { padding-top: 60px; }\n" * 100
+
+
+@pytest.fixture
+def assets_app(tmp_path):
+    static_folder = tmp_path / "static"
+    (static_folder / "css").mkdir(parents=True)
+    (static_folder / "css" / "site.css").write_bytes(STYLESHEET)
+
+    class AssetsConfiguration(TestConfiguration):
+        STATIC_FOLDER = static_folder
+        STATIC_BUILD_FOLDER = tmp_path / "build"
+
+    build_assets(AssetsConfiguration.STATIC_FOLDER, AssetsConfiguration.STATIC_BUILD_FOLDER)
+    app = create_app(AssetsConfiguration)
+    with app.test_request_context():
+        yield app
+
+
+class TestAssets:
+    def test_build(self, tmp_path):
+        """Ensure files are copied under a name including a hash of their contents, and compressed."""
+        static_folder = tmp_path / "static"
+        static_folder.mkdir()
+        (static_folder / "site.css").write_bytes(STYLESHEET)
+        (static_folder / "logo.png").write_bytes(b"\x89PNG\r\n")
+
+        manifest = build_assets(static_folder, tmp_path / "build")
+
+        css = manifest["site.css"]
+        assert css["path"].startswith("site.") and css["path"].endswith(".css") and css["path"] != "site.css"
+        assert "gzip" in css["encodings"]
+        assert gzip.decompress((tmp_path / "build" / (css["path"] + ".gz")).read_bytes()) == STYLESHEET
+        assert manifest["logo.png"]["encodings"] == []
+
+        (static_folder / "site.css").write_bytes(STYLESHEET + b"a {}\n")
+        assert build_assets(static_folder, tmp_path / "build")["site.css"]["path"] != css["path"]
+
+    def test_asset_url(self, assets_app):
+        """Ensure templates link to the fingerprinted copy, and to the file itself when there is none."""
+        url = render_template_string("{{ asset_url('css/site.css') }}")
+
+        assert url.startswith("/static/css/site.") and url != "/static/css/site.css"
+        assert render_template_string("{{ asset_url('missing.js') }}") == "/static/missing.js"
+
+    def test_serve_fingerprinted(self, assets_app):
+        """Ensure fingerprinted files are served pre-compressed and cached without revalidation."""
+        url = render_template_string("{{ asset_url('css/site.css') }}")
+        client = assets_app.test_client()
+
+        plain = client.get(url)
+        compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+
+        assert plain.data == STYLESHEET
+        assert plain.mimetype == "text/css"
+        assert "Content-Encoding" not in plain.headers
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(compressed.data) == STYLESHEET
+        assert compressed.cache_control.immutable
+        assert compressed.cache_control.public
+        assert compressed.cache_control.max_age == assets_app.config["STATIC_ASSETS_MAX_AGE_SECONDS"]
+        assert "Accept-Encoding" in compressed.headers["Vary"]
+        plain.close()
+        compressed.close()
+
+    def test_serve_original(self, assets_app):
+        """Ensure the original names are still served as before."""
+        response = assets_app.test_client().get("/static/css/site.css")
+
+        assert response.status_code == 200
+        assert response.data == STYLESHEET
+        assert not response.cache_control.immutable
+        response.close()
@@ -1,9 +1,11 @@
 import pytest
 import http
+from urllib.parse import parse_qs, urlparse
 from flask import url_for
 from corezilla.app.services.TokenService import TokenService
 from corezilla.app.services.ClientService import ClientService
 from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService
+from corezilla.tests.unit.test_authorization_code import RFC7636_CHALLENGE, RFC7636_VERIFIER
 
 
 @pytest.mark.usefixtures("oauth_client", "user", "db_session")
@@ -47,6 +49,22 @@ class TestAuthorizationApi:
         assert response.status_code == http.HTTPStatus.BAD_REQUEST
         assert "invalid_client" in response.json["status"]
 
+    def test_unauthenticated_error_is_only_redirected_to_registered_uris(self, client, oauth_client):
+        """Ensure an unauthenticated request is not redirected to a URI the client has not registered."""
+        query = {"client_id": oauth_client.client_id, "response_type": "code", "state": "xyz"}
+
+        response = client.get("/api/oauth/authorize", query_string={**query, "redirect_uri": "https://attacker.invalid"})
+        assert response.status_code == http.HTTPStatus.BAD_REQUEST
+        assert response.json["error"] == "unauthorized"
+        assert "Location" not in response.headers
+
+        response = client.get("/api/oauth/authorize", query_string={**query, "redirect_uri": "https://login.example.com"})
+        assert response.status_code == http.HTTPStatus.FOUND
+        location = urlparse(response.location)
+        assert location.netloc == "login.example.com"
+        assert parse_qs(location.query)["error"] == ["unauthorized"]
+        assert parse_qs(location.query)["state"] == ["xyz"]
+
     def test_token_endpoint_valid_code(self, client, oauth_client, user, db_session):
         """Test token endpoint with a valid authorization code."""
         authorization_code = AuthorizationCodeService.generate_authorization_code(oauth_client.client_id, user.id)
@@ -94,3 +112,197 @@ class TestAuthorizationApi:
             data={"token": access_token}
         )
         assert response.status_code == http.HTTPStatus.NO_CONTENT
+
+    def test_token_endpoint_client_credentials(self, client, oauth_client, db_session):
+        """Test the client_credentials grant with HTTP Basic and form authentication."""
+        secret = oauth_client.client_secret
+        db_session.commit()
+
+        basic = client.post(
+            url_for("oauth.TokenApi"),
+            data={"grant_type": "client_credentials"},
+            auth=(oauth_client.client_id, secret)
+        )
+        form = client.post(
+            url_for("oauth.TokenApi"),
+            data={"grant_type": "client_credentials", "client_id": oauth_client.client_id, "client_secret": secret}
+        )
+        assert basic.status_code == http.HTTPStatus.OK
+        assert form.status_code == http.HTTPStatus.OK
+        assert "access_token" in basic.json
+
+    def test_token_endpoint_client_credentials_invalid_secret(self, client, oauth_client):
+        response = client.post(
+            url_for("oauth.TokenApi"),
+            data={"grant_type": "client_credentials", "client_id": oauth_client.client_id, "client_secret": "wrong"}
+        )
+        assert response.status_code == http.HTTPStatus.UNAUTHORIZED
+        assert response.json["error"] == "invalid_client"
+
+    def test_token_exchange_endpoints(self, app, client, oauth_client, db_session):
+        """Test the single and batch token exchange endpoints."""
+        app.config["TOKEN_EXCHANGE_AUDIENCES"] = {"https://orders.example.invalid", "https://billing.example.invalid/api"}
+        secret = oauth_client.client_secret
+        db_session.commit()
+        subject_token = TokenService.generate_jwt(
+            {"sub": "user123", "scope": "read write", "token_type": "access_token"}, 3600, oauth_client.client_id
+        )
+
+        single = client.post(
+            url_for("oauth.TokenApi"),
+            data={
+                "grant_type": "urn:ietf:params:oauth:grant-type:token-exchange",
+                "subject_token": subject_token,
+                "subject_token_type": "urn:ietf:params:oauth:token-type:access_token",
+                "audience": "https://orders.example.invalid",
+                "scope": "read",
+            },
+            auth=(oauth_client.client_id, secret)
+        )
+        assert single.status_code == http.HTTPStatus.OK
+        assert single.json["issued_token_type"] == "urn:ietf:params:oauth:token-type:access_token"
+        assert single.json["scope"] == "read"
+
+        batch = client.post(
+            url_for("oauth.TokenExchangeBatchApi"),
+            json={
+                "subject_token": subject_token,
+                "exchanges": [
+                    {"audience": "https://orders.example.invalid", "scope": "read"},
+                    {"resource": "https://billing.example.invalid/api"},
+                    {"resource": "not-a-uri"},
+                ],
+            },
+            auth=(oauth_client.client_id, secret)
+        )
+        assert batch.status_code == http.HTTPStatus.OK
+        results = batch.json["results"]
+        assert "access_token" in results[0]
+        assert results[1]["scope"] == "read write"
+        assert results[2]["error"] == "invalid_target"
+
+    def test_token_exchange_audience_must_be_allowed(self, client, oauth_client, db_session):
+        """Ensure a client can only exchange tokens for the audiences registered as its resources."""
+        secret = oauth_client.client_secret
+        configuration = ClientService.get_client_configuration(oauth_client.client_id)
+        configuration.configuration_blob["uris"]["resources"] = ["https://orders.example.invalid"]
+        configuration.configuration_blob.changed()
+        db_session.commit()
+        subject_token = TokenService.generate_jwt(
+            {"sub": "user123", "scope": "read", "token_type": "access_token"}, 3600, oauth_client.client_id
+        )
+
+        def exchange(audience):
+            return client.post("/api/oauth/token", data={
+                "grant_type": "urn:ietf:params:oauth:grant-type:token-exchange",
+                "subject_token": subject_token,
+                "audience": audience,
+            }, auth=(oauth_client.client_id, secret))
+
+        assert exchange("https://orders.example.invalid").status_code == http.HTTPStatus.OK
+        refused = exchange("https://payments.example.invalid")
+        assert refused.status_code == http.HTTPStatus.BAD_REQUEST
+        assert refused.json["error"] == "invalid_target"
+
+        batch = client.post("/api/oauth/token/batch", json={
+            "subject_token": subject_token,
+            "exchanges": [{"audience": "https://orders.example.invalid"}, {"audience": "https://payments.example.invalid"}],
+        }, auth=(oauth_client.client_id, secret))
+        assert batch.status_code == http.HTTPStatus.OK
+        results = batch.json["results"]
+        assert "access_token" in results[0]
+        assert results[1]["error"] == "invalid_target"
+
+    def test_token_exchange_resource_must_be_allowed(self, client, oauth_client, db_session):
+        """Ensure a resource is checked like an audience, including for clients that registered no resources."""
+        secret = oauth_client.client_secret
+        db_session.commit()
+        subject_token = TokenService.generate_jwt(
+            {"sub": "user123", "scope": "read", "token_type": "access_token"}, 3600, oauth_client.client_id
+        )
+
+        refused = client.post("/api/oauth/token", data={
+            "grant_type": "urn:ietf:params:oauth:grant-type:token-exchange",
+            "subject_token": subject_token,
+            "resource": "https://payments.example.invalid",
+        }, auth=(oauth_client.client_id, secret))
+        assert refused.status_code == http.HTTPStatus.BAD_REQUEST
+        assert refused.json["error"] == "invalid_target"
+
+        batch = client.post("/api/oauth/token/batch", json={
+            "subject_token": subject_token,
+            "exchanges": [{"resource": "https://authzilla.invalid"}, {"resource": "https://payments.example.invalid"}],
+        }, auth=(oauth_client.client_id, secret))
+        results = batch.json["results"]
+        assert "access_token" in results[0]
+        assert results[1]["error"] == "invalid_target"
+
+    def test_token_exchange_subject_token_must_be_for_the_client(self, client, oauth_client, db_session):
+        secret = oauth_client.client_secret
+        db_session.commit()
+        subject_token = TokenService.generate_jwt({"sub": "user123", "token_type": "access_token"}, 3600)
+
+        response = client.post("/api/oauth/token", data={
+            "grant_type": "urn:ietf:params:oauth:grant-type:token-exchange",
+            "subject_token": subject_token,
+        }, auth=(oauth_client.client_id, secret))
+
+        assert response.status_code == http.HTTPStatus.BAD_REQUEST
+        assert response.json["error"] == "invalid_grant"
+
+
+@pytest.mark.usefixtures("oauth_client", "user", "db_session")
+class TestAuthorizationCodeFlow:
+    @pytest.fixture
+    def logged_in_client(self, app, user):
+        with app.test_client() as test_client:
+            with test_client.session_transaction() as session:
+                session['_user_id'] = user.fs_uniquifier
+                session['_fresh'] = True
+            yield test_client
+
+    @staticmethod
+    def authorize(test_client, client_id, **params):
+        return test_client.get("/api/oauth/authorize", query_string={
+            "client_id": client_id, "response_type": "code", "redirect_uri": "https://example.com", **params
+        })
+
+    def test_code_is_bound_to_redirect_uri(self, logged_in_client, oauth_client, db_session):
+        """Ensure a code redeemed with another redirect URI than it was issued for is an invalid_grant."""
+        secret = oauth_client.client_secret
+        db_session.commit()
+        response = self.authorize(logged_in_client, oauth_client.client_id, code_challenge=RFC7636_CHALLENGE)
+        assert response.status_code == http.HTTPStatus.FOUND
+        code = parse_qs(urlparse(response.location).query)["code"][0]
+
+        form = {
+            "grant_type": "authorization_code", "client_id": oauth_client.client_id, "client_secret": secret,
+            "code": code, "code_verifier": RFC7636_VERIFIER,
+        }
+        mismatched = logged_in_client.post("/api/oauth/token", data={**form, "redirect_uri": "https://login.example.com"})
+        assert mismatched.status_code == http.HTTPStatus.BAD_REQUEST
+        assert mismatched.json["error"] == "invalid_grant"
+
+        redeemed = logged_in_client.post("/api/oauth/token", data={**form, "redirect_uri": "https://example.com"})
+        assert redeemed.status_code == http.HTTPStatus.OK
+        assert "access_token" in redeemed.json
+
+    def test_plain_challenge_method(self, app, logged_in_client, oauth_client):
+        """Ensure the plain method is only accepted when PKCE_PLAIN_ALLOWED is set."""
+        params = {"code_challenge": RFC7636_VERIFIER, "code_challenge_method": "plain"}
+
+        assert self.authorize(logged_in_client, oauth_client.client_id, **params).status_code == http.HTTPStatus.BAD_REQUEST
+
+        app.config["PKCE_PLAIN_ALLOWED"] = True
+        assert self.authorize(logged_in_client, oauth_client.client_id, **params).status_code == http.HTTPStatus.FOUND
+
+    def test_public_clients_must_use_pkce(self, logged_in_client, oauth_client, db_session):
+        oauth_client.is_public = True
+        db_session.commit()
+
+        response = self.authorize(logged_in_client, oauth_client.client_id)
+
+        assert response.status_code == http.HTTPStatus.BAD_REQUEST
+        assert self.authorize(
+            logged_in_client, oauth_client.client_id, code_challenge=RFC7636_CHALLENGE
+        ).status_code == http.HTTPStatus.FOUND
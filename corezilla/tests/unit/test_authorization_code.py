@@ -6,7 +6,7 @@ import secrets
 import pytest
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
-from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService
+from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService, is_valid_code_challenge, verify_code_verifier
 
 
 @pytest.mark.usefixtures("oauth_client", "user", "db_session")
@@ -123,3 +123,73 @@ class TestAuthorizationCodeService:
 
         with pytest.raises(ValueError, match="Authorization code is not yet valid"):
             AuthorizationCodeService.validate_authorization_code(tampered_code, oauth_client.client_id)
+
+
+# https://datatracker.ietf.org/doc/html/rfc7636#appendix-B
+RFC7636_VERIFIER = "dBjftJeZ4CVP-mB92K27uhbUJU1p1r_wW1gFWFOEjXk"
+RFC7636_CHALLENGE = "E9Melhoa2OwvFrEMTJguCHaoeK1t8URWbuGJSstw-cM"
+
+
+@pytest.mark.usefixtures("oauth_client", "user", "db_session")
+class TestProofKeyForCodeExchange:
+    def test_verify_code_verifier(self):
+        assert verify_code_verifier(RFC7636_VERIFIER, RFC7636_CHALLENGE, "S256")
+        assert not verify_code_verifier(RFC7636_VERIFIER[:-1] + "h", RFC7636_CHALLENGE, "S256")
+        assert verify_code_verifier(RFC7636_VERIFIER, RFC7636_VERIFIER, "plain")
+        assert not verify_code_verifier(RFC7636_VERIFIER, RFC7636_CHALLENGE, "unknown")
+        assert not verify_code_verifier("too-short", "too-short", "plain")
+
+    def test_is_valid_code_challenge(self):
+        assert is_valid_code_challenge(RFC7636_CHALLENGE, "S256")
+        assert not is_valid_code_challenge(RFC7636_CHALLENGE + "A", "S256")
+        assert not is_valid_code_challenge(RFC7636_CHALLENGE, "S512")
+
+    def test_challenge_is_carried_in_code(self, oauth_client, auth_config):
+        """Ensure the challenge is encrypted into the code and checked when it is redeemed."""
+        auth_code = AuthorizationCodeService.generate_authorization_code(
+            oauth_client.client_id, oauth_client.owner.user_id,
+            code_challenge=RFC7636_CHALLENGE, code_challenge_method="S256"
+        )
+
+        assert RFC7636_CHALLENGE not in base64.urlsafe_b64decode(auth_code).decode("latin-1")
+        payload = AuthorizationCodeService.validate_authorization_code(auth_code, oauth_client.client_id, RFC7636_VERIFIER)
+        assert payload["code_challenge_method"] == "S256"
+
+        with pytest.raises(ValueError, match="Invalid code_verifier"):
+            AuthorizationCodeService.validate_authorization_code(auth_code, oauth_client.client_id)
+
+    def test_verifier_without_challenge_is_rejected(self, oauth_client, auth_config):
+        auth_code = AuthorizationCodeService.generate_authorization_code(oauth_client.client_id, oauth_client.owner.user_id)
+
+        with pytest.raises(ValueError, match="Unexpected code_verifier"):
+            AuthorizationCodeService.validate_authorization_code(auth_code, oauth_client.client_id, RFC7636_VERIFIER)
+
+    def test_challenge_method_defaults_to_s256(self, oauth_client, auth_config):
+        auth_code = AuthorizationCodeService.generate_authorization_code(
+            oauth_client.client_id, oauth_client.owner.user_id, code_challenge=RFC7636_CHALLENGE
+        )
+
+        payload = AuthorizationCodeService.validate_authorization_code(auth_code, oauth_client.client_id, RFC7636_VERIFIER)
+        assert payload["code_challenge_method"] == "S256"
+
+
+@pytest.mark.usefixtures("oauth_client", "user", "db_session")
+class TestRedirectUriBinding:
+    def test_redirect_uri_is_bound_to_code(self, oauth_client, auth_config):
+        """Ensure a code can only be redeemed with the redirect URI it was issued for."""
+        auth_code = AuthorizationCodeService.generate_authorization_code(
+            oauth_client.client_id, oauth_client.owner.user_id, redirect_uri="https://example.com"
+        )
+
+        payload = AuthorizationCodeService.validate_authorization_code(
+            auth_code, oauth_client.client_id, redirect_uri="https://example.com"
+        )
+        assert payload["redirect_uri"] == "https://example.com"
+
+        with pytest.raises(ValueError, match="Redirect URI mismatch"):
+            AuthorizationCodeService.validate_authorization_code(
+                auth_code, oauth_client.client_id, redirect_uri="https://login.example.com"
+            )
+        with pytest.raises(ValueError, match="Redirect URI mismatch"):
+            AuthorizationCodeService.validate_authorization_code(auth_code, oauth_client.client_id)
+
@@ -169,3 +169,128 @@ class TestClientsAPI:
             # Confirm deletion
             response = test_client.get(f'/api/clients/{oauth_client.client_id}')
             assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.usefixtures("oauth_client", "user", "db_session")
+class TestConditionalRequests:
+
+    def signed_in(self, app, user):
+        test_client = app.test_client()
+        with test_client.session_transaction() as session:
+            session['_user_id'] = str(user.user_id)
+            session['_fresh'] = True
+        return test_client
+
+    def test_get_client_etag(self, app, user, oauth_client, db_session):
+        """Ensure an unchanged client is answered with a 304, and any change to it changes its ETag."""
+        test_client = self.signed_in(app, user)
+        url = f'/api/clients/{oauth_client.client_id}'
+
+        response = test_client.get(url)
+        etag = response.headers["ETag"]
+        assert response.status_code == HTTPStatus.OK
+        assert not etag.startswith("W/")
+        assert response.json["name"] == "Test Client"
+
+        response = test_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert response.headers["ETag"] == etag
+        assert response.data == b""
+
+        oauth_client.client_configurations[0].configuration_blob["jwt"]["algorithm"] = "ES256"
+        oauth_client.client_configurations[0].configuration_blob.changed()
+        db_session.commit()
+        response = test_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == HTTPStatus.OK
+        assert response.json["configuration"]["jwt"]["algorithm"] == "ES256"
+        assert response.headers["ETag"] != etag
+
+        etag = response.headers["ETag"]
+        oauth_client.client_metadata.metadata_blob["description"] = "Changed."
+        db_session.commit()
+        assert test_client.get(url, headers={"If-None-Match": etag}).status_code == HTTPStatus.OK
+
+    def test_list_clients_etag(self, app, user, oauth_client, db_session):
+        test_client = self.signed_in(app, user)
+
+        response = test_client.get('/api/clients/')
+        etag = response.headers["ETag"]
+        assert etag.startswith("W/")
+        assert test_client.get('/api/clients/', headers={"If-None-Match": etag}).status_code == HTTPStatus.NOT_MODIFIED
+
+        oauth_client.client_name = "Renamed"
+        db_session.commit()
+        response = test_client.get('/api/clients/', headers={"If-None-Match": etag})
+        assert response.status_code == HTTPStatus.OK
+        assert response.json["clients"][0]["name"] == "Renamed"
+
+
+@pytest.mark.usefixtures("oauth_client", "user", "db_session")
+class TestClientSecret:
+
+    def test_secret_is_stored_as_verifier(self, oauth_client, db_session):
+        """Ensure only a keyed digest of the secret reaches the database."""
+        secret = oauth_client.client_secret
+        stored = db_session.query(Client._client_secret).filter_by(id=oauth_client.id).scalar()
+
+        assert secret.startswith("AZL-CS-")
+        assert stored.startswith("$blake2b$")
+        assert secret not in stored
+        assert oauth_client.verify_secret(secret)
+        assert not oauth_client.verify_secret(secret[:-1])
+
+    def test_secret_is_not_returned_once_reloaded(self, oauth_client, db_session):
+        client_id = oauth_client.id
+        db_session.expunge_all()
+
+        assert db_session.get(Client, client_id).client_secret is None
+
+    def test_legacy_plaintext_secret_is_upgraded(self, oauth_client, db_session):
+        """Ensure a plaintext secret from before hashing still verifies and is replaced by a verifier."""
+        from corezilla.app.services.ClientService import ClientService
+
+        oauth_client._client_secret = "AZL-CS-legacy"
+        db_session.commit()
+
+        assert ClientService.verify_client(oauth_client.client_id, "AZL-CS-legacy") is not None
+        stored = db_session.query(Client._client_secret).filter_by(id=oauth_client.id).scalar()
+        assert stored.startswith("$blake2b$")
+        assert oauth_client.verify_secret("AZL-CS-legacy")
+
+
+@pytest.mark.usefixtures("oauth_client", "user", "db_session")
+class TestResourceIndicators:
+
+    def test_resource_uris_are_validated_once(self, app):
+        from corezilla.app.services.ClientService import ClientService, _resource_uri_error
+
+        _resource_uri_error.cache_clear()
+        assert ClientService.validate_resource_uris("https://api.example.com") == ["https://api.example.com"]
+        assert ClientService.validate_resource_uris(["https://api.example.com"]) == ["https://api.example.com"]
+        assert _resource_uri_error.cache_info().hits == 1
+
+        for invalid in ("not-a-uri", "https://api.example.com#fragment", ["https://api.example.com", 1]):
+            with pytest.raises(ValueError):
+                ClientService.validate_resource_uris(invalid)
+
+    def test_registered_resources_are_looked_up_without_parsing(self, oauth_client, db_session, mocker):
+        """Ensure a client's registered resources become an allowlist, and unknown resources are rejected."""
+        from corezilla.app.services.ClientService import ClientService
+
+        assert ClientService.get_resource_allowlist(oauth_client) is None
+
+        configuration = oauth_client.client_configurations[0]
+        configuration.configuration_blob["uris"] = dict(
+            configuration.configuration_blob.get("uris") or {},
+            resources=["https://api.example.com", "not-a-uri"],
+        )
+        db_session.commit()
+
+        allowed = ClientService.get_resource_allowlist(oauth_client)
+        assert allowed == frozenset({"https://api.example.com"})
+
+        urlparse = mocker.patch("corezilla.app.services.ClientService.urlparse")
+        assert ClientService.validate_resource_uris("https://api.example.com", allowed) == ["https://api.example.com"]
+        with pytest.raises(ValueError, match="Unknown resource URI"):
+            ClientService.validate_resource_uris("https://other.example.com", allowed)
+        urlparse.assert_not_called()
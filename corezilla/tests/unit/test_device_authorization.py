@@ -0,0 +1,200 @@
+import http
+import threading
+
+import pytest
+from flask import url_for
+
+from corezilla.app.models import Client
+from corezilla.app.services.DeviceAuthorizationService import DEVICE_CODE_GRANT_TYPE, normalize_user_code
+from corezilla.app.utils.device_grants import (
+    APPROVED, DENIED, DeviceGrant, MemoryDeviceGrantStore, SQLiteDeviceGrantStore
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryDeviceGrantStore()
+    return SQLiteDeviceGrantStore(tmp_path / "device_grants.db")
+
+
+@pytest.fixture
+def device_client(db_session, user):
+    client = Client(owner=user, name="Test Device", app_type="native", is_public=True)
+    db_session.add(client)
+    db_session.commit()
+    return client
+
+
+def login(test_client, user):
+    with test_client.session_transaction() as session:
+        session["_user_id"] = user.fs_uniquifier
+        session["_fresh"] = True
+        # Saved by Flask-Principal when `login_user` announces the new identity
+        session["identity.id"] = user.fs_uniquifier
+        session["identity.auth_type"] = None
+
+
+class TestDeviceGrantStores:
+    def test_lookup_by_either_code(self, store):
+        """Ensure a grant is found by its device code and user code until it expires."""
+        store.add(DeviceGrant("device-1", "BCDFGHJK", "cl-1", "read", expires_at=200.0, interval=5))
+
+        assert store.get_by_device_code("device-1", now=100.0).user_code == "BCDFGHJK"
+        assert store.get_by_user_code("BCDFGHJK", now=100.0).device_code == "device-1"
+        assert store.get_by_device_code("device-1", now=300.0) is None
+
+    def test_resolve_once_and_consume_once(self, store):
+        """Ensure a grant is resolved and redeemed at most once."""
+        store.add(DeviceGrant("device-1", "BCDFGHJK", "cl-1", None, expires_at=200.0, interval=5))
+
+        assert store.resolve("BCDFGHJK", APPROVED, "user-1", now=100.0).user_id == "user-1"
+        assert store.resolve("BCDFGHJK", DENIED, "user-1", now=100.0) is None
+
+        assert store.consume("device-1") is True
+        assert store.consume("device-1") is False
+        assert store.get_by_device_code("device-1", now=100.0) is None
+
+    def test_sweep_removes_events_without_pollers(self, store):
+        """Ensure an event set for a grant that is never polled in this process does not outlive the sweep."""
+        store.add(DeviceGrant("resolved", "BCDFGHJK", "cl-1", None, expires_at=200.0, interval=5))
+        polled = DeviceGrant("polled", "LMNPQRST", "cl-1", None, expires_at=200.0, interval=5)
+        store.add(polled)
+        store.start_polling(polled, now=100.0)
+        store.resolve("BCDFGHJK", APPROVED, "user-1", now=100.0)
+        store.resolve("LMNPQRST", APPROVED, "user-1", now=100.0)
+
+        store.sweep(now=100.0)
+
+        assert set(store._events) == {"polled"}
+        store.sweep(now=300.0)
+        assert not store._events
+
+    def test_sweep_removes_expired_grants(self, store):
+        store.add(DeviceGrant("expired", "BCDFGHJK", "cl-1", None, expires_at=50.0, interval=5))
+        store.add(DeviceGrant("live", "LMNPQRST", "cl-1", None, expires_at=200.0, interval=5))
+
+        assert store.sweep(now=100.0) == 1
+        assert store.get_by_device_code("live", now=100.0) is not None
+
+    def test_polling_too_fast_slows_down(self, store):
+        """Ensure polling within the interval is refused and the interval grows by five seconds."""
+        grant = DeviceGrant("device-1", "BCDFGHJK", "cl-1", None, expires_at=200.0, interval=5)
+
+        assert store.check_poll_rate("device-1", now=100.0) is None
+        store.start_polling(grant, now=100.0)
+
+        assert store.check_poll_rate("device-1", now=102.0) is False
+        assert store.check_poll_rate("device-1", now=108.0) is False
+        assert store.check_poll_rate("device-1", now=123.0) is True
+
+    def test_resolve_wakes_waiting_poller(self, store):
+        store.add(DeviceGrant("device-1", "BCDFGHJK", "cl-1", None, expires_at=float("inf"), interval=5))
+        threading.Timer(0.05, store.resolve, ("BCDFGHJK", APPROVED, "user-1", 100.0)).start()
+
+        assert store.wait("device-1", timeout=5) is True
+
+
+@pytest.mark.usefixtures("auth_config")
+class TestDeviceAuthorizationApi:
+
+    def start(self, test_client, device_client):
+        response = test_client.post(url_for("oauth.DeviceAuthorizationApi"), data={
+            "client_id": device_client.client_id,
+            "scope": "read",
+        })
+        assert response.status_code == http.HTTPStatus.OK
+        return response.json
+
+    def poll(self, test_client, device_client, device_code):
+        return test_client.post(url_for("oauth.TokenApi"), data={
+            "grant_type": DEVICE_CODE_GRANT_TYPE,
+            "client_id": device_client.client_id,
+            "device_code": device_code,
+        })
+
+    def test_device_flow(self, app, user, device_client):
+        """Ensure a device receives tokens once, after the user approves its user code."""
+        app.config["DEVICE_CODE_POLL_INTERVAL_SECONDS"] = 0
+
+        with app.test_client() as test_client:
+            # The current user is cached on `g` for the test's app context, so sign in before the first request
+            login(test_client, user)
+            authorization = self.start(test_client, device_client)
+            assert authorization["verification_uri"].endswith("/api/oauth/device")
+            assert authorization["verification_uri_complete"].endswith(authorization["user_code"])
+
+            response = self.poll(test_client, device_client, authorization["device_code"])
+            assert response.status_code == http.HTTPStatus.BAD_REQUEST
+            assert response.json["error"] == "authorization_pending"
+
+            response = test_client.post(url_for("oauth.DeviceVerificationApi"), data={
+                "user_code": authorization["user_code"].lower(),
+            })
+            assert response.status_code == http.HTTPStatus.OK
+            assert response.json["status"] == APPROVED
+
+            response = self.poll(test_client, device_client, authorization["device_code"])
+            assert response.status_code == http.HTTPStatus.OK
+            assert "access_token" in response.json
+            assert "refresh_token" in response.json
+
+            response = self.poll(test_client, device_client, authorization["device_code"])
+            assert response.json["error"] == "invalid_grant"
+
+    def test_denied(self, app, user, device_client):
+        app.config["DEVICE_CODE_POLL_INTERVAL_SECONDS"] = 0
+
+        with app.test_client() as test_client:
+            login(test_client, user)
+            authorization = self.start(test_client, device_client)
+
+            response = test_client.post(url_for("oauth.DeviceVerificationApi"), data={
+                "user_code": authorization["user_code"],
+                "action": "deny",
+            })
+            assert response.json["status"] == DENIED
+
+            response = self.poll(test_client, device_client, authorization["device_code"])
+            assert response.json["error"] == "access_denied"
+
+    def test_slow_down(self, app, device_client):
+        with app.test_client() as test_client:
+            authorization = self.start(test_client, device_client)
+
+            assert self.poll(test_client, device_client, authorization["device_code"]).json["error"] == "authorization_pending"
+            assert self.poll(test_client, device_client, authorization["device_code"]).json["error"] == "slow_down"
+
+    def test_verification_requires_login(self, app, device_client):
+        with app.test_client() as test_client:
+            authorization = self.start(test_client, device_client)
+            response = test_client.post(url_for("oauth.DeviceVerificationApi"), data={
+                "user_code": authorization["user_code"],
+            })
+            assert response.status_code == http.HTTPStatus.UNAUTHORIZED
+
+    def test_verification_failures_are_limited(self, app, user, device_client):
+        """Ensure a user entering too many invalid user codes is locked out, even for a valid code."""
+        app.config["DEVICE_VERIFICATION_MAX_FAILURES"] = 3
+
+        with app.test_client() as test_client:
+            login(test_client, user)
+            authorization = self.start(test_client, device_client)
+
+            for _ in range(3):
+                response = test_client.post(url_for("oauth.DeviceVerificationApi"), data={"user_code": "BBBB-BBBB"})
+                assert response.status_code == http.HTTPStatus.BAD_REQUEST
+
+            response = test_client.post(url_for("oauth.DeviceVerificationApi"), data={
+                "user_code": authorization["user_code"],
+            })
+            assert response.status_code == http.HTTPStatus.TOO_MANY_REQUESTS
+            assert response.json["error"] == "invalid_request"
+
+    def test_confidential_client_must_authenticate(self, client, oauth_client):
+        response = client.post(url_for("oauth.DeviceAuthorizationApi"), data={"client_id": oauth_client.client_id})
+        assert response.status_code == http.HTTPStatus.UNAUTHORIZED
+        assert response.json["error"] == "invalid_client"
+
+    def test_user_code_normalization(self):
+        assert normalize_user_code("bcdf-ghjk ") == "BCDFGHJK"
@@ -0,0 +1,46 @@
+import http
+from urllib.parse import parse_qs, urlsplit
+
+from corezilla.app.utils.handlers import handle_error
+
+
+class TestHandleError:
+    def test_json_error(self, app):
+        with app.test_request_context():
+            response = handle_error(None, "invalid_request", "Missing 'client_id' parameter.", state='a"b')
+
+        assert response.status_code == http.HTTPStatus.BAD_REQUEST
+        assert response.mimetype == "application/json"
+        assert response.json == {
+            "error": "invalid_request",
+            "error_description": "Missing 'client_id' parameter.",
+            "state": 'a"b',
+        }
+
+    def test_default_description(self, app):
+        with app.test_request_context():
+            response = handle_error(None, "server_error")
+
+        assert response.json == {"error": "server_error", "error_description": "An error occurred during authorization."}
+
+    def test_redirect_error(self, app):
+        """Ensure the error is appended to the redirect URI's query, keeping any it already has."""
+        with app.test_request_context():
+            response = handle_error("https://example.com/callback?tenant=1", "access_denied", "Access Denied.", state="xyz")
+
+        assert response.status_code == http.HTTPStatus.FOUND
+        location = urlsplit(response.headers["Location"])
+        assert location.path == "/callback"
+        assert parse_qs(location.query) == {
+            "tenant": ["1"],
+            "error": ["access_denied"],
+            "error_description": ["Access Denied."],
+            "state": ["xyz"],
+        }
+
+    def test_invalid_redirect_uri_falls_back_to_json(self, app):
+        with app.test_request_context():
+            response = handle_error("/callback", "access_denied", "Access Denied.")
+
+        assert response.status_code == http.HTTPStatus.BAD_REQUEST
+        assert response.json["error"] == "access_denied"
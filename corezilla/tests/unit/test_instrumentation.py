@@ -0,0 +1,65 @@
+import logging
+from http import HTTPStatus
+
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from corezilla.app import db
+from corezilla.app.utils.instrumentation import QueryStats, redact_parameters
+
+
+@pytest.mark.usefixtures("oauth_client", "user", "db_session")
+class TestSQLInstrumentation:
+    def test_query_stats_headers_in_debug(self, app, user):
+        """Ensure the per-request query count and time are returned as headers in debug mode."""
+        with app.test_client() as test_client:
+            with test_client.session_transaction() as session:
+                session['_user_id'] = str(user.user_id)
+                session['_fresh'] = True
+
+            response = test_client.get('/api/clients/')
+
+            assert response.status_code == HTTPStatus.OK
+            assert int(response.headers["X-DB-Query-Count"]) > 0
+            assert float(response.headers["X-DB-Query-Time"]) >= 0
+
+    def test_slow_queries_are_logged_without_parameters(self, app, user, caplog):
+        """Ensure slow queries are logged with the bound parameter values redacted."""
+        app.config["SQLALCHEMY_SLOW_QUERY_THRESHOLD_SECONDS"] = 0
+
+        with app.test_client() as test_client:
+            with test_client.session_transaction() as session:
+                session['_user_id'] = str(user.user_id)
+                session['_fresh'] = True
+
+            with caplog.at_level(logging.WARNING):
+                test_client.get('/api/clients/')
+
+        slow_query_logs = [record.getMessage() for record in caplog.records if "Slow query" in record.getMessage()]
+        assert slow_query_logs
+        assert not any(user.user_id in message for message in slow_query_logs)
+
+    def test_failed_queries_do_not_skew_later_timings(self, app, mocker):
+        """Ensure a statement that fails is not counted, and does not change how later ones are timed."""
+        clock = mocker.patch("corezilla.app.utils.instrumentation.time.perf_counter")
+        with app.test_request_context():
+            g.query_stats = QueryStats()
+            clock.return_value = 0.0
+            with pytest.raises(OperationalError):
+                db.session.execute(text("SELECT * FROM no_such_table"))
+            db.session.rollback()
+
+            clock.side_effect = [10.0, 10.5]
+            db.session.execute(text("SELECT 1"))
+
+            assert g.query_stats.count == 1
+            assert g.query_stats.duration == pytest.approx(0.5)
+            assert not db.session.connection().info.get("query_started_at")
+
+
+def test_redact_parameters():
+    assert redact_parameters(("secret", 1)) == ("?", "?")
+    assert redact_parameters({"client_id": "secret"}) == {"client_id": "?"}
+    assert redact_parameters([("a",), ("b",)]) == "<2 parameter sets>"
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from corezilla.app.utils.metrics import MetricsRegistry, render_prometheus
+from corezilla.config.test import TestConfiguration
+
+
+class TestMetricsRegistry:
+    def test_counter_is_aggregated_across_threads(self):
+        """Ensure increments made on different threads are summed when collected."""
+        registry = MetricsRegistry()
+        counter = registry.counter("jobs_total", "Jobs run.")
+
+        def work():
+            for _ in range(100):
+                counter.inc(queue="default")
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.collect() == {(("queue", "default"),): 400}
+
+    def test_histogram_is_rendered_cumulatively(self):
+        """Ensure histogram buckets are cumulative and include +Inf, sum, and count."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, route="a")
+
+        output = render_prometheus(registry)
+
+        assert '# TYPE latency_seconds histogram' in output
+        assert 'latency_seconds_bucket{route="a",le="0.1"} 1' in output
+        assert 'latency_seconds_bucket{route="a",le="1.0"} 2' in output
+        assert 'latency_seconds_bucket{route="a",le="+Inf"} 3' in output
+        assert 'latency_seconds_sum{route="a"} 5.55' in output
+        assert 'latency_seconds_count{route="a"} 3' in output
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter("events_total", "Events.").inc(name='say "hi"\n')
+
+        assert 'events_total{name="say \\"hi\\"\\n"} 1' in render_prometheus(registry)
+
+    def test_cache_hit_ratio(self):
+        """Ensure registered caches are exported with their hit ratio."""
+        class Cache:
+            hits = 3
+            misses = 1
+
+        registry = MetricsRegistry()
+        registry.register_cache("clients", Cache())
+        output = render_prometheus(registry)
+
+        assert 'cache_hits{cache="clients"} 3' in output
+        assert 'cache_hit_ratio{cache="clients"} 0.75' in output
+
+    def test_metric_type_conflict(self):
+        registry = MetricsRegistry()
+        registry.counter("things", "Things.")
+
+        with pytest.raises(ValueError):
+            registry.histogram("things", "Things.")
+
+
+class MetricsConfiguration(TestConfiguration):
+    METRICS_ENABLED = True
+
+
+@pytest.fixture
+def metrics_app(make_app):
+    return make_app(MetricsConfiguration)
+
+
+def test_metrics_endpoint(metrics_app):
+    """Ensure /metrics serves request latencies and database metrics in the Prometheus text format."""
+    with metrics_app.test_client() as test_client:
+        test_client.get("/api/oauth/authorize")
+        response = test_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{blueprint="oauth"}' in body
+    assert "# TYPE db_queries_per_request histogram" in body
+    assert "# TYPE oauth_tokens_issued_total counter" in body
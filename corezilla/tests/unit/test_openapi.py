@@ -0,0 +1,66 @@
+import gzip
+
+from corezilla.app import api
+
+
+class TestDocumentCache:
+    def test_spec_is_rendered_once(self, app, mocker):
+        """Ensure the spec is serialised on the first request only, and then served with caching headers."""
+        to_dict = mocker.spy(api.spec, "to_dict")
+        client = app.test_client()
+
+        first = client.get("/api-spec.json")
+        second = client.get("/api-spec.json")
+
+        assert to_dict.call_count == 1
+        assert first.data == second.data
+        assert "/api/oauth/token" in second.json["paths"]
+        assert second.headers["ETag"] == first.headers["ETag"]
+        assert second.cache_control.public
+        assert second.cache_control.max_age == app.config["OPENAPI_CACHE_MAX_AGE_SECONDS"]
+        assert "Accept-Encoding" in second.headers["Vary"]
+
+    def test_spec_is_compressed(self, app):
+        """Ensure clients accepting gzip get the pre-compressed spec."""
+        client = app.test_client()
+
+        plain = client.get("/api-spec.json")
+        compressed = client.get("/api-spec.json", headers={"Accept-Encoding": "gzip"})
+
+        assert "Content-Encoding" not in plain.headers
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(compressed.data) == plain.data
+        assert compressed.headers["ETag"] != plain.headers["ETag"]
+
+    def test_not_modified(self, app):
+        """Ensure a request with the current ETag is answered with an empty 304."""
+        client = app.test_client()
+        etag = client.get("/api-spec.json").headers["ETag"]
+
+        response = client.get("/api-spec.json", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.data == b""
+        assert response.headers["ETag"] == etag
+
+    def test_etag_is_per_encoding(self, app):
+        """Ensure a validator for one encoding does not revalidate another."""
+        client = app.test_client()
+        etag = client.get("/api-spec.json").headers["ETag"]
+
+        response = client.get("/api-spec.json", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["ETag"] != etag
+
+    def test_documentation_pages(self, app):
+        """Ensure the documentation pages are cached too and link to the spec."""
+        client = app.test_client()
+
+        for path in ("/redoc", "/swagger-ui", "/rapidoc"):
+            response = client.get(path)
+            assert response.status_code == 200
+            assert response.mimetype == "text/html"
+            assert "api-spec.json" in response.get_data(as_text=True)
+            assert client.get(path, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
@@ -0,0 +1,50 @@
+import argparse
+import os
+
+import pytest
+from xid import Xid
+
+from corezilla.app.services.TokenService import get_signer
+from corezilla.app.utils.prewarm import prewarm
+
+
+class TestPrewarm:
+    def test_prewarm(self, app):
+        """Ensure prewarming compiles the templates and builds the signer before the first request."""
+        get_signer.cache_clear()
+
+        timings = prewarm(app)
+
+        assert set(timings) == {"mappers", "schemas", "templates", "signers", "spec", "url_map"}
+        assert get_signer.cache_info().currsize == 1
+        assert any(name == "index.html" for _, name in app.jinja_env.cache.keys())
+
+    def test_server_options(self, app):
+        pytest.importorskip("gunicorn")
+        from corezilla.serve import server_options
+
+        args = argparse.Namespace(bind=None, workers=3, threads=None, timeout=None)
+        options = server_options(app.config, args)
+
+        assert options["bind"] == app.config["SERVER_BIND"]
+        assert options["workers"] == 3
+        assert options["preload_app"] is True
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="Workers are only forked on POSIX")
+    def test_ids_are_unique_in_forked_workers(self):
+        """Ensure a worker forked from the preloaded application does not generate the ids its parent does."""
+        import corezilla.app.models  # noqa: F401 - registers the at-fork hook
+
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.write(write_end, Xid().string().encode())
+            finally:
+                os._exit(0)
+        os.close(write_end)
+        child_id = os.read(read_end, 64).decode()
+        os.close(read_end)
+        os.waitpid(pid, 0)
+
+        assert child_id and child_id != Xid().string()
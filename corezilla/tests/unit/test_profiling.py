@@ -0,0 +1,113 @@
+import http
+import sys
+import time
+
+import pytest
+
+from corezilla.app import db
+from corezilla.app.models.User import Role, User
+from corezilla.app.utils.profiling import SamplingProfiler, collapse_stack
+from corezilla.config.test import TestConfiguration
+
+
+def busy_handler(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+class TestSamplingProfiler:
+    def test_collapse_stack_is_rooted_at_endpoint(self):
+        stack = collapse_stack("oauth.Token", sys._getframe())
+
+        frames = stack.split(";")
+        assert frames[0] == "oauth.Token"
+        assert frames[-1].startswith("test_profiling.py:test_collapse_stack_is_rooted_at_endpoint:")
+        assert " " not in stack
+
+    def test_samples_are_written_as_collapsed_stacks(self, tmp_path):
+        """Ensure only threads handling a sampled request are recorded, tagged by their endpoint."""
+        profiler = SamplingProfiler(interval=0.001, output_dir=str(tmp_path), max_duration=10)
+        profiler.start(duration=5)
+        profiler.request_started("oauth.Token")
+        busy_handler(0.1)
+        profiler.request_finished()
+        output = profiler.stop()
+
+        assert not profiler.running
+        with open(output) as collapsed:
+            lines = collapsed.read().splitlines()
+        assert lines
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            assert stack.startswith("oauth.Token;")
+            assert int(count) > 0
+        assert any("busy_handler" in line for line in lines)
+
+    def test_start_twice_is_rejected(self, tmp_path):
+        profiler = SamplingProfiler(output_dir=str(tmp_path))
+        profiler.start(duration=5)
+        try:
+            with pytest.raises(RuntimeError):
+                profiler.start(duration=5)
+        finally:
+            profiler.stop()
+
+    def test_unsampled_requests_are_skipped(self, tmp_path):
+        profiler = SamplingProfiler(interval=0.001, output_dir=str(tmp_path))
+        profiler.start(duration=5, sample_rate=0.0001)
+        for _ in range(10):
+            profiler.request_started("oauth.Token")
+        assert profiler.stop() is None or profiler.status()["samples"] == 0
+
+
+class ProfilerConfiguration(TestConfiguration):
+    PROFILER_ENABLED = True
+
+
+@pytest.fixture
+def profiler_app(make_app, tmp_path):
+    app = make_app(ProfilerConfiguration)
+    app.extensions["profiler"].output_dir = str(tmp_path)
+    return app
+
+
+def login(test_client, app, role=None):
+    user = User(username="admin_user", email="admin@example.invalid", password="password")
+    if role:
+        user.roles.append(Role(name=role))
+    db.session.add(user)
+    db.session.commit()
+
+    with test_client.session_transaction() as session:
+        session["_user_id"] = user.fs_uniquifier
+        session["_fresh"] = True
+        # Saved by Flask-Principal when `login_user` announces the new identity
+        session["identity.id"] = user.fs_uniquifier
+        session["identity.auth_type"] = None
+
+
+class TestProfilerAPI:
+    def test_requires_login(self, profiler_app):
+        with profiler_app.test_client() as test_client:
+            assert test_client.get("/api/admin/profiler").status_code == http.HTTPStatus.UNAUTHORIZED
+
+    def test_requires_admin_role(self, profiler_app):
+        with profiler_app.test_client() as test_client:
+            login(test_client, profiler_app, role="User")
+            assert test_client.get("/api/admin/profiler").status_code == http.HTTPStatus.FORBIDDEN
+
+    def test_start_and_stop(self, profiler_app):
+        with profiler_app.test_client() as test_client:
+            login(test_client, profiler_app, role="Admin")
+
+            response = test_client.post("/api/admin/profiler", json={"duration": 30, "sample_rate": 0.5})
+            assert response.status_code == http.HTTPStatus.ACCEPTED
+            assert response.get_json()["running"] is True
+
+            conflict = test_client.post("/api/admin/profiler", json={})
+            assert conflict.status_code == http.HTTPStatus.CONFLICT
+
+            response = test_client.delete("/api/admin/profiler")
+            assert response.status_code == http.HTTPStatus.OK
+            assert response.get_json()["running"] is False
@@ -0,0 +1,48 @@
+import types
+
+import pytest
+from marshmallow import Schema, fields
+
+from corezilla.app.schemas.compiled import compile_dump
+from corezilla.app.schemas.create_client_response_schema import client_response_schema, dump_client_response
+
+CLIENT = {
+    "client_id": "cl-cs8nh6j24tk0d2o1a1a0",
+    "name": "Example",
+    "client_secret": None,
+    "is_public": "true",
+    "client_type": "web",
+    "unknown": "dropped",
+    "metadata": {"description": "An example application.", "logo": None, "tos": 1},
+    "configuration": {
+        "oidc_conformant": 1,
+        "token_endpoint_auth_method": "client_secret_basic",
+        "uris": {"redirect_uris": ["https://example.com/callback"], "resources": [], "web_origins": None},
+        "cors": {"is_enabled": False, "allowed_origins": [], "fallback_url": ""},
+        "refresh": {"refresh_token_rotation_enabled": True, "rotation_overlap_period": "60"},
+        "jwt": {"algorithm": "RS256"},
+        "stored_only": {"kept": False},
+    },
+}
+
+
+class TestCompiledDump:
+    @pytest.mark.parametrize("client", [
+        CLIENT,
+        {"client_id": "cl-cs8nh6j24tk0d2o1a1a0"},
+        {"metadata": None, "configuration": {}},
+        types.SimpleNamespace(client_id="cl-cs8nh6j24tk0d2o1a1a0", name="Example", is_public=False),
+    ])
+    def test_matches_schema_dump(self, client):
+        """Ensure the compiled client dump builds exactly what the schema dumps."""
+        assert dump_client_response(client) == client_response_schema.dump(client)
+
+    def test_unsupported_schemas_are_refused(self):
+        class MethodSchema(Schema):
+            value = fields.Method("serialize_value")
+
+            def serialize_value(self, obj):
+                return obj
+
+        with pytest.raises(ValueError):
+            compile_dump(MethodSchema())
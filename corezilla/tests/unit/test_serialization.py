@@ -0,0 +1,70 @@
+import dataclasses
+import datetime
+import decimal
+import uuid
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+pytest.importorskip("orjson")
+
+from corezilla.app import db
+from corezilla.app.utils.serialization import OrjsonProvider
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: int
+
+
+GOLDEN = {
+    "configuration": {
+        "uris": {"redirect_uris": ["https://example.com/callback"], "app_login_uri": "https://example.com"},
+        "refresh": {"rotation_overlap_period": 0, "refresh_token_rotation_enabled": True},
+        "jwt": {"algorithm": "RS256"},
+    },
+    "created_at": datetime.datetime(2024, 5, 17, 9, 30, 15),
+    "created_on": datetime.date(2024, 5, 17),
+    "expires_at": datetime.datetime(2024, 5, 17, 9, 30, 15, tzinfo=datetime.timezone.utc),
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "amount": decimal.Decimal("10.50"),
+    "point": Point(1, 2),
+    "versions": {2: "b", 1: "a"},
+    "empty": None,
+    "ratio": 0.25,
+    "tags": ("a", "b"),
+}
+
+
+class TestOrjsonProvider:
+    @pytest.mark.parametrize("debug", [False, True])
+    def test_responses_match_the_default_provider(self, app, debug):
+        """Ensure responses are byte for byte what Flask's default provider returns."""
+        app.debug = debug
+        with app.test_request_context():
+            expected = DefaultJSONProvider(app).response(GOLDEN).get_data()
+            assert OrjsonProvider(app).response(GOLDEN).get_data() == expected
+
+    def test_dumps_and_loads(self, app):
+        provider = OrjsonProvider(app)
+
+        assert provider.loads(provider.dumps(GOLDEN)) == DefaultJSONProvider(app).loads(DefaultJSONProvider(app).dumps(GOLDEN))
+        assert provider.loads(provider.dumps({"name": "Zoë"})) == {"name": "Zoë"}
+        # Arguments for the json module, as the session serializer passes, keep its exact output
+        assert provider.dumps({"b": 1, "a": 2}, separators=(",", ":")) == '{"a":2,"b":1}'
+        assert provider.dumps({"big": 2 ** 70}) == DefaultJSONProvider(app).dumps({"big": 2 ** 70})
+
+    def test_provider_is_used_for_responses_and_json_columns(self, app, oauth_client, db_session):
+        assert isinstance(app.json, OrjsonProvider)
+
+        configuration = oauth_client.client_configurations[0]
+        configuration.configuration_blob["jwt"] = {"algorithm": "ES256"}
+        db_session.commit()
+        db_session.expire_all()
+
+        stored = db_session.execute(
+            db.text("SELECT configuration_blob FROM client_configuration WHERE id = :id"), {"id": configuration.id}
+        ).scalar()
+        assert stored == app.json.dumps(configuration.configuration_blob)
+        assert configuration.configuration_blob["jwt"] == {"algorithm": "ES256"}
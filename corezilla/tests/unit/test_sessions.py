@@ -0,0 +1,168 @@
+import os
+import threading
+
+import pytest
+from flask import session
+
+from corezilla.app.utils.sessions import (
+    MemorySessionStore, MmapSessionStore, SQLiteSessionStore, ServerSideSessionInterface
+)
+from corezilla.config.test import TestConfiguration
+
+
+@pytest.fixture(params=["memory", "mmap", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore(max_entries=3)
+    if request.param == "mmap":
+        return MmapSessionStore(tmp_path / "sessions.log")
+    return SQLiteSessionStore(tmp_path / "sessions.db")
+
+
+class TestSessionStores:
+    def test_save_and_load(self, store):
+        """Ensure a saved payload is returned until it expires."""
+        store.save("sid-1", b"payload", expires_at=200.0)
+
+        assert bytes(store.load("sid-1", now=100.0)) == b"payload"
+        assert store.load("sid-1", now=300.0) is None
+        assert store.load("unknown", now=100.0) is None
+
+    def test_overwrite_and_delete(self, store):
+        """Ensure the latest save wins and deleted sessions are gone."""
+        store.save("sid-1", b"first", expires_at=200.0)
+        store.save("sid-1", b"second", expires_at=200.0)
+        assert bytes(store.load("sid-1", now=100.0)) == b"second"
+
+        store.delete("sid-1")
+        assert store.load("sid-1", now=100.0) is None
+
+    def test_sweep_is_batched(self, store):
+        """Ensure a sweep removes at most `limit` expired sessions and leaves live ones."""
+        store.save("expired-1", b"x", expires_at=50.0)
+        store.save("expired-2", b"x", expires_at=50.0)
+        store.save("live", b"x", expires_at=500.0)
+
+        assert store.sweep(now=100.0, limit=1) == 1
+        assert store.sweep(now=100.0, limit=10) == 1
+        assert bytes(store.load("live", now=100.0)) == b"x"
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_entries=2)
+    store.save("a", b"a", expires_at=100.0)
+    store.save("b", b"b", expires_at=100.0)
+    store.load("a", now=0.0)
+    store.save("c", b"c", expires_at=100.0)
+
+    assert store.load("b", now=0.0) is None
+    assert store.load("a", now=0.0) == b"a"
+
+
+def test_mmap_store_is_shared_and_compacted(tmp_path):
+    """Ensure records written by one worker are visible to another, including after compaction."""
+    path = tmp_path / "sessions.log"
+    writer = MmapSessionStore(path, compact_min_bytes=0)
+    reader = MmapSessionStore(path, compact_min_bytes=0)
+
+    writer.save("sid-1", b"one", expires_at=500.0)
+    assert bytes(reader.load("sid-1", now=0.0)) == b"one"
+
+    for _ in range(10):
+        writer.save("sid-2", b"two", expires_at=50.0)
+    writer.sweep(now=100.0, limit=10)
+
+    assert path.stat().st_size < 100
+    assert bytes(reader.load("sid-1", now=100.0)) == b"one"
+    reader.save("sid-3", b"three", expires_at=500.0)
+    assert bytes(writer.load("sid-3", now=100.0)) == b"three"
+
+
+def test_mmap_compaction_keeps_concurrent_appends(tmp_path, mocker):
+    """Ensure a record another worker appends while the log is being compacted is not lost."""
+    path = tmp_path / "sessions.log"
+    compacting = MmapSessionStore(path, compact_min_bytes=0)
+    other = MmapSessionStore(path)
+    for _ in range(10):
+        compacting.save("expired", b"x", expires_at=50.0)
+
+    replace = os.replace
+    appending = []
+
+    def replace_after_concurrent_save(source, destination):
+        thread = threading.Thread(target=other.save, args=("sid-other", b"other", 500.0))
+        thread.start()
+        thread.join(timeout=0.2)
+        appending.append(thread)
+        replace(source, destination)
+
+    mocker.patch("corezilla.app.utils.sessions.os.replace", side_effect=replace_after_concurrent_save)
+    compacting.sweep(now=100.0, limit=10)
+    appending[0].join()
+
+    assert bytes(MmapSessionStore(path).load("sid-other", now=100.0)) == b"other"
+
+
+def test_sqlite_store_does_not_keep_its_setup_connection(tmp_path):
+    """Ensure creating the store, as `create_app` does before workers fork, leaves no connection open."""
+    store = SQLiteSessionStore(tmp_path / "sessions.db")
+
+    assert getattr(store._local, "connection", None) is None
+
+    store.save("sid-1", b"payload", expires_at=200.0)
+    store._local.pid = -1  # As in a forked worker
+    assert bytes(store.load("sid-1", now=100.0)) == b"payload"
+    assert store._local.pid == os.getpid()
+
+
+class ServerSideSessionConfiguration(TestConfiguration):
+    SESSION_BACKEND = "memory"
+
+
+@pytest.fixture
+def session_app(make_app):
+    app = make_app(ServerSideSessionConfiguration)
+
+    @app.route("/session/write")
+    def write_session():
+        session["value"] = "stored"
+        return ""
+
+    @app.route("/session/read")
+    def read_session():
+        return session.get("value", "")
+
+    return app
+
+
+class TestServerSideSessionInterface:
+    def test_cookie_only_carries_session_id(self, session_app):
+        """Ensure session data is kept in the store and only a signed id is sent to the browser."""
+        interface = session_app.session_interface
+        assert isinstance(interface, ServerSideSessionInterface)
+
+        with session_app.test_client() as test_client:
+            test_client.get("/session/write")
+            cookie = test_client.get_cookie(session_app.config["SESSION_COOKIE_NAME"])
+
+            assert "stored" not in cookie.value
+            assert test_client.get("/session/read").data == b"stored"
+
+    def test_session_is_loaded_lazily(self, session_app):
+        """Ensure opening a session does not read from the store until the session is used."""
+        interface = session_app.session_interface
+        store = interface.store
+
+        with session_app.test_client() as test_client:
+            test_client.get("/session/write")
+            cookie = test_client.get_cookie(session_app.config["SESSION_COOKIE_NAME"])
+
+        cookie_header = f"{cookie.key}={cookie.value}"
+        with session_app.test_request_context(headers={"Cookie": cookie_header}) as context:
+            hits = store.hits
+            opened = interface.open_session(session_app, context.request)
+            assert store.hits == hits
+            assert not opened.accessed
+
+            assert opened["value"] == "stored"
+            assert store.hits == hits + 1
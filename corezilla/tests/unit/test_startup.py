@@ -0,0 +1,68 @@
+import os
+import pathlib
+import subprocess
+import sys
+
+from flask_smorest import Blueprint
+
+from corezilla.app import api, create_app
+from corezilla.config.test import TestConfiguration
+
+# Imported only when they are used
+DEFERRED_MODULES = ("alembic", "flask_migrate")
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[3]
+
+CREATE_APP = """
+import sys
+from corezilla.app import create_app
+from corezilla.config.test import TestConfiguration
+create_app(TestConfiguration)
+print("\\n".join(sys.modules))
+"""
+
+
+def imported_modules(code):
+    """
+    Run `code` in a fresh interpreter.
+
+    Returns:
+        set: The names of the modules it imported, as printed by `code`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, check=True,
+        # Importable however pytest was started, e.g. from corezilla/
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")]))},
+    )
+    return set(result.stdout.split())
+
+
+class TestStartup:
+    """
+    Startup stays fast because the slow parts are deferred until they are used; these tests check that
+    they are. Timings are tracked by the `app.create_app` benchmark in `benchmarks/micro.py`.
+    """
+
+    def test_migrations_are_not_imported(self):
+        modules = imported_modules(CREATE_APP)
+
+        assert "corezilla.app" in modules
+        assert not [name for name in modules if name.split(".")[0] in DEFERRED_MODULES]
+
+    def test_create_app_does_not_document_blueprints(self, mocker):
+        register_views_in_doc = mocker.spy(Blueprint, "register_views_in_doc")
+
+        create_app(TestConfiguration)
+
+        assert register_views_in_doc.call_count == 0
+
+    def test_spec_is_built_when_first_requested(self, app):
+        """Ensure blueprints are only documented when the spec is first used, and that it is then complete."""
+        assert api._undocumented
+
+        response = app.test_client().get("/api-spec.json")
+
+        assert not api._undocumented
+        assert "/api/oauth/token" in response.json["paths"]
+        assert [tag["name"] for tag in response.json["tags"]] == ["auth", "oauth", "user", "clients"]
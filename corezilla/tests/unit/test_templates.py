@@ -0,0 +1,35 @@
+from corezilla.app import create_app
+from corezilla.config.test import TestConfiguration
+
+
+def cached_configuration(directory):
+    class CachedConfiguration(TestConfiguration):
+        TEMPLATE_BYTECODE_CACHE_DIR = directory
+
+    return CachedConfiguration
+
+
+class TestTemplateCache:
+    def test_compile_command(self, tmp_path):
+        """Ensure templates compiled at deploy time are loaded by other workers without compiling them."""
+        app = create_app(cached_configuration(tmp_path))
+
+        result = app.test_cli_runner().invoke(args=["templates", "compile"])
+
+        assert result.exit_code == 0, result.output
+        assert list(tmp_path.glob("__jinja2_*.cache"))
+
+        worker = create_app(cached_configuration(tmp_path))
+        compiled = []
+        compile_templates = worker.jinja_env.compile
+        worker.jinja_env.compile = lambda *args, **kwargs: compiled.append(args) or compile_templates(*args, **kwargs)
+        worker.jinja_env.get_template("index.html")
+
+        assert not compiled
+
+    def test_compile_command_without_cache(self, app):
+        """Ensure the command fails when there is no cache to compile into."""
+        result = app.test_cli_runner().invoke(args=["templates", "compile"])
+
+        assert result.exit_code != 0
+        assert "TEMPLATE_BYTECODE_CACHE_DIR" in result.output
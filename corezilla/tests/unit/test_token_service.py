@@ -4,6 +4,8 @@ import jwt
 import pytest
 from flask_security.utils import aware_utcnow
 
+from corezilla.app.models import RefreshTokenFamily
+from corezilla.app.services.AuthorizationCodeService import AuthorizationCodeService
 from corezilla.app.services.TokenService import TokenService
 
 
@@ -12,7 +14,7 @@ class TestTokenService:
     def test_generate_jwt_success(self, auth_config):
         """Ensure a JWT token is generated successfully."""
         payload = {"sub": "user123", "role": "admin"}
-        expires_in = auth_config["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
+        expires_in = auth_config["ACCESS_TOKEN_EXPIRE_SECONDS"]
 
         token = TokenService.generate_jwt(payload, expires_in)
 
@@ -23,7 +25,7 @@ class TestTokenService:
     def test_generate_refresh_token_success(self, auth_config):
         """Ensure a refresh token is generated successfully."""
         payload = {"sub": "user123", "client_id": "client456"}
-        expires_in = auth_config["REFRESH_TOKEN_EXPIRE_MINUTES"] * 60
+        expires_in = auth_config["REFRESH_TOKEN_EXPIRE_SECONDS"]
 
         token = TokenService.generate_refresh_token(payload, expires_in)
         assert isinstance(token, str)
@@ -33,7 +35,7 @@ class TestTokenService:
     def test_jwt_contains_correct_claims(self, auth_config):
         """Ensure JWT contains required claims."""
         payload = {"sub": "user123", "role": "admin"}
-        expires_in = auth_config["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
+        expires_in = auth_config["ACCESS_TOKEN_EXPIRE_SECONDS"]
 
         token = TokenService.generate_jwt(payload, expires_in)
         decoded_token = jwt.decode(token, auth_config["SECRET_KEY"], algorithms=["HS256"])
@@ -63,7 +65,7 @@ class TestTokenService:
         del auth_config["ISSUER_NAME"]
 
         payload = {"sub": "user123"}
-        expires_in = auth_config["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
+        expires_in = auth_config["ACCESS_TOKEN_EXPIRE_SECONDS"]
 
         with pytest.raises(ValueError, match="Issuer \(iss\) cannot be None or empty."):
             TokenService.generate_jwt(payload, expires_in)
@@ -74,7 +76,7 @@ class TestTokenService:
         del auth_config["AUDIENCE"]
 
         payload = {"sub": "user123"}
-        expires_in = auth_config["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
+        expires_in = auth_config["ACCESS_TOKEN_EXPIRE_SECONDS"]
 
         with pytest.raises(ValueError, match="Audience \(aud\) cannot be None or empty."):
             TokenService.generate_jwt(payload, expires_in)
@@ -82,23 +84,21 @@ class TestTokenService:
 
     def test_handle_authorization_code_grant_success(self, oauth_client, auth_config, mocker):
         """Ensure access and refresh tokens are generated on successful authorization grant."""
-        mock_auth_code = mocker.Mock()
-        mock_auth_code.user_id = "user123"
-        mock_auth_code.scope = "openid profile email"
+        mock_auth_code = {"user_id": "user123", "scope": "openid profile email"}
 
-        mocker.patch.object(oauth_client, "validate_authorization_code", return_value=mock_auth_code)
+        mocker.patch.object(AuthorizationCodeService, "validate_authorization_code", return_value=mock_auth_code)
 
         result = TokenService.handle_authorization_code_grant(oauth_client, "valid-code", "https://example.com")
 
         assert "access_token" in result
         assert "refresh_token" in result
         assert result["token_type"] == "Bearer"
-        assert result["expires_in"] == auth_config["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
+        assert result["expires_in"] == auth_config["ACCESS_TOKEN_EXPIRE_SECONDS"]
 
 
     def test_handle_authorization_code_grant_invalid_code(self, oauth_client, auth_config, mocker):
         """Ensure an invalid authorization code results in failure."""
-        mocker.patch.object(oauth_client, "validate_authorization_code", return_value=None)
+        mocker.patch.object(AuthorizationCodeService, "validate_authorization_code", side_effect=ValueError)
 
         result = TokenService.handle_authorization_code_grant(oauth_client, "invalid-code", "https://example.com")
         assert result is None
@@ -121,7 +121,7 @@ class TestTokenService:
         assert "access_token" in result
         assert "refresh_token" in result
         assert result["token_type"] == "Bearer"
-        assert result["expires_in"] == auth_config["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
+        assert result["expires_in"] == auth_config["ACCESS_TOKEN_EXPIRE_SECONDS"]
 
 
     def test_handle_refresh_token_grant_expired(self, oauth_client, auth_config):
@@ -171,3 +171,223 @@ class TestTokenService:
 
         result = TokenService.handle_refresh_token_grant(oauth_client, invalid_refresh_token)
         assert result is None
+
+
+@pytest.mark.usefixtures("oauth_client", "user", "db_session")
+class TestClientCredentialsGrant:
+    def test_authenticate_client_is_cached(self, app, oauth_client, auth_config):
+        """Ensure a verified client is answered from the cache and a wrong secret never is."""
+        from corezilla.app.services.ClientService import ClientService
+
+        secret = oauth_client.client_secret
+        first = ClientService.authenticate_client(oauth_client.client_id, secret)
+        second = ClientService.authenticate_client(oauth_client.client_id, secret)
+        cache = app.extensions["client_credential_cache"]
+
+        assert first is second
+        assert cache.hits == 1
+        assert ClientService.authenticate_client(oauth_client.client_id, secret + "x") is None
+        assert ClientService.authenticate_client(oauth_client.client_id, None) is None
+
+    def test_cached_credentials_are_invalidated_on_update(self, app, oauth_client, db_session, auth_config):
+        from corezilla.app.services.ClientService import ClientService
+
+        old_secret = oauth_client.client_secret
+        db_session.commit()
+        assert ClientService.authenticate_client(oauth_client.client_id, old_secret) is not None
+
+        oauth_client.client_secret = "rotated-secret"
+        db_session.commit()
+
+        assert ClientService.authenticate_client(oauth_client.client_id, old_secret) is None
+        assert ClientService.authenticate_client(oauth_client.client_id, "rotated-secret") is not None
+
+    def test_token_uses_precomputed_claims(self, app, oauth_client, auth_config):
+        from corezilla.app.services.ClientService import ClientService
+
+        client = ClientService.authenticate_client(oauth_client.client_id, oauth_client.client_secret)
+        result = TokenService.handle_client_credentials_grant(client, "read")
+
+        claims = jwt.decode(result["access_token"], app.config["ACCESS_TOKEN_SECRET"], algorithms=["HS256"],
+                            audience=auth_config["AUDIENCE"])
+        assert claims["sub"] == oauth_client.client_id
+        assert claims["iss"] == auth_config["ISSUER_NAME"]
+        assert claims["scope"] == "read"
+        assert result["token_type"] == "Bearer"
+        assert "refresh_token" not in result
+
+    def test_token_reuse_window(self, app, oauth_client, auth_config):
+        """Ensure a token is reused within the window, and only for the same scope."""
+        from corezilla.app.services.ClientService import ClientService
+
+        client = ClientService.authenticate_client(oauth_client.client_id, oauth_client.client_secret)
+
+        auth_config["CLIENT_CREDENTIALS_TOKEN_REUSE_SECONDS"] = 0
+        assert (TokenService.handle_client_credentials_grant(client)["access_token"]
+                != TokenService.handle_client_credentials_grant(client)["access_token"])
+
+        auth_config["CLIENT_CREDENTIALS_TOKEN_REUSE_SECONDS"] = 30
+        first = TokenService.handle_client_credentials_grant(client)
+        assert TokenService.handle_client_credentials_grant(client)["access_token"] == first["access_token"]
+        assert TokenService.handle_client_credentials_grant(client, "write")["access_token"] != first["access_token"]
+
+
+@pytest.mark.usefixtures("oauth_client", "user", "db_session")
+class TestTokenExchange:
+    @pytest.fixture
+    def exchanging_client(self, oauth_client, auth_config):
+        from corezilla.app.services.ClientService import ClientService
+        return ClientService.authenticate_client(oauth_client.client_id, oauth_client.client_secret)
+
+    @staticmethod
+    def subject_token(claims=None, **overrides):
+        payload = {"sub": "user123", "client_id": "cl-frontend", "scope": "read write", "token_type": "access_token"}
+        payload.update(claims or {})
+        return TokenService.generate_jwt(payload, overrides.get("expires_in", 3600), overrides.get("audience"))
+
+    def test_signer_matches_pyjwt(self, app, auth_config):
+        """Ensure tokens from the cached signer are interchangeable with PyJWT's."""
+        payload = {"sub": "user123", "aud": "https://api.example.invalid"}
+        signer = TokenService.signer()
+
+        assert signer is TokenService.signer()
+        assert signer.encode(payload) == jwt.encode(payload, app.config["ACCESS_TOKEN_SECRET"], algorithm="HS256")
+
+    def test_exchange_narrows_scope_and_records_actor(self, app, exchanging_client, auth_config):
+        result = TokenService.handle_token_exchange_grant(
+            exchanging_client, self.subject_token(audience=exchanging_client.client_id), audience="https://orders.example.invalid", scope="read"
+        )
+        claims = jwt.decode(result["access_token"], app.config["ACCESS_TOKEN_SECRET"], algorithms=["HS256"],
+                            audience="https://orders.example.invalid")
+
+        assert result["issued_token_type"] == "urn:ietf:params:oauth:token-type:access_token"
+        assert claims["sub"] == "user123"
+        assert claims["scope"] == "read"
+        assert claims["act"] == {"sub": exchanging_client.client_id}
+
+    def test_exchange_cannot_widen_scope(self, exchanging_client, auth_config):
+        from corezilla.app.services.TokenService import TokenExchangeError
+
+        with pytest.raises(TokenExchangeError) as error:
+            TokenService.handle_token_exchange_grant(exchanging_client, self.subject_token(audience=exchanging_client.client_id), scope="admin")
+        assert error.value.error == "invalid_scope"
+
+    def test_exchange_requires_a_subject_token_for_the_client(self, exchanging_client, auth_config):
+        """Ensure a client can only exchange tokens issued to it, obtained by it, or naming it in their audience."""
+        from corezilla.app.services.TokenService import TokenExchangeError
+
+        with pytest.raises(TokenExchangeError) as error:
+            TokenService.handle_token_exchange_grant(exchanging_client, self.subject_token())
+        assert error.value.error == "invalid_grant"
+
+        for claims in ({"client_id": exchanging_client.client_id}, {"act": {"sub": exchanging_client.client_id}}):
+            assert "access_token" in TokenService.handle_token_exchange_grant(exchanging_client, self.subject_token(claims))
+
+    def test_exchange_rejects_refresh_tokens(self, exchanging_client, auth_config):
+        from corezilla.app.services.TokenService import TokenExchangeError
+
+        refresh_token = TokenService.generate_refresh_token({"sub": "user123"}, 3600)
+        with pytest.raises(TokenExchangeError) as error:
+            TokenService.handle_token_exchange_grant(exchanging_client, refresh_token)
+        assert error.value.error == "invalid_grant"
+
+    def test_batch_decodes_each_subject_token_once(self, exchanging_client, auth_config, mocker):
+        """Ensure a batch verifies a shared subject token once and reports errors per item."""
+        subject_token = self.subject_token(audience=exchanging_client.client_id)
+        decode = mocker.spy(TokenService, "decode_subject_token")
+
+        results = TokenService.handle_token_exchange_batch(exchanging_client, [
+            {"subject_token": subject_token, "audience": "https://a.example.invalid"},
+            {"subject_token": subject_token, "audience": "https://b.example.invalid", "scope": "read"},
+            {"subject_token": subject_token, "scope": "admin"},
+            {"subject_token": "not-a-token"},
+        ])
+
+        assert decode.call_count == 2
+        assert "access_token" in results[0] and "access_token" in results[1]
+        assert results[2]["error"] == "invalid_scope"
+        assert results[3]["error"] == "invalid_grant"
+
+
+def set_refresh_policy(oauth_client, db_session, **settings):
+    configuration = oauth_client.client_configurations[0]
+    configuration.configuration_blob["refresh"] = dict(configuration.configuration_blob["refresh"], **settings)
+    db_session.commit()
+
+
+@pytest.mark.usefixtures("oauth_client", "user", "db_session")
+class TestRefreshTokenRotation:
+
+    def issue(self, oauth_client, mocker):
+        mocker.patch.object(AuthorizationCodeService, "validate_authorization_code", return_value={"user_id": "user123", "scope": "openid"})
+        return TokenService.handle_authorization_code_grant(oauth_client, "valid-code", "https://example.com")["refresh_token"]
+
+    def test_rotation_and_reuse_detection(self, oauth_client, db_session, auth_config, mocker):
+        """Ensure each refresh returns a new token and reusing an old one revokes the whole family."""
+        set_refresh_policy(oauth_client, db_session, refresh_token_rotation_enabled=True)
+        first = self.issue(oauth_client, mocker)
+
+        second = TokenService.handle_refresh_token_grant(oauth_client, first)["refresh_token"]
+        assert second != first
+        third = TokenService.handle_refresh_token_grant(oauth_client, second)["refresh_token"]
+
+        assert TokenService.handle_refresh_token_grant(oauth_client, first) is None
+        assert TokenService.handle_refresh_token_grant(oauth_client, third) is None
+
+        family = db_session.get(RefreshTokenFamily, jwt.decode(first, options={"verify_signature": False})["fid"])
+        assert family.revoked is True
+
+    def test_overlap_period_allows_retry(self, oauth_client, db_session, auth_config, mocker):
+        """Ensure the previous token can be retried within the overlap period without revoking the family."""
+        set_refresh_policy(oauth_client, db_session, refresh_token_rotation_enabled=True, rotation_overlap_period=60)
+        first = self.issue(oauth_client, mocker)
+
+        second = TokenService.handle_refresh_token_grant(oauth_client, first)["refresh_token"]
+        retried = TokenService.handle_refresh_token_grant(oauth_client, first)["refresh_token"]
+
+        assert jwt.decode(retried, options={"verify_signature": False})["gen"] == 1
+        assert TokenService.handle_refresh_token_grant(oauth_client, second) is not None
+
+    def test_without_rotation_the_token_is_returned(self, oauth_client, auth_config, mocker):
+        first = self.issue(oauth_client, mocker)
+
+        assert TokenService.handle_refresh_token_grant(oauth_client, first)["refresh_token"] == first
+        assert TokenService.handle_refresh_token_grant(oauth_client, first)["refresh_token"] == first
+
+    def test_idle_lifetime(self, oauth_client, db_session, auth_config, mocker):
+        """Ensure a family unused for longer than the idle lifetime can no longer be refreshed."""
+        set_refresh_policy(oauth_client, db_session, idle_refresh_token_lifetime_enabled=True, idle_refresh_token_lifetime=60)
+        first = self.issue(oauth_client, mocker)
+
+        family = db_session.get(RefreshTokenFamily, jwt.decode(first, options={"verify_signature": False})["fid"])
+        family.last_used_at -= 120
+        db_session.commit()
+
+        assert TokenService.handle_refresh_token_grant(oauth_client, first) is None
+
+    def test_revoke_token_revokes_family(self, oauth_client, auth_config, mocker):
+        first = self.issue(oauth_client, mocker)
+
+        assert TokenService.revoke_token(first) is True
+        assert TokenService.revoke_token(first) is False
+        assert TokenService.handle_refresh_token_grant(oauth_client, first) is None
+
+    def test_introspection_follows_rotation(self, oauth_client, db_session, auth_config, mocker):
+        """Ensure only the latest refresh token of a family introspects as active."""
+        set_refresh_policy(oauth_client, db_session, refresh_token_rotation_enabled=True)
+        first = self.issue(oauth_client, mocker)
+        second = TokenService.handle_refresh_token_grant(oauth_client, first)["refresh_token"]
+
+        assert TokenService.introspect_token(first) is None
+        assert TokenService.introspect_token(second)["active"] is True
+
+    def test_legacy_token_is_honoured_once(self, oauth_client, db_session, auth_config):
+        """Ensure a refresh token from before families existed is exchanged once, and reusing it revokes its family."""
+        legacy = TokenService.generate_refresh_token({"sub": "user123", "client_id": oauth_client.client_id}, 3600)
+
+        enrolled = TokenService.handle_refresh_token_grant(oauth_client, legacy)["refresh_token"]
+        family_id = jwt.decode(enrolled, options={"verify_signature": False})["fid"]
+
+        assert TokenService.handle_refresh_token_grant(oauth_client, legacy) is None
+        assert db_session.get(RefreshTokenFamily, family_id).revoked is True
+        assert TokenService.handle_refresh_token_grant(oauth_client, enrolled) is None
@@ -0,0 +1,69 @@
+import logging
+import os
+
+import pytest
+
+from corezilla.app.utils.tracing import RequestIdGenerator, resolve_request_id
+
+
+class TestRequestIdGenerator:
+    def test_ids_are_unique(self):
+        generate = RequestIdGenerator()
+        ids = [generate() for _ in range(1000)]
+
+        assert len(set(ids)) == len(ids)
+        assert all(len(request_id) == 20 for request_id in ids)
+
+    def test_ids_sort_by_time(self, monkeypatch):
+        generate = RequestIdGenerator()
+        monkeypatch.setattr("time.time", lambda: 1_700_000_001)
+        later = generate()
+        monkeypatch.setattr("time.time", lambda: 1_700_000_000)
+        earlier = generate()
+
+        assert earlier < later
+
+    def test_reseed_changes_prefix(self):
+        generate = RequestIdGenerator()
+        before = generate()
+        generate.reseed()
+
+        assert before[7:15] != generate()[7:15]
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+    def test_forked_worker_gets_new_prefix(self):
+        from corezilla.app.utils.tracing import generate_request_id
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write_fd, generate_request_id().encode())
+            os._exit(0)
+        os.waitpid(pid, 0)
+        child_id = os.read(read_fd, 20).decode()
+
+        assert child_id[7:15] != generate_request_id()[7:15]
+
+
+@pytest.mark.parametrize("incoming, reused", [
+    ("edge-1234:abcd", True),
+    ("", False),
+    (None, False),
+    ("has spaces", False),
+    ("x" * 129, False),
+    ("line\nbreak", False),
+])
+def test_resolve_request_id(incoming, reused):
+    assert (resolve_request_id(incoming) == incoming) is reused
+
+
+def test_request_id_is_propagated(app, caplog):
+    """Ensure an incoming request id is returned in the response and attached to log records."""
+    with caplog.at_level(logging.DEBUG):
+        with app.test_client() as test_client:
+            response = test_client.get("/api/oauth/authorize", headers={"X-Request-ID": "upstream-42"})
+            generated = test_client.get("/api/oauth/authorize")
+
+    assert response.headers["X-Request-ID"] == "upstream-42"
+    assert len(generated.headers["X-Request-ID"]) == 20
+    assert any(getattr(record, "request_id", None) == "upstream-42" for record in caplog.records)
@@ -0,0 +1,61 @@
+"""Hash client secrets
+
+Revision ID: 5c1f0e7a9b2d
+Revises: f83aa019faa4
+Create Date: 2025-03-10 09:12:41.203511
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1f0e7a9b2d'
+down_revision = 'f83aa019faa4'
+branch_labels = None
+depends_on = None
+
+VERIFIER_PREFIX = "$blake2b$"
+
+client = sa.table(
+    'client',
+    sa.column('id', sa.Integer),
+    sa.column('_client_secret', sa.String),
+)
+
+
+def _hash_client_secret(secret, key):
+    # Mirrors corezilla.app.models.Client.hash_client_secret at the time of this migration
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    if len(key) > hashlib.blake2b.MAX_KEY_SIZE:
+        key = hashlib.blake2b(key).digest()
+    return VERIFIER_PREFIX + hashlib.blake2b(secret.encode("utf-8"), key=key, digest_size=32).hexdigest()
+
+
+def upgrade():
+    # Replace plaintext client secrets with keyed verifiers. Rows that are not upgraded here are
+    # still upgraded the next time the client authenticates.
+    key = current_app.config["CLIENT_SECRET_HASH_KEY"]
+    connection = op.get_bind()
+
+    rows = connection.execute(
+        sa.select(client.c.id, client.c._client_secret).where(
+            client.c._client_secret.isnot(None),
+            sa.not_(client.c._client_secret.startswith(VERIFIER_PREFIX, autoescape=True)),
+        )
+    ).all()
+
+    for row in rows:
+        connection.execute(
+            client.update().where(client.c.id == row.id).values(_client_secret=_hash_client_secret(row._client_secret, key))
+        )
+
+
+def downgrade():
+    # Verifiers cannot be turned back into plaintext secrets. Clients keep working after a downgrade
+    # only if the application still understands verifiers, otherwise their secrets must be rotated.
+    pass
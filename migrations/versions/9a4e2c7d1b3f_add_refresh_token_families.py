@@ -0,0 +1,41 @@
+"""Add refresh token families
+
+Revision ID: 9a4e2c7d1b3f
+Revises: 5c1f0e7a9b2d
+Create Date: 2025-03-17 14:02:11.480215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4e2c7d1b3f'
+down_revision = '5c1f0e7a9b2d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('refresh_token_family',
+    sa.Column('id', sa.String(length=20), nullable=False),
+    sa.Column('client_id', sa.String(length=255), nullable=False),
+    sa.Column('user_id', sa.String(length=255), nullable=True),
+    sa.Column('scope', sa.Text(), nullable=True),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.Integer(), nullable=False),
+    sa.Column('rotated_at', sa.Integer(), nullable=False),
+    sa.Column('last_used_at', sa.Integer(), nullable=False),
+    sa.Column('revoked', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['client_id'], ['client.client_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('refresh_token_family', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_refresh_token_family_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('refresh_token_family', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_refresh_token_family_user_id'))
+
+    op.drop_table('refresh_token_family')
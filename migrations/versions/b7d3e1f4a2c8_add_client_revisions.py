@@ -0,0 +1,30 @@
+"""Add client revisions
+
+Revision ID: b7d3e1f4a2c8
+Revises: 9a4e2c7d1b3f
+Create Date: 2025-03-24 10:41:27.615032
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e1f4a2c8'
+down_revision = '9a4e2c7d1b3f'
+branch_labels = None
+depends_on = None
+
+TABLES = ('client', 'client_metadata', 'client_configuration')
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('revision')
@@ -0,0 +1,28 @@
+"""Add legacy refresh token ids
+
+Revision ID: d41c7a9e5f20
+Revises: b7d3e1f4a2c8
+Create Date: 2025-03-31 09:12:48.203114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41c7a9e5f20'
+down_revision = 'b7d3e1f4a2c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('refresh_token_family', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('legacy_jti', sa.String(length=36), nullable=True))
+        batch_op.create_unique_constraint(batch_op.f('uq_refresh_token_family_legacy_jti'), ['legacy_jti'])
+
+
+def downgrade():
+    with op.batch_alter_table('refresh_token_family', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('uq_refresh_token_family_legacy_jti'), type_='unique')
+        batch_op.drop_column('legacy_jti')